@@ -2,12 +2,19 @@
 from django.contrib import admin
 from django.contrib import messages
 
+from newsfeed.caching import forget_subscribers
 from newsfeed.models import Issue
 from newsfeed.models import Newsletter
+from newsfeed.models import NewsletterDelivery
+from newsfeed.models import NewsletterRetry
+from newsfeed.models import NewsletterShard
 from newsfeed.models import Post
 from newsfeed.models import PostCategory
 from newsfeed.models import Subscriber
-from newsfeed.utils import send_email_newsletter
+from newsfeed.models import Task
+from newsfeed.snapshots import build_issue_snapshot
+from newsfeed.tasks import enqueue
+from newsfeed.tasks import requeue_tasks
 
 
 class PostInline(admin.StackedInline):
@@ -17,6 +24,14 @@ class PostInline(admin.StackedInline):
     classes = ("collapse", )
 
 
+class NewsletterShardInline(admin.TabularInline):
+    model = NewsletterShard
+    extra = 0
+    fields = ("shard_index", "shard_count", "sent", "created_at")
+    readonly_fields = fields
+    can_delete = False
+
+
 @admin.register(Issue)
 class IssueAdmin(admin.ModelAdmin):
     list_display = (
@@ -40,6 +55,20 @@ class IssueAdmin(admin.ModelAdmin):
         "updated_at",
     )
 
+    actions = ("rebuild_snapshots", )
+
+    def rebuild_snapshots(self, request, queryset):
+        issues = [issue for issue in queryset if issue.is_released]
+        for issue in issues:
+            build_issue_snapshot(issue)
+        messages.add_message(
+            request,
+            messages.SUCCESS,
+            f"Rebuilt the snapshot of {len(issues)} released issue(s)",
+        )
+
+    rebuild_snapshots.short_description = "Rebuild snapshots"
+
 
 @admin.register(PostCategory)
 class PostCategoryAdmin(admin.ModelAdmin):
@@ -82,6 +111,9 @@ class NewsletterAdmin(admin.ModelAdmin):
         "schedule",
         "is_sent",
         "sent_at",
+        "delivered_count",
+        "failed_count",
+        "send_duration",
         "created_at",
         "updated_at",
     )
@@ -95,16 +127,27 @@ class NewsletterAdmin(admin.ModelAdmin):
     )
     date_hierarchy = "created_at"
     autocomplete_fields = ("issue", )
+    readonly_fields = (
+        "recipients_count",
+        "delivered_count",
+        "failed_count",
+        "send_duration",
+    )
+    inlines = (NewsletterShardInline, )
 
     actions = ("send_newsletters", )
 
     def send_newsletters(self, request, queryset):
-        # This should always be overridden to use a task
-        send_email_newsletter(newsletters=queryset, respect_schedule=False)
+        task = enqueue(
+            "newsfeed.tasks.send_newsletters",
+            newsletter_ids=list(queryset.values_list("id", flat=True)),
+            respect_schedule=False,
+        )
         messages.add_message(
             request,
             messages.SUCCESS,
-            "Sending selected newsletters(s) to the subscribers",
+            "Sending selected newsletters(s) to the subscribers "
+            f"in task #{task.pk}",
         )
 
     send_newsletters.short_description = "Send newsletters"
@@ -118,15 +161,117 @@ class SubscriberAdmin(admin.ModelAdmin):
         "token",
         "verified",
         "subscribed",
+        "suppression_reason",
         "verification_sent_date",
         "created_at",
     )
     list_filter = (
         "verified",
         "subscribed",
+        "suppression_reason",
         "verification_sent_date",
         "created_at",
     )
     date_hierarchy = "created_at"
     readonly_fields = ("token", )
     search_fields = ("email_address", )
+    actions = ("unsubscribe", "resend_verification", "remove_suppression")
+
+    def unsubscribe(self, request, queryset):
+        unsubscribed = queryset.unsubscribe()
+        messages.add_message(
+            request,
+            messages.SUCCESS,
+            f"Unsubscribed {unsubscribed} subscriber(s)",
+        )
+
+    unsubscribe.short_description = "Unsubscribe selected subscribers"
+
+    def resend_verification(self, request, queryset):
+        requested = queryset.resend_verification()
+        messages.add_message(
+            request,
+            messages.SUCCESS,
+            f"Sending verification emails to {requested} subscriber(s)",
+        )
+
+    resend_verification.short_description = "Resend verification emails"
+
+    def remove_suppression(self, request, queryset):
+        subscriber_ids = list(
+            queryset.suppressed().values_list("pk", flat=True))
+        Subscriber.objects.filter(pk__in=subscriber_ids).update(
+            suppressed_at=None, suppression_reason="")
+        forget_subscribers(subscriber_ids)
+        messages.add_message(
+            request,
+            messages.SUCCESS,
+            f"Newsletters will be sent to {len(subscriber_ids)} subscriber(s) again",
+        )
+
+    remove_suppression.short_description = "Remove bounce or complaint suppression"
+
+
+@admin.register(NewsletterDelivery)
+class NewsletterDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("id", "newsletter", "subscriber", "created_at")
+    list_filter = ("newsletter", "created_at")
+    list_select_related = ("newsletter", "subscriber")
+    raw_id_fields = ("newsletter", "subscriber")
+    search_fields = ("subscriber__email_address", )
+
+
+@admin.register(NewsletterRetry)
+class NewsletterRetryAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "newsletter",
+        "subscriber",
+        "attempts",
+        "next_attempt_at",
+        "last_error",
+        "updated_at",
+    )
+    list_filter = ("newsletter", "attempts")
+    list_select_related = ("newsletter", "subscriber")
+    raw_id_fields = ("newsletter", "subscriber")
+    search_fields = ("subscriber__email_address", "last_error")
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "name",
+        "status",
+        "progress",
+        "attempts",
+        "run_at",
+        "started_at",
+        "finished_at",
+        "created_at",
+    )
+    list_filter = ("status", "name", "created_at")
+    date_hierarchy = "created_at"
+    search_fields = ("name", "progress")
+    readonly_fields = (
+        "progress",
+        "error",
+        "attempts",
+        "started_at",
+        "finished_at",
+        "created_at",
+        "updated_at",
+    )
+
+    actions = ("requeue_tasks", )
+
+    def requeue_tasks(self, request, queryset):
+        requeued = requeue_tasks(queryset)
+        messages.add_message(
+            request,
+            messages.SUCCESS,
+            f"{requeued} task(s) will be run again",
+        )
+
+    requeue_tasks.short_description = "Run tasks again"
@@ -3,9 +3,46 @@ from django.urls import reverse_lazy
 
 NEWSFEED_EMAIL_BATCH_WAIT = getattr(settings, "NEWSFEED_EMAIL_BATCH_WAIT", 0)
 NEWSFEED_EMAIL_BATCH_SIZE = getattr(settings, "NEWSFEED_EMAIL_BATCH_SIZE", 0)
+NEWSFEED_EMAIL_RECIPIENT_PAGE_SIZE = getattr(
+    settings, "NEWSFEED_EMAIL_RECIPIENT_PAGE_SIZE", 1000
+)
+NEWSFEED_EMAIL_RATE_LIMIT = getattr(settings, "NEWSFEED_EMAIL_RATE_LIMIT", 0)
+NEWSFEED_EMAIL_RATE_BURST = getattr(settings, "NEWSFEED_EMAIL_RATE_BURST", 0)
+NEWSFEED_EMAIL_RATE_LIMITER = getattr(
+    settings,
+    "NEWSFEED_EMAIL_RATE_LIMITER",
+    "newsfeed.ratelimit.TokenBucketRateLimiter",
+)
+NEWSFEED_EMAIL_DOMAIN_LIMITS = getattr(settings, "NEWSFEED_EMAIL_DOMAIN_LIMITS", {})
+NEWSFEED_EMAIL_WORKERS = getattr(settings, "NEWSFEED_EMAIL_WORKERS", 1)
+NEWSFEED_EMAIL_ASYNC_CONCURRENCY = getattr(
+    settings, "NEWSFEED_EMAIL_ASYNC_CONCURRENCY", 10
+)
+NEWSFEED_EMAIL_RETRY_MAX_ATTEMPTS = getattr(
+    settings, "NEWSFEED_EMAIL_RETRY_MAX_ATTEMPTS", 5
+)
+NEWSFEED_EMAIL_RETRY_BACKOFF = getattr(settings, "NEWSFEED_EMAIL_RETRY_BACKOFF", 60)
 NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS = getattr(
     settings, "NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS", 3
 )
+NEWSFEED_EMAIL_VERIFICATION_RESEND_WAIT = getattr(
+    settings, "NEWSFEED_EMAIL_VERIFICATION_RESEND_WAIT", 5 * 60
+)
+NEWSFEED_TASK_BACKEND = getattr(
+    settings, "NEWSFEED_TASK_BACKEND", "newsfeed.tasks.DatabaseTaskBackend"
+)
+NEWSFEED_TASK_LEASE_TIMEOUT = getattr(settings, "NEWSFEED_TASK_LEASE_TIMEOUT", 10 * 60)
+NEWSFEED_CACHE_ALIAS = getattr(settings, "NEWSFEED_CACHE_ALIAS", "default")
+NEWSFEED_CACHE_TIMEOUT = getattr(settings, "NEWSFEED_CACHE_TIMEOUT", 60 * 60)
+NEWSFEED_SUBSCRIBER_CACHE_TIMEOUT = getattr(
+    settings, "NEWSFEED_SUBSCRIBER_CACHE_TIMEOUT", 10 * 60
+)
+NEWSFEED_UNSUBSCRIBE_FLUSH_INTERVAL = getattr(
+    settings, "NEWSFEED_UNSUBSCRIBE_FLUSH_INTERVAL", 30
+)
+NEWSFEED_ISSUE_POSTS_PER_PAGE = getattr(settings, "NEWSFEED_ISSUE_POSTS_PER_PAGE", 20)
+NEWSFEED_METRICS_TOKEN = getattr(settings, "NEWSFEED_METRICS_TOKEN", None)
+NEWSFEED_BOUNCE_WEBHOOK_TOKEN = getattr(settings, "NEWSFEED_BOUNCE_WEBHOOK_TOKEN", None)
 NEWSFEED_SITE_BASE_URL = getattr(
     settings, "NEWSFEED_SITE_BASE_URL", "http://127.0.0.1:8000"
 )
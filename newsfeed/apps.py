@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class NewsfeedConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'newsfeed'
+
+    def ready(self):
+        from newsfeed import checks, receivers  # noqa: F401
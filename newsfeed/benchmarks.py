@@ -0,0 +1,244 @@
+import json
+import platform
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import django
+from django.db import connection
+from django.utils import timezone
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def get_peak_rss():
+    """returns the peak resident set size of the process in bytes"""
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(values, percent):
+    """returns the value below which ``percent`` % of the values fall"""
+    if not values:
+        return None
+
+    values = sorted(values)
+    index = max(int(round(percent / 100 * len(values))) - 1, 0)
+
+    return values[min(index, len(values) - 1)]
+
+
+def get_environment():
+    """describes what was benchmarked so results of commits can be compared"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "date": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+    }
+
+
+def write_results(path, results):
+    """writes benchmark results as JSON, ``-`` writes to stdout"""
+    output = json.dumps(results, indent=2, sort_keys=True)
+
+    if path == "-":
+        sys.stdout.write(output + "\n")
+        return
+
+    with open(path, "w") as f:
+        f.write(output + "\n")
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """
+    Creates a test database for the benchmark so that
+    the data of the configured database is not touched
+    """
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb
+    )
+
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+def create_subscribers(count, batch_size=2000):
+    """creates verified subscribers that are subscribed to the newsletter"""
+    from newsfeed.models import Subscriber
+
+    Subscriber.objects.bulk_create(
+        (
+            Subscriber(
+                email_address=f"subscriber{i}@example.com",
+                verified=True,
+                subscribed=True,
+            )
+            for i in range(count)
+        ),
+        batch_size=batch_size,
+    )
+
+
+def create_issues(issues=1, posts=50, categories=5, batch_size=2000):
+    """
+    Creates released issues with posts spread over categories
+
+    :return: list of the created issues
+    """
+    from newsfeed.models import Issue, Post, PostCategory
+
+    now = timezone.now()
+    category_list = PostCategory.objects.bulk_create(
+        PostCategory(name=f"Category {i}", order=i) for i in range(categories)
+    )
+    issue_list = Issue.objects.bulk_create(
+        Issue(
+            title=f"Issue {i}",
+            issue_number=i,
+            publish_date=now - timezone.timedelta(days=issues - i),
+            short_description="Benchmark issue",
+        )
+        for i in range(1, issues + 1)
+    )
+
+    Post.objects.bulk_create(
+        (
+            Post(
+                issue=issue,
+                category=category_list[i % categories],
+                title=f"Post {i} of issue {issue.issue_number}",
+                source_url=f"https://example.com/{issue.issue_number}/{i}/",
+                short_description="Short description of the post. " * 5,
+                order=i,
+            )
+            for issue in issue_list
+            for i in range(posts)
+        ),
+        batch_size=batch_size,
+    )
+
+    return issue_list
+
+
+class PhaseTimer:
+    """Adds up the time spent in each phase of a run over all threads"""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.totals[phase] += elapsed
+
+    def wrap(self, phase, func):
+        def timed(*args, **kwargs):
+            with self.measure(phase):
+                return func(*args, **kwargs)
+
+        return timed
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self._reply("220 newsfeed benchmark SMTP sink")
+
+        for line in iter(self.rfile.readline, b""):
+            command = line[:4].upper()
+
+            if command == b"DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                for data in iter(self.rfile.readline, b""):
+                    if data == b".\r\n":
+                        break
+                    size += len(data)
+                self.server.sink.add_message(size)
+                self._reply("250 OK")
+            elif command == b"QUIT":
+                self._reply("221 Bye")
+                return
+            elif command in (b"EHLO", b"HELO"):
+                self._reply("250 localhost")
+            else:
+                self._reply("250 OK")
+
+
+class _SMTPSinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    SMTP server on localhost that accepts and discards every message,
+    it only counts the messages and their size
+
+    Use it as a context manager, ``port`` is set once it is started.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.messages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def add_message(self, size):
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+
+    def reset(self):
+        with self._lock:
+            self.messages = 0
+            self.bytes = 0
+
+    def __enter__(self):
+        self._server = _SMTPSinkServer((self.host, self.port), _SMTPSinkHandler)
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,252 @@
+import email
+import json
+import logging
+import mailbox
+import os
+from email.errors import MessageError
+from email.utils import getaddresses, parseaddr
+
+logger = logging.getLogger(__name__)
+
+# Addresses are suppressed in chunks of this size
+INGEST_BATCH_SIZE = 1000
+
+
+def normalize_email(email_address):
+    """lowercases the domain of an address as it is stored for subscribers"""
+    local_part, _, domain = email_address.strip().rpartition("@")
+
+    if not local_part:
+        return None
+
+    return f"{local_part}@{domain.lower()}"
+
+
+def _get_report_parts(message, content_type):
+    return [part for part in message.walk() if part.get_content_type() == content_type]
+
+
+def _get_field_address(value):
+    """returns the address of a DSN field like ``rfc822; user@example.com``"""
+    if not value:
+        return None
+
+    _, _, address = str(value).rpartition(";")
+
+    return normalize_email(parseaddr(address.strip())[1] or address)
+
+
+def parse_dsn(message):
+    """
+    Returns the permanently failed recipients of a delivery status
+    notification (RFC 3464), soft bounces are ignored
+
+    :param message: ``email.message.Message``
+    :return: list of ``(email_address, reason)``
+    """
+    from newsfeed.models import Subscriber
+
+    recipients = []
+
+    for part in _get_report_parts(message, "message/delivery-status"):
+        # the first block has the per message fields,
+        # each next one the fields of a recipient
+        for fields in part.get_payload()[1:]:
+            action = (fields.get("Action") or "").strip().lower()
+            status = (fields.get("Status") or "").strip()
+
+            if action != "failed" or not status.startswith("5"):
+                continue
+
+            address = _get_field_address(
+                fields.get("Final-Recipient") or fields.get("Original-Recipient")
+            )
+            if address:
+                recipients.append((address, Subscriber.SuppressionReason.BOUNCE))
+
+    return recipients
+
+
+def parse_feedback_report(message):
+    """
+    Returns the recipients that complained in an abuse feedback report (RFC 5965)
+
+    :param message: ``email.message.Message``
+    :return: list of ``(email_address, reason)``
+    """
+    from newsfeed.models import Subscriber
+
+    recipients = []
+
+    for part in _get_report_parts(message, "message/feedback-report"):
+        for fields in part.get_payload():
+            feedback_type = (fields.get("Feedback-Type") or "").strip().lower()
+
+            if feedback_type not in ("", "abuse"):
+                continue
+
+            address = _get_field_address(fields.get("Original-Rcpt-To"))
+
+            if address is None:
+                # the newsletter was sent to the address of the complaint
+                original = _get_report_parts(message, "message/rfc822") or (
+                    _get_report_parts(message, "text/rfc822-headers")
+                )
+                address = _get_original_recipient(original[0]) if original else None
+
+            if address:
+                recipients.append((address, Subscriber.SuppressionReason.COMPLAINT))
+
+    return recipients
+
+
+def _get_original_recipient(part):
+    payload = part.get_payload()
+
+    if part.get_content_type() == "message/rfc822":
+        headers = payload[0] if isinstance(payload, list) else payload
+    else:
+        headers = email.message_from_string(part.get_payload(decode=True).decode())
+
+    addresses = getaddresses(headers.get_all("To", []))
+
+    return normalize_email(addresses[0][1]) if len(addresses) == 1 else None
+
+
+def parse_message(message):
+    """
+    Returns ``(email_address, reason)`` for the hard bounces
+    and complaints reported by an email message
+    """
+    if message.get_content_type() != "multipart/report":
+        return []
+
+    report_type = (message.get_param("report-type") or "").lower()
+
+    if report_type == "delivery-status":
+        return parse_dsn(message)
+    if report_type == "feedback-report":
+        return parse_feedback_report(message)
+
+    return []
+
+
+def ingest_mailbox(path, delete=False, batch_size=INGEST_BATCH_SIZE):
+    """
+    Suppresses the subscribers of the bounces and complaints
+    in a maildir directory or an mbox file
+
+    :param delete: remove the messages once the subscribers were suppressed
+    :return: number of messages read and subscribers suppressed
+    """
+    if os.path.isdir(path):
+        messages = mailbox.Maildir(path, factory=None, create=False)
+    else:
+        messages = mailbox.mbox(path, create=False)
+
+    messages.lock()
+
+    try:
+        keys = list(messages.iterkeys())
+        events = []
+
+        for key in keys:
+            try:
+                events += parse_message(messages[key])
+            except (KeyError, MessageError, TypeError, ValueError):
+                logger.exception("Could not read message %s of %s", key, path)
+
+        suppressed = ingest_suppressions(events, batch_size=batch_size)
+
+        if delete:
+            for key in keys:
+                messages.discard(key)
+            messages.flush()
+    finally:
+        messages.unlock()
+        messages.close()
+
+    return len(keys), suppressed
+
+
+def parse_notifications(data):
+    """
+    Returns ``(email_address, reason)`` for the hard bounces and complaints of
+    webhook notifications
+
+    Both Amazon SES notifications, delivered as they are or in their SNS
+    envelope, and a list of ``{"email": ..., "type": "bounce"|"complaint"}``
+    are understood.
+
+    :param data: decoded JSON of the notification or a list of them
+    """
+    from newsfeed.models import Subscriber
+
+    if isinstance(data, list):
+        return [event for item in data for event in parse_notifications(item)]
+
+    if not isinstance(data, dict):
+        return []
+
+    if isinstance(data.get("Message"), str):
+        # SNS envelope
+        try:
+            return parse_notifications(json.loads(data["Message"]))
+        except ValueError:
+            return []
+
+    events = []
+    notification_type = (
+        data.get("notificationType") or data.get("eventType") or data.get("type") or ""
+    ).lower()
+
+    if notification_type == "bounce" and "bounce" in data:
+        if data["bounce"].get("bounceType") == "Permanent":
+            events = [
+                (recipient.get("emailAddress"), Subscriber.SuppressionReason.BOUNCE)
+                for recipient in data["bounce"].get("bouncedRecipients", [])
+            ]
+    elif notification_type == "complaint" and "complaint" in data:
+        events = [
+            (recipient.get("emailAddress"), Subscriber.SuppressionReason.COMPLAINT)
+            for recipient in data["complaint"].get("complainedRecipients", [])
+        ]
+    elif notification_type in Subscriber.SuppressionReason.values:
+        events = [(data.get("email"), notification_type)]
+
+    return [
+        (normalize_email(address), reason)
+        for address, reason in events
+        if isinstance(address, str) and normalize_email(address)
+    ]
+
+
+def ingest_suppressions(events, batch_size=INGEST_BATCH_SIZE):
+    """
+    Suppresses the subscribers of the bounces and complaints in bulk
+
+    :param events: iterable of ``(email_address, reason)``
+    :return: number of subscribers that were suppressed
+    """
+    from newsfeed.models import Subscriber
+
+    suppressed = 0
+    pending = {reason: set() for reason in Subscriber.SuppressionReason.values}
+
+    def flush(reason):
+        nonlocal suppressed
+        suppressed += Subscriber.objects.suppress(pending[reason], reason)
+        pending[reason].clear()
+
+    for email_address, reason in events:
+        pending[reason].add(email_address)
+
+        if len(pending[reason]) >= batch_size:
+            flush(reason)
+
+    for reason in pending:
+        flush(reason)
+
+    logger.info("Suppressed %s subscriber(s)", suppressed)
+
+    return suppressed
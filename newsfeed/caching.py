@@ -0,0 +1,183 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+from newsfeed.app_settings import (
+    NEWSFEED_CACHE_ALIAS,
+    NEWSFEED_CACHE_TIMEOUT,
+    NEWSFEED_SUBSCRIBER_CACHE_TIMEOUT,
+)
+
+# Changing this version invalidates every cached issue page
+ISSUE_PAGES_VERSION_KEY = "newsfeed:issue_pages:version"
+
+
+def get_cache():
+    return caches[NEWSFEED_CACHE_ALIAS]
+
+
+def is_cache_shared():
+    """
+    Whether the cache is shared by all processes, a local memory
+    cache is only seen by the process that writes to it
+    """
+    return not isinstance(get_cache(), (DummyCache, LocMemCache))
+
+
+def get_issue_pages_version():
+    """returns the current version of the cached issue pages"""
+    cache = get_cache()
+    version = cache.get(ISSUE_PAGES_VERSION_KEY)
+
+    if version is None:
+        cache.add(ISSUE_PAGES_VERSION_KEY, 1, timeout=None)
+        version = cache.get(ISSUE_PAGES_VERSION_KEY, 1)
+
+    return version
+
+
+def invalidate_issue_pages():
+    """
+    Invalidates all cached issue pages
+
+    Pages are cached under the current version, so changing the version
+    makes every old entry unreachable without deleting keys one by one.
+    """
+    cache = get_cache()
+
+    try:
+        cache.incr(ISSUE_PAGES_VERSION_KEY)
+    except ValueError:
+        cache.set(ISSUE_PAGES_VERSION_KEY, 1, timeout=None)
+
+
+def get_issue_page_cache_key(name, *parts):
+    """
+    Returns the cache key of an issue page
+
+    :param name: name of the page
+    :param parts: values that identify the page, e.g. issue number and page
+    """
+    key_parts = [str(part) for part in parts]
+
+    return ":".join(
+        ["newsfeed", "issue_pages", str(get_issue_pages_version()), name, *key_parts]
+    )
+
+
+def get_issue_page_timeout():
+    """
+    Returns the number of seconds an issue page can be cached
+
+    Pages expire at the latest when the next scheduled issue is released,
+    as it changes the archive and the latest issue.
+    """
+    from newsfeed.models import Issue
+
+    now = timezone.now()
+    next_publish_date = (
+        Issue.objects.filter(is_draft=False, publish_date__gt=now)
+        .order_by("publish_date")
+        .values_list("publish_date", flat=True)
+        .first()
+    )
+
+    if next_publish_date is None:
+        return NEWSFEED_CACHE_TIMEOUT
+
+    return min(
+        NEWSFEED_CACHE_TIMEOUT,
+        int((next_publish_date - now).total_seconds()) + 1,
+    )
+
+
+def _get_subscriber_key(field, value):
+    return f"newsfeed:subscriber:{field}:{value}"
+
+
+def cache_subscriber(subscriber):
+    """
+    Caches the fields of a subscriber, call it after changing a subscriber
+    so that lookups see the change
+
+    The subscriber is cached by primary key, its token and email address
+    only point to the primary key so that deleting one key forgets it.
+    """
+    if not is_cache_shared():
+        return
+
+    data = {
+        field.attname: getattr(subscriber, field.attname)
+        for field in subscriber._meta.concrete_fields
+    }
+
+    get_cache().set_many(
+        {
+            _get_subscriber_key("pk", subscriber.pk): data,
+            _get_subscriber_key("token", subscriber.token): subscriber.pk,
+            _get_subscriber_key("email_address", subscriber.email_address.lower()): (
+                subscriber.pk
+            ),
+        },
+        timeout=NEWSFEED_SUBSCRIBER_CACHE_TIMEOUT,
+    )
+
+
+def forget_subscribers(subscriber_ids):
+    """removes subscribers that were changed in bulk from the cache"""
+    if not is_cache_shared():
+        return
+
+    get_cache().delete_many(
+        [_get_subscriber_key("pk", subscriber_id) for subscriber_id in subscriber_ids]
+    )
+
+
+def get_cached_subscriber(field, value):
+    """
+    Returns a subscriber from the cache or the database,
+    ``None`` if it does not exist
+
+    Subscribers are only cached in a cache shared by all processes,
+    other processes would not see the changes of a subscriber.
+
+    :param field: ``pk``, ``token`` or ``email_address``, addresses are
+        matched whatever the case they were stored with
+    :param value: value of the field
+    """
+    from newsfeed.models import Subscriber
+
+    subscribers = Subscriber.objects.all()
+
+    if field == "email_address":
+        value = value.lower()
+        # the subscriber who receives the newsletter is the one looked for
+        subscribers = subscribers.with_email_addresses([value]).order_by(
+            "-subscribed", "pk"
+        )
+    else:
+        subscribers = subscribers.filter(**{field: value})
+
+    if not is_cache_shared():
+        return subscribers.first()
+
+    cache = get_cache()
+    subscriber_id = (
+        value if field == "pk" else cache.get(_get_subscriber_key(field, value))
+    )
+
+    if subscriber_id is not None:
+        data = cache.get(_get_subscriber_key("pk", subscriber_id))
+
+        if data is not None:
+            return Subscriber.from_db(
+                Subscriber.objects.db, list(data), list(data.values())
+            )
+
+    subscriber = subscribers.first()
+
+    if subscriber is not None:
+        cache_subscriber(subscriber)
+
+    return subscriber
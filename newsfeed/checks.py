@@ -0,0 +1,34 @@
+from django.core.checks import Tags, Warning, register
+from django.core.cache.backends.locmem import LocMemCache
+
+from newsfeed.app_settings import (
+    NEWSFEED_CACHE_ALIAS,
+    NEWSFEED_CACHE_TIMEOUT,
+    NEWSFEED_SUBSCRIBER_CACHE_TIMEOUT,
+)
+from newsfeed.caching import get_cache
+
+
+@register(Tags.caches)
+def check_cache(app_configs, **kwargs):
+    """
+    Issue pages and subscribers are forgotten when they change, a local
+    memory cache would keep serving stale data in other processes
+    """
+    cache_timeout = NEWSFEED_CACHE_TIMEOUT or NEWSFEED_SUBSCRIBER_CACHE_TIMEOUT
+
+    if cache_timeout and isinstance(get_cache(), LocMemCache):
+        return [
+            Warning(
+                f"The {NEWSFEED_CACHE_ALIAS!r} cache is local to each process, "
+                "issue pages and subscribers are not cached.",
+                hint=(
+                    "Set NEWSFEED_CACHE_ALIAS to a cache shared by all processes, "
+                    "e.g. Redis or Memcached, or set NEWSFEED_CACHE_TIMEOUT and "
+                    "NEWSFEED_SUBSCRIBER_CACHE_TIMEOUT to 0."
+                ),
+                id="newsfeed.W001",
+            )
+        ]
+
+    return []
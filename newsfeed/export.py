@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, Max, Q
+from django.test import RequestFactory
+from django.urls import reverse
+
+from newsfeed.app_settings import NEWSFEED_ISSUE_POSTS_PER_PAGE
+
+# Name of the file that records what was exported in the output directory
+MANIFEST_NAME = ".newsfeed-export.json"
+
+
+def get_page_path(output_dir, url, page_number=1):
+    """
+    Returns the file a page is exported to
+
+    The files mirror the URLs, pages after the first one are written
+    to ``<url>page/<number>/index.html`` as static servers ignore
+    the ``?page=`` query string.
+    """
+    path = os.path.join(output_dir, url.lstrip("/"))
+
+    if page_number > 1:
+        path = os.path.join(path, "page", str(page_number))
+
+    return os.path.join(path, "index.html")
+
+
+def write_page(path, content):
+    """writes a page atomically so a server never reads half of it"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+
+    with open(temp_path, "wb") as f:
+        f.write(content)
+
+    os.replace(temp_path, path)
+
+
+def render_page(view, url, page_number=1, **kwargs):
+    """renders a page through its view as it is served to visitors"""
+    data = {"page": page_number} if page_number > 1 else {}
+    request = RequestFactory().get(url, data)
+    response = view(request, **kwargs)
+
+    if response.status_code != 200:
+        raise ValueError(f"{url} page {page_number} returned {response.status_code}")
+
+    if hasattr(response, "render"):
+        response.render()
+
+    return response.content
+
+
+def export_view_pages(output_dir, view, url, num_pages, **kwargs):
+    """
+    Writes every page of a paginated view and removes the pages
+    left from a previous export
+
+    :return: number of pages written
+    """
+    shutil.rmtree(os.path.join(output_dir, url.lstrip("/"), "page"), ignore_errors=True)
+
+    for page_number in range(1, num_pages + 1):
+        content = render_page(view, url, page_number, **kwargs)
+        write_page(get_page_path(output_dir, url, page_number), content)
+
+    return num_pages
+
+
+def export_issue(output_dir, issue_number):
+    """writes every page of a released issue"""
+    from newsfeed.models import Issue
+    from newsfeed.views import issue_detail_view
+
+    issue = Issue.objects.released().get(issue_number=issue_number)
+    paginator = Paginator(
+        range(issue.posts.visible().count()), NEWSFEED_ISSUE_POSTS_PER_PAGE
+    )
+
+    return export_view_pages(
+        output_dir,
+        issue_detail_view,
+        issue.get_absolute_url(),
+        paginator.num_pages,
+        issue_number=issue_number,
+    )
+
+
+def export_index_pages(output_dir):
+    """writes the latest issue page and every page of the issue archive"""
+    from newsfeed.models import Issue
+    from newsfeed.views import IssueListView, LatestIssueView, issue_list_view
+
+    latest_issue_url = reverse("newsfeed:latest_issue")
+    write_page(
+        get_page_path(output_dir, latest_issue_url),
+        render_page(LatestIssueView.as_view(), latest_issue_url),
+    )
+
+    paginator = Paginator(
+        range(Issue.objects.released().count()), IssueListView.paginate_by
+    )
+
+    return 1 + export_view_pages(
+        output_dir,
+        issue_list_view,
+        reverse("newsfeed:issue_list"),
+        paginator.num_pages,
+    )
+
+
+def get_categories_fingerprint():
+    """returns a fingerprint that changes when any category changes"""
+    from newsfeed.models import PostCategory
+
+    categories = list(PostCategory.objects.order_by("pk").values_list())
+
+    return hashlib.sha1(repr(categories).encode()).hexdigest()
+
+
+def get_issue_fingerprints():
+    """
+    Returns a fingerprint of each released issue that changes when
+    the issue or one of its posts is saved, added or deleted
+    """
+    from newsfeed.models import Issue
+
+    issues = (
+        Issue.objects.released()
+        .annotate(
+            posts_count=Count("posts", filter=Q(posts__is_visible=True)),
+            posts_updated_at=Max("posts__updated_at"),
+            all_posts_count=Count("posts"),
+        )
+        .values_list(
+            "issue_number",
+            "updated_at",
+            "posts_count",
+            "posts_updated_at",
+            "all_posts_count",
+        )
+    )
+
+    return {
+        str(issue_number): "|".join(str(value) for value in fingerprint)
+        for issue_number, *fingerprint in issues
+    }
+
+
+def read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(output_dir, manifest):
+    write_page(
+        os.path.join(output_dir, MANIFEST_NAME),
+        json.dumps(manifest, indent=2, sort_keys=True).encode(),
+    )
+
+
+def _setup_worker():
+    # workers started with "spawn" do not inherit the configured apps
+    django.setup()
+
+
+class StaticSiteExporter:
+    """
+    Exports the released issues, the issue archive and the latest
+    issue page to a directory of static HTML files
+
+    Issues are only written again when their fingerprint changed since
+    the export recorded in the manifest of the output directory.
+    Issues are rendered in a pool of processes.
+
+    :param output_dir: directory the pages are written to
+    :param processes: number of processes rendering the issues
+    :param full: write every issue even when it did not change
+    """
+
+    def __init__(self, output_dir, processes=None, full=False):
+        self.output_dir = output_dir
+        self.processes = processes
+        self.full = full
+
+    def get_changed_issues(self, manifest, fingerprints, categories):
+        if self.full or manifest.get("categories") != categories:
+            return list(fingerprints)
+
+        exported = manifest.get("issues", {})
+
+        return [
+            issue_number
+            for issue_number, fingerprint in fingerprints.items()
+            if exported.get(issue_number) != fingerprint
+        ]
+
+    def remove_issues(self, issue_numbers):
+        """removes the pages of issues that are no longer released"""
+        from newsfeed.models import Issue
+
+        for issue_number in issue_numbers:
+            url = Issue(issue_number=issue_number).get_absolute_url()
+            shutil.rmtree(
+                os.path.join(self.output_dir, url.lstrip("/")), ignore_errors=True
+            )
+
+    def export_issues(self, issue_numbers, exported):
+        """
+        Renders the issues in the process pool
+
+        :param exported: list the numbers of the written issues are added to
+        :return: number of pages written
+        """
+        pages_written = 0
+
+        if not issue_numbers:
+            return pages_written
+
+        # forked workers must not share the connections of this process
+        connections.close_all()
+
+        with ProcessPoolExecutor(
+            max_workers=self.processes, initializer=_setup_worker
+        ) as executor:
+            futures = {
+                executor.submit(export_issue, self.output_dir, issue_number): (
+                    issue_number
+                )
+                for issue_number in issue_numbers
+            }
+
+            for future in as_completed(futures):
+                pages_written += future.result()
+                exported.append(futures[future])
+
+        return pages_written
+
+    def export(self):
+        """
+        Exports the site and updates the manifest
+
+        :return: dict with the number of issues exported, removed and
+            skipped and the number of pages written
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        manifest = read_manifest(self.output_dir)
+        fingerprints = get_issue_fingerprints()
+        categories = get_categories_fingerprint()
+
+        changed = self.get_changed_issues(manifest, fingerprints, categories)
+        removed = set(manifest.get("issues", {})) - set(fingerprints)
+        self.remove_issues(removed)
+
+        unchanged = {
+            issue_number: fingerprints[issue_number]
+            for issue_number in set(fingerprints) - set(changed)
+        }
+        exported = []
+
+        try:
+            pages_written = self.export_issues(changed, exported)
+        finally:
+            # issues written before a failure are not exported again
+            unchanged.update(
+                (issue_number, fingerprints[issue_number]) for issue_number in exported
+            )
+            write_manifest(
+                self.output_dir, {"categories": categories, "issues": unchanged}
+            )
+
+        pages_written += export_index_pages(self.output_dir)
+
+        return {
+            "exported": len(exported),
+            "removed": len(removed),
+            "skipped": len(fingerprints) - len(changed),
+            "pages": pages_written,
+        }
@@ -1,5 +1,10 @@
 from django import forms
 
+from newsfeed.bounces import normalize_email
+
 
 class SubscriberEmailForm(forms.Form):
     email_address = forms.EmailField()
+
+    def clean_email_address(self):
+        return normalize_email(self.cleaned_data["email_address"])
@@ -0,0 +1,201 @@
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.core.mail.message import (
+    DNS_NAME,
+    forbid_multi_line_headers,
+    formatdate,
+    make_msgid,
+)
+
+# Headers that are different for each recipient of a newsletter
+RECIPIENT_HEADERS = ("To", "Date", "Message-ID", "List-Unsubscribe")
+
+# Stands for the token of the subscriber in the rendered newsletter,
+# it is a valid UUID so that unsubscribe URLs can be reversed with it
+UNSUBSCRIBE_TOKEN_PLACEHOLDER = uuid.UUID(int=0)
+
+
+class PreEncodedMIMEMessage:
+    """
+    MIME message made of per-recipient headers and a shared encoded payload
+
+    Implements the part of ``email.message.Message`` used by
+    the Django email backends to serialize a message.
+    """
+
+    def __init__(self, headers, message_factory, token=None):
+        self.headers = headers
+        self.message_factory = message_factory
+        self.token = token
+
+    def __getitem__(self, name):
+        for header, value in self.headers:
+            if header.lower() == name.lower():
+                return value
+
+        return self.message_factory.template[name]
+
+    def get_charset(self):
+        return self.message_factory.template.get_charset()
+
+    def as_bytes(self, unixfrom=False, linesep="\n"):
+        headers = "".join(
+            f"{header}: {value}{linesep}" for header, value in self.headers
+        )
+
+        return headers.encode("ascii") + self.message_factory.get_payload(
+            linesep, token=self.token
+        )
+
+    def as_string(self, unixfrom=False, linesep="\n"):
+        return self.as_bytes(linesep=linesep).decode(
+            self.message_factory.encoding, errors="surrogateescape"
+        )
+
+    def __bytes__(self):
+        return self.as_bytes()
+
+    def __str__(self):
+        return self.as_string()
+
+
+class NewsletterEmailMessage(EmailMessage):
+    """EmailMessage that reuses the encoded payload of its newsletter"""
+
+    def __init__(self, message_factory, to_email, subscriber_id=None, token=None):
+        super().__init__(
+            subject=message_factory.subject,
+            body=message_factory.html,
+            from_email=message_factory.from_email,
+            to=[to_email],
+        )
+        self.content_subtype = "html"
+        self.message_factory = message_factory
+        self.subscriber_id = subscriber_id
+        self.token = token
+
+    def get_recipient_headers(self):
+        """returns the headers that are different for each recipient"""
+        name, to = forbid_multi_line_headers(
+            "To", ", ".join(str(email) for email in self.to), self.encoding
+        )
+
+        headers = [
+            (name, to),
+            ("Date", formatdate(localtime=settings.EMAIL_USE_LOCALTIME)),
+            ("Message-ID", make_msgid(domain=DNS_NAME)),
+        ]
+
+        unsubscribe_url = self.message_factory.get_unsubscribe_url(self.token)
+        if unsubscribe_url:
+            headers.append(("List-Unsubscribe", f"<{unsubscribe_url}>"))
+
+        return headers
+
+    def message(self):
+        return PreEncodedMIMEMessage(
+            self.get_recipient_headers(), self.message_factory, token=self.token
+        )
+
+
+class NewsletterMessageFactory:
+    """
+    Builds the email messages of a newsletter
+
+    The newsletter is turned into a MIME message and encoded only once,
+    each recipient's message then only adds its own ``To``, ``Date``,
+    ``Message-ID`` and ``List-Unsubscribe`` headers in front of the
+    shared payload.
+
+    Links of the html made with ``UNSUBSCRIBE_TOKEN_PLACEHOLDER`` are
+    personalized by replacing the placeholder with the token of the
+    subscriber in the encoded payload.
+    """
+
+    message_class = NewsletterEmailMessage
+
+    def __init__(self, subject, html, from_email, unsubscribe_url=None):
+        """
+        :param unsubscribe_url: absolute one-click unsubscribe URL
+            made with ``UNSUBSCRIBE_TOKEN_PLACEHOLDER``
+        """
+        self.subject = subject
+        self.html = html
+        self.from_email = from_email
+        self.unsubscribe_url = unsubscribe_url
+        self.encoding = settings.DEFAULT_CHARSET
+
+        self.template = self._get_template(html)
+        for header in RECIPIENT_HEADERS:
+            del self.template[header]
+
+        self._placeholder = str(UNSUBSCRIBE_TOKEN_PLACEHOLDER)
+        self._placeholder_count = html.count(self._placeholder)
+        # encoded payload for each line separator
+        self._payloads = {}
+        # whether the placeholders survived the encoding for each line separator
+        self._substitutable = {}
+
+    def _get_template(self, html):
+        headers = {}
+        if self.unsubscribe_url:
+            # RFC 8058, mail clients unsubscribe with a POST to the URL
+            headers["List-Unsubscribe-Post"] = "List-Unsubscribe=One-Click"
+
+        message = EmailMessage(
+            subject=self.subject,
+            body=html,
+            from_email=self.from_email,
+            to=[self.from_email],
+            headers=headers,
+        )
+        message.content_subtype = "html"
+
+        return message.message()
+
+    def get_unsubscribe_url(self, token):
+        """returns the unsubscribe URL of a subscriber"""
+        if not self.unsubscribe_url or token is None:
+            return None
+
+        return self.unsubscribe_url.replace(self._placeholder, str(token))
+
+    def get_payload(self, linesep="\n", token=None):
+        """
+        Returns the encoded headers and body shared by all recipients
+
+        :param token: token of the subscriber the links are personalized for
+        """
+        payload = self._payloads.get(linesep)
+
+        if payload is None:
+            payload = self._payloads[linesep] = self.template.as_bytes(linesep=linesep)
+            self._substitutable[linesep] = (
+                payload.count(self._placeholder.encode("ascii"))
+                == self._placeholder_count
+            )
+
+        if token is None or not self._placeholder_count:
+            return payload
+
+        token = str(token)
+
+        if self._substitutable[linesep]:
+            return payload.replace(
+                self._placeholder.encode("ascii"), token.encode("ascii")
+            )
+
+        # a placeholder was split by the encoding, e.g. quoted-printable
+        # wraps bodies with long lines, so this message is encoded on its own
+        template = self._get_template(self.html.replace(self._placeholder, token))
+        for header in RECIPIENT_HEADERS:
+            del template[header]
+
+        return template.as_bytes(linesep=linesep)
+
+    def __call__(self, to_email, subscriber_id=None, token=None):
+        return self.message_class(
+            self, to_email, subscriber_id=subscriber_id, token=token
+        )
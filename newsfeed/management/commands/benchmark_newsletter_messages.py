@@ -0,0 +1,122 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.core.management.base import BaseCommand
+
+from newsfeed.mail import NewsletterMessageFactory
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares CPU time and memory allocated while encoding newsletter "
+        "emails one EmailMessage at a time and with NewsletterMessageFactory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipients",
+            type=int,
+            default=10000,
+            help="Number of recipients to build messages for",
+        )
+        parser.add_argument(
+            "--body-size",
+            type=int,
+            default=20000,
+            help="Size of the newsletter HTML body in characters",
+        )
+
+    @staticmethod
+    def _get_html(body_size):
+        post = (
+            "<li><h5><a href='https://example.com/post/'>Post title</a></h5>"
+            "<p>Short description of the post with some ünïcödé text.</p></li>\n"
+        )
+        return "<html><body><ul>\n%s</ul></body></html>" % (
+            post * (body_size // len(post) + 1)
+        )
+
+    @staticmethod
+    def _get_email_message_encoder(subject, html, from_email):
+        def encode(to_email):
+            message = EmailMessage(
+                subject=subject, body=html, from_email=from_email, to=[to_email]
+            )
+            message.content_subtype = "html"
+            return message.message().as_bytes(linesep="\r\n")
+
+        return encode
+
+    @staticmethod
+    def _get_message_factory_encoder(subject, html, from_email):
+        message_factory = NewsletterMessageFactory(
+            subject=subject, html=html, from_email=from_email
+        )
+
+        def encode(to_email):
+            return message_factory(to_email).message().as_bytes(linesep="\r\n")
+
+        return encode
+
+    @staticmethod
+    def _measure(get_encoder, recipients, *args):
+        """
+        Returns the CPU time spent encoding the messages and
+        the memory allocated while encoding each message
+        """
+        started = time.process_time()
+        encode = get_encoder(*args)
+        for to_email in recipients:
+            encode(to_email)
+        cpu_time = time.process_time() - started
+
+        # measure memory in a second run as tracing slows down allocations
+        tracemalloc.start()
+        allocated = 0
+        encode = get_encoder(*args)
+        for to_email in recipients:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            encode(to_email)
+            _, peak = tracemalloc.get_traced_memory()
+            allocated += peak - before
+        tracemalloc.stop()
+
+        return cpu_time, allocated
+
+    def handle(self, *args, **options):
+        html = self._get_html(options["body_size"])
+        recipients = [
+            f"subscriber{i}@example.com" for i in range(options["recipients"])
+        ]
+        subject = "Newsletter benchmark"
+        from_email = settings.EMAIL_HOST_USER
+
+        self.stdout.write(
+            f"Encoding {len(recipients)} messages "
+            f"with a {len(html.encode())} bytes body"
+        )
+
+        results = {}
+        for name, get_encoder in (
+            ("EmailMessage", self._get_email_message_encoder),
+            ("NewsletterMessageFactory", self._get_message_factory_encoder),
+        ):
+            cpu_time, allocated = self._measure(
+                get_encoder, recipients, subject, html, from_email
+            )
+            results[name] = cpu_time
+
+            self.stdout.write(
+                f"{name}: {cpu_time:.3f}s CPU, "
+                f"{allocated / 1024 / 1024:.1f} MiB allocated "
+                f"({allocated / max(len(recipients), 1) / 1024:.1f} KiB per message)"
+            )
+
+        if results["NewsletterMessageFactory"]:
+            speedup = results["EmailMessage"] / results["NewsletterMessageFactory"]
+            self.stdout.write(
+                self.style.SUCCESS(f"NewsletterMessageFactory is {speedup:.1f}x faster")
+            )
@@ -0,0 +1,201 @@
+import time
+
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from newsfeed.benchmarks import (
+    PhaseTimer,
+    SMTPSink,
+    benchmark_database,
+    create_issues,
+    create_subscribers,
+    get_environment,
+    get_peak_rss,
+    write_results,
+)
+from newsfeed.ratelimit import get_rate_limiter
+from newsfeed.utils import NewsletterEmailSender
+
+BACKENDS = {
+    "smtp": "django.core.mail.backends.smtp.EmailBackend",
+    "locmem": "django.core.mail.backends.locmem.EmailBackend",
+}
+
+
+class BenchmarkNewsletterEmailSender(NewsletterEmailSender):
+    """
+    NewsletterEmailSender that measures the time spent rendering the
+    newsletter, sending the messages and writing them to the SMTP socket
+    """
+
+    def __init__(self, timer, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timer = timer
+
+    def _render_newsletter(self, newsletter):
+        with self.timer.measure("render"):
+            return super()._render_newsletter(newsletter)
+
+    def _get_connection(self):
+        connection = super()._get_connection()
+
+        if not getattr(connection, "benchmark_timed", False):
+            connection.benchmark_timed = True
+            connection.send_messages = self.timer.wrap("send", connection.send_messages)
+
+            # smtplib connection of the SMTP backend
+            smtp = getattr(connection, "connection", None)
+            if smtp is not None:
+                smtp.sendmail = self.timer.wrap("wire", smtp.sendmail)
+
+        return connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks NewsletterEmailSender in a test database against a local "
+        "SMTP sink and the locmem backend, reports messages/sec, peak RSS, "
+        "queries and the time spent rendering and on the wire as JSON. "
+        "Phase times are added up over the worker threads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--subscribers",
+            type=int,
+            default=1000,
+            help="Number of subscribers the newsletter is sent to",
+        )
+        parser.add_argument(
+            "--posts",
+            type=int,
+            default=50,
+            help="Number of posts in the issue",
+        )
+        parser.add_argument(
+            "--backend",
+            action="append",
+            choices=sorted(BACKENDS),
+            help="Email backend to benchmark, can be repeated (default: all)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of SMTP worker threads",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of messages in each batch",
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File the JSON results are written to, - writes to stdout",
+        )
+
+    def _send(self, issue, backend, options):
+        """sends a newsletter for the issue and returns the measurements"""
+        from newsfeed.models import IssueSnapshot, Newsletter
+
+        # render the newsletter as on the first send of an issue
+        IssueSnapshot.objects.filter(issue=issue).delete()
+        newsletter = Newsletter.objects.create(issue=issue, subject=issue.title)
+        mail.outbox = []
+
+        timer = PhaseTimer()
+        sender = BenchmarkNewsletterEmailSender(
+            timer,
+            newsletters=Newsletter.objects.filter(pk=newsletter.pk),
+            respect_schedule=False,
+            workers=options["workers"],
+        )
+        # measure the sender, not the configured throttling
+        sender.batch_size = options["batch_size"]
+        sender.per_batch_wait = 0
+        sender.rate_limiter = get_rate_limiter(rate=0)
+
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            with timer.measure("database"):
+                return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            sender.send_emails()
+        elapsed = time.perf_counter() - started
+
+        messages = newsletter.deliveries.count()
+        mail.outbox = []
+
+        send = timer.totals["send"]
+        wire = timer.totals["wire"]
+
+        return {
+            "messages": messages,
+            "seconds": round(elapsed, 4),
+            "messages_per_second": round(messages / elapsed, 1) if elapsed else None,
+            "peak_rss_bytes": get_peak_rss(),
+            # queries of the thread reading subscribers and logging deliveries
+            "queries": queries,
+            "render_seconds": round(timer.totals["render"], 4),
+            "encode_seconds": round(send - wire, 4),
+            "wire_seconds": round(wire, 4),
+            "database_seconds": round(timer.totals["database"], 4),
+        }
+
+    def handle(self, *args, **options):
+        if options["subscribers"] < 1:
+            raise CommandError("--subscribers must be greater than 0.")
+
+        backends = options["backend"] or sorted(BACKENDS)
+        results = {
+            "benchmark": "newsletter_send",
+            "environment": get_environment(),
+            "parameters": {
+                "subscribers": options["subscribers"],
+                "posts": options["posts"],
+                "workers": options["workers"],
+                "batch_size": options["batch_size"],
+            },
+            "results": {},
+        }
+
+        with benchmark_database(), SMTPSink() as sink:
+            create_subscribers(options["subscribers"])
+            (issue,) = create_issues(issues=1, posts=options["posts"])
+
+            for backend in backends:
+                sink.reset()
+
+                with override_settings(
+                    EMAIL_BACKEND=BACKENDS[backend],
+                    EMAIL_HOST=sink.host,
+                    EMAIL_PORT=sink.port,
+                    EMAIL_HOST_USER="newsletter@example.com",
+                    EMAIL_HOST_PASSWORD="",
+                    EMAIL_USE_TLS=False,
+                    EMAIL_USE_SSL=False,
+                ):
+                    result = self._send(issue, backend, options)
+
+                if backend == "smtp":
+                    result["sink_messages"] = sink.messages
+                    result["sink_bytes"] = sink.bytes
+
+                results["results"][backend] = result
+
+                self.stderr.write(
+                    f"{backend}: {result['messages']} messages in "
+                    f"{result['seconds']:.2f}s "
+                    f"({result['messages_per_second']} messages/sec)"
+                )
+
+        write_results(options["output"], results)
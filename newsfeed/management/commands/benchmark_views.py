@@ -0,0 +1,184 @@
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from newsfeed.app_settings import NEWSFEED_CACHE_ALIAS, NEWSFEED_ISSUE_POSTS_PER_PAGE
+from newsfeed.benchmarks import (
+    benchmark_database,
+    create_issues,
+    get_environment,
+    percentile,
+    write_results,
+)
+from newsfeed.views import IssueListView
+
+# pages are only cached in a cache shared between processes
+CACHES = {
+    "uncached": "django.core.cache.backends.dummy.DummyCache",
+    "cached": "django.core.cache.backends.filebased.FileBasedCache",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks IssueListView, IssueDetailView and LatestIssueView in a "
+        "test database with generated issues, reports p50/p99 latency and "
+        "queries per request with and without the page cache as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--issues",
+            type=int,
+            default=1000,
+            help="Number of released issues",
+        )
+        parser.add_argument(
+            "--posts",
+            type=int,
+            default=50,
+            help="Number of posts in each issue",
+        )
+        parser.add_argument(
+            "--categories",
+            type=int,
+            default=20,
+            help="Number of post categories",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Number of requests made to each view",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the random pages requested",
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File the JSON results are written to, - writes to stdout",
+        )
+
+    def _get_urls(self, options):
+        """returns the urls requested from each view"""
+        rng = random.Random(options["seed"])
+        requests = options["requests"]
+        issue_list_url = reverse("newsfeed:issue_list")
+        list_pages = -(-options["issues"] // IssueListView.paginate_by)
+        post_pages = max(-(-options["posts"] // NEWSFEED_ISSUE_POSTS_PER_PAGE), 1)
+
+        def issue_url():
+            return reverse(
+                "newsfeed:issue_detail",
+                kwargs={"issue_number": rng.randint(1, options["issues"])},
+            )
+
+        issue_urls = [issue_url() for _ in range(requests)]
+
+        return {
+            "issue_list": [
+                f"{issue_list_url}?page={rng.randint(1, list_pages)}"
+                for _ in range(requests)
+            ],
+            # most issues are rendered for the first time
+            "issue_detail": issue_urls,
+            "issue_detail_repeat": issue_urls,
+            "issue_detail_page": [
+                f"{issue_url()}?page={rng.randint(1, post_pages)}"
+                for _ in range(requests)
+            ],
+            "latest_issue": [reverse("newsfeed:latest_issue")] * requests,
+        }
+
+    @staticmethod
+    def _measure(client, urls):
+        """requests the urls and returns the latency and query statistics"""
+        latencies = []
+        query_counts = []
+
+        for url in urls:
+            queries = 0
+
+            def count_queries(execute, sql, params, many, context):
+                nonlocal queries
+                queries += 1
+                return execute(sql, params, many, context)
+
+            started = time.perf_counter()
+            with connection.execute_wrapper(count_queries):
+                response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+            query_counts.append(queries)
+
+            if response.status_code != 200:
+                raise CommandError(f"{url} returned {response.status_code}")
+
+        return {
+            "requests": len(urls),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "queries_p50": percentile(query_counts, 50),
+            "queries_max": max(query_counts),
+        }
+
+    def handle(self, *args, **options):
+        if options["issues"] < 1 or options["requests"] < 1:
+            raise CommandError("--issues and --requests must be greater than 0.")
+
+        results = {
+            "benchmark": "views",
+            "environment": get_environment(),
+            "parameters": {
+                "issues": options["issues"],
+                "posts": options["posts"],
+                "categories": options["categories"],
+                "requests": options["requests"],
+                "seed": options["seed"],
+            },
+            "results": {},
+        }
+
+        with benchmark_database(), tempfile.TemporaryDirectory() as cache_dir:
+            from newsfeed.models import IssueSnapshot
+
+            create_issues(
+                issues=options["issues"],
+                posts=options["posts"],
+                categories=max(options["categories"], 1),
+            )
+            client = Client()
+
+            for mode, backend in CACHES.items():
+                # issues are rendered again as after a change
+                IssueSnapshot.objects.all().delete()
+                caches = {
+                    NEWSFEED_CACHE_ALIAS: {"BACKEND": backend, "LOCATION": cache_dir}
+                }
+
+                with override_settings(
+                    CACHES=caches,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                ):
+                    for view, urls in self._get_urls(options).items():
+                        result = self._measure(client, urls)
+                        results["results"][f"{view}:{mode}"] = result
+
+                        self.stderr.write(
+                            f"{view} ({mode}): p50 {result['p50_ms']}ms, "
+                            f"p99 {result['p99_ms']}ms, "
+                            f"{result['queries_p50']} queries"
+                        )
+
+        write_results(options["output"], results)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from newsfeed.export import StaticSiteExporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the released issues, the issue archive and the latest issue "
+        "page to a directory of static HTML files. Only the issues that "
+        "changed since the last export are written again. Pages after the "
+        "first one are written to <url>page/<number>/index.html, rewrite "
+        "?page=<number> to that path on the web server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output_dir", help="Directory the pages are written to")
+        parser.add_argument(
+            "--processes",
+            type=int,
+            help="Number of processes rendering the issues",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Write every issue even when it did not change",
+        )
+
+    def handle(self, *args, **options):
+        exporter = StaticSiteExporter(
+            options["output_dir"],
+            processes=options["processes"],
+            full=options["full"],
+        )
+        result = exporter.export()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Exported {exported} issues ({pages} pages), removed {removed} "
+                "and skipped {skipped} unchanged issues.".format(**result)
+            )
+        )
@@ -0,0 +1,109 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from newsfeed.models import Subscriber
+
+FIELDS = (
+    "email_address",
+    "token",
+    "verified",
+    "subscribed",
+    "verification_sent_date",
+    "created_at",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams subscribers to a CSV or JSONL file, "
+        "rows are read in chunks so memory stays constant"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to write, - writes to stdout")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "jsonl"),
+            help="File format, detected from the extension by default",
+        )
+        parser.add_argument(
+            "--subscribed-only",
+            action="store_true",
+            help="Only export verified subscribers that are subscribed",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of subscribers read from the database at a time",
+        )
+
+    @staticmethod
+    def _get_format(path, file_format):
+        if file_format:
+            return file_format
+        return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+    @staticmethod
+    def _serialize(value):
+        """returns the CSV form of a value, JSONL keeps the JSON types"""
+        if value is None:
+            return ""
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        return str(value)
+
+    def _write_rows(self, f, file_format, rows):
+        if file_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+
+        count = 0
+
+        for row in rows:
+            if file_format == "csv":
+                writer.writerow([self._serialize(value) for value in row])
+            else:
+                f.write(json.dumps(dict(zip(FIELDS, row)), cls=DjangoJSONEncoder))
+                f.write("\n")
+
+            count += 1
+
+        return count
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = self._get_format(path, options["format"])
+
+        subscribers = Subscriber.objects.all()
+        if options["subscribed_only"]:
+            subscribers = subscribers.subscribed()
+
+        rows = (
+            subscribers.order_by("pk")
+            .values_list(*FIELDS)
+            .iterator(chunk_size=options["chunk_size"])
+        )
+
+        started_at = time.perf_counter()
+
+        if path == "-":
+            count = self._write_rows(sys.stdout, file_format, rows)
+            # keep stdout for the exported rows
+            self.stdout = self.stderr
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                count = self._write_rows(f, file_format, rows)
+
+        elapsed = time.perf_counter() - started_at
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Exported {count} subscribers in {elapsed:.2f}s "
+                f"({count / elapsed if elapsed else 0:.0f} rows/sec)."
+            )
+        )
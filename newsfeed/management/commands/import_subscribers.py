@@ -0,0 +1,178 @@
+import csv
+import json
+import sys
+import time
+import uuid
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+
+from newsfeed.models import Subscriber
+
+TRUE_VALUES = ("1", "true", "t", "yes", "y")
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams subscribers from a CSV or JSONL file and inserts them in "
+        "batches, addresses that already exist are skipped. CSV files need "
+        "a header row, JSONL files one object per line. The verified, "
+        "subscribed and token columns are optional."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to read, - reads from stdin")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "jsonl"),
+            help="File format, detected from the extension by default",
+        )
+        parser.add_argument(
+            "--email-column",
+            default="email_address",
+            help="Name of the column containing the email addresses",
+        )
+        parser.add_argument(
+            "--subscribed",
+            action="store_true",
+            help=(
+                "Import subscribers as verified and subscribed "
+                "when the file does not say otherwise"
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of subscribers inserted with one query",
+        )
+
+    @staticmethod
+    def _get_format(path, file_format):
+        if file_format:
+            return file_format
+        return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+    @staticmethod
+    def _read_rows(f, file_format):
+        if file_format == "csv":
+            yield from csv.DictReader(f)
+            return
+
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+    @staticmethod
+    def _get_bool(row, column, default):
+        value = row.get(column)
+
+        if value is None or value == "":
+            return default
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in TRUE_VALUES
+
+    @staticmethod
+    def _get_token(row):
+        try:
+            return uuid.UUID(str(row["token"]))
+        except (KeyError, ValueError):
+            return uuid.uuid4()
+
+    def _build_subscriber(self, row, options):
+        """returns an unsaved Subscriber or ``None`` when the row is invalid"""
+        email_address = (row.get(options["email_column"]) or "").strip()
+
+        try:
+            validate_email(email_address)
+        except ValidationError:
+            return None
+
+        # the domain part of an address is case insensitive
+        local_part, domain = email_address.rsplit("@", 1)
+        verified = self._get_bool(row, "verified", options["subscribed"])
+
+        return Subscriber(
+            email_address=f"{local_part}@{domain.lower()}",
+            token=self._get_token(row),
+            verified=verified,
+            subscribed=verified
+            and self._get_bool(row, "subscribed", options["subscribed"]),
+        )
+
+    def _import_batch(self, subscribers):
+        """
+        Inserts a batch of subscribers
+
+        :return: number of subscribers inserted
+        """
+        # duplicates in the batch would count as inserted
+        subscribers = list(
+            {
+                subscriber.email_address: subscriber for subscriber in subscribers
+            }.values()
+        )
+        existing = Subscriber.objects.filter(
+            email_address__in=[subscriber.email_address for subscriber in subscribers]
+        ).count()
+
+        Subscriber.objects.bulk_create(subscribers, ignore_conflicts=True)
+
+        return len(subscribers) - existing
+
+    def _import(self, f, file_format, options):
+        rows = self._read_rows(f, file_format)
+        counts = {"read": 0, "invalid": 0, "inserted": 0}
+
+        while True:
+            batch = list(islice(rows, options["batch_size"]))
+            if not batch:
+                return counts
+
+            subscribers = []
+
+            for row in batch:
+                subscriber = self._build_subscriber(row, options)
+                if subscriber is None:
+                    counts["invalid"] += 1
+                else:
+                    subscribers.append(subscriber)
+
+            counts["read"] += len(batch)
+            counts["inserted"] += self._import_batch(subscribers)
+
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Read {counts['read']} rows")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = self._get_format(path, options["format"])
+
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be greater than 0.")
+
+        started_at = time.perf_counter()
+
+        try:
+            if path == "-":
+                counts = self._import(sys.stdin, file_format, options)
+            else:
+                with open(path, newline="", encoding="utf-8") as f:
+                    counts = self._import(f, file_format, options)
+        except (OSError, ValueError, csv.Error) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        elapsed = time.perf_counter() - started_at
+        rate = counts["read"] / elapsed if elapsed else 0
+        skipped = counts["read"] - counts["invalid"] - counts["inserted"]
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Read {counts['read']} rows in {elapsed:.2f}s ({rate:.0f} rows/sec): "
+                f"inserted {counts['inserted']}, skipped {skipped} existing "
+                f"or duplicate and {counts['invalid']} invalid addresses."
+            )
+        )
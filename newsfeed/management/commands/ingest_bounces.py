@@ -0,0 +1,80 @@
+import json
+import mailbox
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from newsfeed.bounces import (
+    INGEST_BATCH_SIZE,
+    ingest_mailbox,
+    ingest_suppressions,
+    parse_notifications,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Suppresses the subscribers of hard bounces and spam complaints read "
+        "from maildir directories, mbox files or JSON webhook notifications "
+        "(Amazon SES or a list of {email, type} objects). Newsletters are not "
+        "sent to suppressed subscribers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help="Maildir directory, mbox file or .json file, - reads JSON from stdin",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Remove the messages from the mailboxes once they were read",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=INGEST_BATCH_SIZE,
+            help="Number of addresses suppressed with one query",
+        )
+
+    def _ingest_json(self, path, batch_size):
+        try:
+            if path == "-":
+                data = json.load(sys.stdin)
+            else:
+                with open(path) as f:
+                    data = json.load(f)
+        except ValueError as e:
+            raise CommandError(f"{path} is not valid JSON: {e}")
+
+        return ingest_suppressions(parse_notifications(data), batch_size=batch_size)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be greater than 0.")
+
+        suppressed = 0
+
+        for path in options["paths"]:
+            if path == "-" or path.endswith(".json"):
+                suppressed += self._ingest_json(path, options["batch_size"])
+                continue
+
+            if not os.path.exists(path):
+                raise CommandError(f"{path} does not exist.")
+
+            try:
+                messages, path_suppressed = ingest_mailbox(
+                    path,
+                    delete=options["delete"],
+                    batch_size=options["batch_size"],
+                )
+            except mailbox.Error as e:
+                raise CommandError(f"Could not read {path}: {e}")
+
+            suppressed += path_suppressed
+            self.stderr.write(f"Read {messages} messages from {path}")
+
+        self.stdout.write(self.style.SUCCESS(f"Suppressed {suppressed} subscribers."))
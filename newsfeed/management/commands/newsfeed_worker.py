@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from newsfeed.tasks import claim_task, run_task
+
+
+class Command(BaseCommand):
+    help = "Runs newsfeed tasks queued by the DatabaseTaskBackend"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait before checking again when the queue is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the pending tasks and exit",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Waiting for newsfeed tasks...")
+
+        try:
+            while True:
+                close_old_connections()
+                task = claim_task()
+
+                if task is None:
+                    if options["once"]:
+                        return
+                    time.sleep(options["sleep"])
+                    continue
+
+                self.stdout.write(f"Running task {task.pk}: {task.name}")
+                task = run_task(task.pk)
+                self.stdout.write(f"Task {task.pk} {task.get_status_display().lower()}")
+        except KeyboardInterrupt:
+            self.stdout.write("Worker stopped.")
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from newsfeed.app_settings import NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS
+from newsfeed.models import Subscriber
+from newsfeed.utils import purge_expired_subscribers
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes unverified subscribers whose verification email was sent more "
+        "than NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS days ago, in chunks that "
+        "are committed separately"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of subscribers deleted in a transaction",
+        )
+        parser.add_argument(
+            "--chunk-wait",
+            type=float,
+            default=0,
+            help="Seconds to wait between chunks to let other queries through",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the expired subscribers",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be greater than 0.")
+
+        if options["dry_run"]:
+            count = Subscriber.objects.verification_expired().count()
+            self.stdout.write(
+                f"{count} subscribers have not been verified in "
+                f"{NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS} days."
+            )
+            return
+
+        deleted_subscribers = purge_expired_subscribers(
+            chunk_size=options["chunk_size"],
+            chunk_wait=options["chunk_wait"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted_subscribers} expired subscribers.")
+        )
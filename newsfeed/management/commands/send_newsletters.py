@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from newsfeed.utils import send_email_newsletter
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends the newsletters whose schedule has passed. "
+        "Run it as N processes with --shard-count N and a different "
+        "--shard-index each to split the subscribers between them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--shard-count",
+            type=int,
+            default=1,
+            help="Number of processes sending the newsletters",
+        )
+        parser.add_argument(
+            "--shard-index",
+            type=int,
+            default=0,
+            help=(
+                "Index of this process, it sends to the subscribers "
+                "with pk %% shard count == shard index"
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of SMTP worker threads of this process",
+        )
+        parser.add_argument(
+            "--no-resume",
+            action="store_false",
+            dest="resume",
+            help="Send to subscribers that already received the newsletter",
+        )
+
+    def handle(self, *args, **options):
+        shard_count = options["shard_count"]
+        shard_index = options["shard_index"]
+
+        if shard_count < 1 or not 0 <= shard_index < shard_count:
+            raise CommandError("--shard-index must be between 0 and --shard-count - 1.")
+
+        self.stdout.write(
+            f"Sending newsletters as shard {shard_index} of {shard_count}"
+        )
+
+        send_email_newsletter(
+            workers=options["workers"],
+            resume=options["resume"],
+            shard=(shard_index, shard_count) if shard_count > 1 else None,
+        )
+
+        self.stdout.write(self.style.SUCCESS("Newsletters sent."))
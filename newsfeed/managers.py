@@ -1,6 +1,19 @@
+from itertools import groupby
+
 from django.db import models
+from django.db import transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
 
+from newsfeed import signals
+from newsfeed.app_settings import NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS
+from newsfeed.app_settings import NEWSFEED_EMAIL_RECIPIENT_PAGE_SIZE
+from newsfeed.bounces import normalize_email
+from newsfeed.caching import forget_subscribers
+
+# Number of subscribers sent with each signal of a bulk change
+SIGNAL_BATCH_SIZE = 1000
+
 
 class IssueQuerySet(models.QuerySet):
 
@@ -29,6 +42,27 @@ class PostQuerySet(models.QuerySet):
     def number_of_issues(self):
         return self.annotate(number_of_issues=models.Count("issue"))
 
+    def by_category(self):
+        """orders posts by category in the order they are shown in an issue"""
+        return self.select_related("category").order_by(
+            "category__order", "category_id", "order", "-created_at")
+
+
+def group_by_category(posts):
+    """
+    Groups posts that are already ordered by category
+
+    :param posts: posts ordered by ``PostQuerySet.by_category``
+    :return: list of ``(category, posts)`` tuples
+    """
+    category_list = []
+
+    for _, group in groupby(posts, key=lambda post: post.category_id):
+        category_posts = list(group)
+        category_list.append((category_posts[0].category, category_posts))
+
+    return category_list
+
 
 class CustomPostManager(models.Manager.from_queryset(PostQuerySet)):
     pass
@@ -37,7 +71,250 @@ class CustomPostManager(models.Manager.from_queryset(PostQuerySet)):
 class SubscriberQuerySet(models.QuerySet):
 
     def subscribed(self):
-        self.annotate(subscribed=models.Case(subscribed=True))
+        """subscribers that receive the newsletter"""
+        return self.filter(subscribed=True,
+                           verified=True,
+                           suppressed_at__isnull=True)
+
+    def suppressed(self):
+        return self.filter(suppressed_at__isnull=False)
+
+    def with_email_addresses(self, email_addresses):
+        """
+        Subscribers with one of the addresses whatever the case they were
+        stored with, looked up through the lowercase address index
+
+        :param email_addresses: lowercase email addresses
+        """
+        return self.alias(email_address_lower=Lower("email_address")).filter(
+            email_address_lower__in=email_addresses)
+
+    def suppress(self, email_addresses, reason, chunk_size=1000):
+        """
+        Stops sending newsletters to the addresses, e.g. after a hard
+        bounce, with one UPDATE for each chunk of addresses
+
+        Addresses are matched case-insensitively as subscribers may have
+        typed them with a different case than the bounce reports.
+
+        :param email_addresses: email addresses to suppress
+        :param reason: ``Subscriber.SuppressionReason``
+        :param chunk_size: number of addresses updated in one statement
+        :return: number of subscribers that were suppressed
+        """
+        email_addresses = sorted(
+            {email_address.lower()
+             for email_address in email_addresses})
+        now = timezone.now()
+        suppressed = 0
+
+        for start in range(0, len(email_addresses), chunk_size):
+            subscribers = self.with_email_addresses(
+                email_addresses[start:start + chunk_size]).filter(
+                    suppressed_at__isnull=True)
+            subscriber_ids = list(subscribers.values_list("pk", flat=True))
+
+            suppressed += self.filter(pk__in=subscriber_ids).update(
+                suppressed_at=now, suppression_reason=reason)
+            forget_subscribers(subscriber_ids)
+
+        return suppressed
+
+    def verified(self):
+        return self.filter(verified=True)
+
+    def unverified(self):
+        return self.filter(verified=False)
+
+    def verification_expired(self):
+        """
+        Unverified subscribers whose verification email was sent more
+        than ``NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS`` days ago
+        """
+        expired_before = timezone.now() - timezone.timedelta(
+            days=NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS)
+
+        return self.filter(verified=False,
+                           verification_sent_date__lt=expired_before)
+
+    def request_verification(self, email_addresses):
+        """
+        Marks that the subscribers requested a verification email,
+        creating the subscribers that do not exist with an upsert
+
+        Existing subscribers are matched whatever the case of their
+        address, new addresses are stored with a lowercase domain.
+        Concurrent requests for the same new address do not race as the
+        database resolves the conflict on the unique email address.
+
+        :param email_addresses: list of email addresses
+        """
+        now = timezone.now()
+        email_addresses = {
+            email_address.lower(): email_address
+            for email_address in map(normalize_email, email_addresses)
+        }
+
+        subscribers = self.with_email_addresses(list(email_addresses))
+        existing = {
+            email_address.lower() for email_address in subscribers.values_list(
+                "email_address", flat=True)
+        }
+        if existing:
+            subscribers.update(verification_requested_at=now)
+
+        self.bulk_create(
+            [
+                self.model(email_address=email_address,
+                           verification_requested_at=now)
+                for email_address_lower, email_address in
+                email_addresses.items()
+                if email_address_lower not in existing
+            ],
+            update_conflicts=True,
+            unique_fields=["email_address"],
+            update_fields=["verification_requested_at"],
+        )
+
+    def verification_requested(self):
+        return self.filter(verification_requested_at__isnull=False)
+
+    def verification_valid(self):
+        """subscribers whose verification link has not expired"""
+        expired_before = timezone.now() - timezone.timedelta(
+            days=NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS)
+
+        return self.filter(verification_sent_date__gt=expired_before)
+
+    def _update_and_send(self, signal, **fields):
+        """
+        Updates the subscribers with a single UPDATE and sends ``signal``
+        with ``instances``, the updated subscribers, in batches
+
+        :return: number of updated subscribers
+        """
+        with transaction.atomic(using=self.db):
+            # the rows are locked so the signals are sent for the
+            # subscribers that were updated, where the database supports it
+            subscriber_ids = list(
+                self.select_for_update().order_by().values_list("pk",
+                                                                flat=True))
+            if not subscriber_ids:
+                return 0
+
+            updated = self.update(**fields)
+
+        forget_subscribers(subscriber_ids)
+
+        if signal.has_listeners(self.model):
+            for start in range(0, len(subscriber_ids), SIGNAL_BATCH_SIZE):
+                instances = list(
+                    self.model._default_manager.using(self.db).filter(
+                        pk__in=subscriber_ids[start:start +
+                                              SIGNAL_BATCH_SIZE]))
+                signal.send(sender=self.model, instances=instances)
+
+        return updated
+
+    def subscribe(self):
+        """
+        Confirms the subscription of the subscribers
+        whose verification link has not expired
+
+        :return: number of subscribers that were subscribed
+        """
+        subscribers = self.exclude(subscribed=True,
+                                   verified=True).verification_valid()
+
+        return subscribers._update_and_send(signals.subscribed,
+                                            verified=True,
+                                            subscribed=True)
+
+    def unsubscribe(self):
+        """
+        Unsubscribes the subscribers
+
+        :return: number of subscribers that were unsubscribed
+        """
+        return self.filter(subscribed=True)._update_and_send(
+            signals.unsubscribed, subscribed=False)
+
+    def resend_verification(self):
+        """
+        Requests a new verification email for the subscribers that are
+        not subscribed or suppressed, the emails are sent by a background task
+
+        :return: number of subscribers the email is sent to
+        """
+        from newsfeed.utils import queue_verification_emails
+
+        requested = self.filter(subscribed=False,
+                                suppressed_at__isnull=True).update(
+            verification_requested_at=timezone.now())
+
+        if requested:
+            queue_verification_emails()
+
+        return requested
+
+    def recipient_pages(self, page_size=NEWSFEED_EMAIL_RECIPIENT_PAGE_SIZE):
+        """
+        Yields lists of ``(pk, email_address, token)`` walking the queryset
+        by primary key
+
+        Each page is fetched with ``pk > last_pk ORDER BY pk LIMIT page_size``
+        so every query costs the same no matter how far into the table it is
+        and only one page is held in memory.
+
+        :param page_size: number of subscribers read with one query
+        """
+        queryset = self.order_by("pk").values_list("pk", "email_address",
+                                                   "token")
+        page_size = max(page_size, 1)
+        last_pk = None
+
+        while True:
+            page = queryset
+            if last_pk is not None:
+                page = page.filter(pk__gt=last_pk)
+
+            recipients = list(page[:page_size])
+            if not recipients:
+                return
+
+            last_pk = recipients[-1][0]
+            yield recipients
+
+            if len(recipients) < page_size:
+                return
+
+    def recipient_batches(self,
+                          batch_size,
+                          page_size=NEWSFEED_EMAIL_RECIPIENT_PAGE_SIZE):
+        """
+        Yields lists of ``(pk, email_address, token)`` of ``batch_size``
+        subscribers, read from the database by ``recipient_pages``
+
+        If ``batch_size`` is not set each page is a batch.
+
+        :param batch_size: number of subscribers in each batch
+        :param page_size: number of subscribers read with one query
+        """
+        batch = []
+
+        for page in self.recipient_pages(page_size):
+            if not batch_size or batch_size <= 0:
+                yield page
+                continue
+
+            batch += page
+
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+
+        if batch:
+            yield batch
 
 
 class CustomSubscriberManager(models.Manager.from_queryset(SubscriberQuerySet)
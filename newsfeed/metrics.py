@@ -0,0 +1,128 @@
+import logging
+
+from newsfeed.caching import get_cache
+
+logger = logging.getLogger(__name__)
+
+# Counters are kept in the cache so that the exporter view sees the sends
+# of the worker processes when the cache is shared between processes
+
+# name and help of the counters updated while sending newsletters
+COUNTERS = {
+    "newsfeed_newsletter_sends_total": "Newsletter sends started",
+    "newsfeed_email_batches_total": "Batches of emails sent",
+    "newsfeed_email_messages_total": "Emails in the sent batches",
+    "newsfeed_email_delivered_total": "Emails accepted by the SMTP server",
+    "newsfeed_email_smtp_errors_total": (
+        "Batches that failed with an SMTP or connection error"
+    ),
+    "newsfeed_email_smtp_reconnects_total": (
+        "SMTP connections opened again after an error"
+    ),
+}
+
+# upper bounds (seconds) of the batch latency histogram buckets
+BATCH_SECONDS_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BATCH_SECONDS = "newsfeed_email_batch_seconds"
+
+# newsletters exported with their send summary
+NEWSLETTER_SUMMARY_LIMIT = 20
+
+
+def _get_key(name):
+    return f"newsfeed:metrics:{name}"
+
+
+def increment(name, value=1):
+    """adds ``value`` to a counter, metrics never make a send fail"""
+    cache = get_cache()
+    key = _get_key(name)
+
+    try:
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            if not cache.add(key, value, timeout=None):
+                cache.incr(key, value)
+    except Exception:
+        logger.exception("Failed to update metric %s", name)
+
+
+def observe_batch_seconds(seconds):
+    """records the latency of a batch in the histogram"""
+    for bucket in BATCH_SECONDS_BUCKETS:
+        if seconds <= bucket:
+            increment(f"{BATCH_SECONDS}_bucket:{bucket}")
+
+    increment(f"{BATCH_SECONDS}_count")
+    # the cache only adds integers, the sum is kept in milliseconds
+    increment(f"{BATCH_SECONDS}_sum_ms", int(seconds * 1000))
+
+
+def _get_value(values, name):
+    return values.get(_get_key(name)) or 0
+
+
+def render_metrics():
+    """returns the metrics in the Prometheus text exposition format"""
+    from newsfeed.models import Newsletter
+
+    buckets = [f"{BATCH_SECONDS}_bucket:{bucket}" for bucket in BATCH_SECONDS_BUCKETS]
+    names = [*COUNTERS, *buckets, f"{BATCH_SECONDS}_count", f"{BATCH_SECONDS}_sum_ms"]
+    values = get_cache().get_many([_get_key(name) for name in names])
+    lines = []
+
+    for name, help_text in COUNTERS.items():
+        lines += [
+            f"# HELP {name} {help_text}",
+            f"# TYPE {name} counter",
+            f"{name} {_get_value(values, name)}",
+        ]
+
+    lines += [
+        f"# HELP {BATCH_SECONDS} Time spent sending a batch of emails",
+        f"# TYPE {BATCH_SECONDS} histogram",
+    ]
+    for bucket, name in zip(BATCH_SECONDS_BUCKETS, buckets):
+        lines.append(
+            f'{BATCH_SECONDS}_bucket{{le="{bucket}"}} {_get_value(values, name)}'
+        )
+
+    count = _get_value(values, f"{BATCH_SECONDS}_count")
+    lines += [
+        f'{BATCH_SECONDS}_bucket{{le="+Inf"}} {count}',
+        f"{BATCH_SECONDS}_sum {_get_value(values, f'{BATCH_SECONDS}_sum_ms') / 1000}",
+        f"{BATCH_SECONDS}_count {count}",
+    ]
+
+    newsletters = (
+        Newsletter.objects.filter(recipients_count__gt=0)
+        .select_related("issue")
+        .order_by("-pk")[:NEWSLETTER_SUMMARY_LIMIT]
+    )
+    summaries = {
+        "newsfeed_newsletter_recipients": ("Recipients of the newsletter", []),
+        "newsfeed_newsletter_delivered": ("Emails delivered", []),
+        "newsfeed_newsletter_failed": ("Emails that failed", []),
+        "newsfeed_newsletter_send_seconds": ("Time spent sending", []),
+    }
+
+    for newsletter in newsletters:
+        labels = (
+            f'{{newsletter="{newsletter.pk}",issue="{newsletter.issue.issue_number}"}}'
+        )
+        for name, value in (
+            ("newsfeed_newsletter_recipients", newsletter.recipients_count),
+            ("newsfeed_newsletter_delivered", newsletter.delivered_count),
+            ("newsfeed_newsletter_failed", newsletter.failed_count),
+            (
+                "newsfeed_newsletter_send_seconds",
+                newsletter.send_duration.total_seconds(),
+            ),
+        ):
+            summaries[name][1].append(f"{name}{labels} {value}")
+
+    for name, (help_text, samples) in summaries.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", *samples]
+
+    return "\n".join(lines) + "\n"
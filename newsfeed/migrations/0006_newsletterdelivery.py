@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0005_issue_newsfeed_is_publish_ce2043_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NewsletterDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "newsletter",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deliveries",
+                        to="newsfeed.newsletter",
+                    ),
+                ),
+                (
+                    "subscriber",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deliveries",
+                        to="newsfeed.subscriber",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Newsletter deliveries",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("newsletter", "subscriber"),
+                        name="newsfeed_unique_newsletter_delivery",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0007_task"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NewsletterShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shard_index", models.PositiveIntegerField()),
+                ("shard_count", models.PositiveIntegerField()),
+                (
+                    "sent",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of emails sent for this shard"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "newsletter",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shards",
+                        to="newsfeed.newsletter",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("newsletter", "shard_count", "shard_index"),
+                        name="newsfeed_unique_newsletter_shard",
+                    )
+                ],
+            },
+        ),
+    ]
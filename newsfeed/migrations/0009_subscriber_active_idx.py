@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0008_newslettershard"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="subscriber",
+            index=models.Index(
+                condition=models.Q(("subscribed", True), ("verified", True)),
+                fields=["id", "email_address"],
+                name="newsfeed_subscriber_active_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0009_subscriber_active_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IssueSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "web_html",
+                    models.TextField(help_text="Issue page content with all posts"),
+                ),
+                (
+                    "web_pages",
+                    models.JSONField(
+                        default=list,
+                        help_text="Issue page content of each page of posts",
+                    ),
+                ),
+                (
+                    "email_html",
+                    models.TextField(help_text="Newsletter email of the issue"),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "issue",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshot",
+                        to="newsfeed.issue",
+                    ),
+                ),
+            ],
+        ),
+    ]
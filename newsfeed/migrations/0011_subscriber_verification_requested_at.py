@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0010_issuesnapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscriber",
+            name="verification_requested_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="subscriber",
+            index=models.Index(
+                condition=models.Q(("verification_requested_at__isnull", False)),
+                fields=["verification_requested_at"],
+                name="newsfeed_verify_requested_idx",
+            ),
+        ),
+    ]
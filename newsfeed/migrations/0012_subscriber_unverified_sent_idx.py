@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0011_subscriber_verification_requested_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="subscriber",
+            index=models.Index(
+                condition=models.Q(("verified", False)),
+                fields=["verification_sent_date"],
+                name="newsfeed_unverified_sent_idx",
+            ),
+        ),
+    ]
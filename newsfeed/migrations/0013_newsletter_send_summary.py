@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:57
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0012_subscriber_unverified_sent_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="newsletter",
+            name="delivered_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="newsletter",
+            name="failed_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="newsletter",
+            name="recipients_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="newsletter",
+            name="send_duration",
+            field=models.DurationField(default=datetime.timedelta),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+def delete_issue_snapshots(apps, schema_editor):
+    # snapshots are rebuilt when they are used, with
+    # the personal unsubscribe link in the newsletter email
+    IssueSnapshot = apps.get_model("newsfeed", "IssueSnapshot")
+    IssueSnapshot.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0014_newsletterretry"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="subscriber",
+            name="newsfeed_subscriber_active_idx",
+        ),
+        migrations.AddIndex(
+            model_name="subscriber",
+            index=models.Index(
+                condition=models.Q(("subscribed", True), ("verified", True)),
+                fields=["id", "email_address", "token"],
+                name="newsfeed_subscriber_active_idx",
+            ),
+        ),
+        migrations.RunPython(delete_issue_snapshots, migrations.RunPython.noop),
+    ]
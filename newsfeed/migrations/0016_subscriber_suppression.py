@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0015_unsubscribe_tokens"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="subscriber",
+            name="newsfeed_subscriber_active_idx",
+        ),
+        migrations.AddField(
+            model_name="subscriber",
+            name="suppressed_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Newsletters are not sent to suppressed subscribers",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="subscriber",
+            name="suppression_reason",
+            field=models.CharField(
+                blank=True,
+                choices=[("bounce", "Hard bounce"), ("complaint", "Spam complaint")],
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="subscriber",
+            index=models.Index(
+                condition=models.Q(
+                    ("subscribed", True),
+                    ("suppressed_at__isnull", True),
+                    ("verified", True),
+                ),
+                fields=["id", "email_address", "token"],
+                name="newsfeed_subscriber_active_idx",
+            ),
+        ),
+    ]
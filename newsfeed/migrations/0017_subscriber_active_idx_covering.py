@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0016_subscriber_suppression"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="subscriber",
+            name="newsfeed_subscriber_active_idx",
+        ),
+        migrations.AddIndex(
+            model_name="subscriber",
+            index=models.Index(
+                condition=models.Q(
+                    ("subscribed", True),
+                    ("suppressed_at__isnull", True),
+                    ("verified", True),
+                ),
+                fields=[
+                    "id",
+                    "email_address",
+                    "token",
+                    "subscribed",
+                    "verified",
+                    "suppressed_at",
+                ],
+                name="newsfeed_subscriber_active_idx",
+            ),
+        ),
+    ]
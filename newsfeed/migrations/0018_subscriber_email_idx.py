@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:28
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0017_subscriber_active_idx_covering"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="subscriber",
+            index=models.Index(
+                django.db.models.functions.text.Lower("email_address"),
+                name="newsfeed_subscriber_email_idx",
+            ),
+        ),
+    ]
@@ -1,8 +1,14 @@
 import uuid
+from datetime import timedelta
 
 from django.db import models
+from django.db.models.functions import Lower
 from django.urls import reverse
+from django.utils import timezone
 
+from newsfeed import signals
+from newsfeed.app_settings import NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS
+from newsfeed.caching import cache_subscriber
 from newsfeed.managers import CustomIssueManager
 from newsfeed.managers import CustomPostManager
 from newsfeed.managers import CustomSubscriberManager
@@ -42,10 +48,32 @@ class Issue(models.Model):
             kwargs={"issue_number": self.issue_number},
         )
 
+    @property
+    def is_released(self):
+        return not self.is_draft and self.publish_date <= timezone.now()
+
     def __str__(self):
         return self.title
 
 
+class IssueSnapshot(models.Model):
+    issue = models.OneToOneField(
+        Issue,
+        on_delete=models.CASCADE,
+        related_name="snapshot",
+    )
+    web_html = models.TextField(help_text="Issue page content with all posts")
+    web_pages = models.JSONField(
+        default=list, help_text="Issue page content of each page of posts")
+    email_html = models.TextField(help_text="Newsletter email of the issue")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return str(self.issue)
+
+
 class PostCategory(models.Model):
     name = models.CharField(max_length=255)
     order = models.PositiveIntegerField(default=0)
@@ -84,6 +112,9 @@ class Post(models.Model):
 
     objects = CustomPostManager()
 
+    # issue of the post when it was loaded from the database
+    loaded_issue_id = None
+
     class Meta:
         ordering = ["order", "-created_at"]
         indexes = [
@@ -95,6 +126,12 @@ class Post(models.Model):
             ], )
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_issue_id = instance.__dict__.get("issue_id")
+        return instance
+
     def __str__(self):
         return self.title
 
@@ -109,6 +146,12 @@ class Newsletter(models.Model):
     schedule = models.DateTimeField(blank=True, null=True)
     is_sent = models.BooleanField(default=False)
     sent_at = models.DateTimeField(blank=True, null=True)
+    # summary of the sends of the newsletter, added up over
+    # resumed sends and shards
+    recipients_count = models.PositiveIntegerField(default=0)
+    delivered_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    send_duration = models.DurationField(default=timedelta)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -122,11 +165,24 @@ class Newsletter(models.Model):
 
 
 class Subscriber(models.Model):
+
+    class SuppressionReason(models.TextChoices):
+        BOUNCE = "bounce", "Hard bounce"
+        COMPLAINT = "complaint", "Spam complaint"
+
     email_address = models.EmailField(unique=True)
     token = models.UUIDField(max_length=128, unique=True, default=uuid.uuid4)
     verified = models.BooleanField(default=False)
     subscribed = models.BooleanField(default=False)
     verification_sent_date = models.DateTimeField(blank=True, null=True)
+    verification_requested_at = models.DateTimeField(blank=True, null=True)
+    suppressed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Newsletters are not sent to suppressed subscribers",
+    )
+    suppression_reason = models.CharField(
+        max_length=20, blank=True, choices=SuppressionReason.choices)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -134,7 +190,233 @@ class Subscriber(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
-        indexes = [models.Index(fields=["-created_at"])]
+        indexes = [
+            models.Index(fields=["-created_at"]),
+            # Covers recipient selection, which walks active subscribers
+            # by primary key and only reads their address and token, the
+            # columns of the condition are included so the rows are not read
+            models.Index(
+                fields=[
+                    "id",
+                    "email_address",
+                    "token",
+                    "subscribed",
+                    "verified",
+                    "suppressed_at",
+                ],
+                condition=models.Q(subscribed=True,
+                                   verified=True,
+                                   suppressed_at__isnull=True),
+                name="newsfeed_subscriber_active_idx",
+            ),
+            # Verification emails waiting to be sent
+            models.Index(
+                fields=["verification_requested_at"],
+                condition=models.Q(verification_requested_at__isnull=False),
+                name="newsfeed_verify_requested_idx",
+            ),
+            # Finds the expired verifications to purge
+            models.Index(
+                fields=["verification_sent_date"],
+                condition=models.Q(verified=False),
+                name="newsfeed_unverified_sent_idx",
+            ),
+            # Matches bounced addresses whatever their case
+            models.Index(
+                Lower("email_address"),
+                name="newsfeed_subscriber_email_idx",
+            ),
+        ]
+
+    def get_verification_url(self):
+        return reverse(
+            "newsfeed:newsletter_subscription_confirm",
+            kwargs={"token": self.token},
+        )
+
+    def is_verification_expired(self):
+        """whether the verification link is older than the expire days"""
+        if not self.verification_sent_date:
+            return True
+
+        expiration_date = self.verification_sent_date + timedelta(
+            days=NEWSFEED_EMAIL_CONFIRMATION_EXPIRE_DAYS)
+
+        return expiration_date <= timezone.now()
+
+    def _update_and_send(self, signal, **fields):
+        """
+        Updates the subscriber with a single UPDATE,
+        its cached lookups and sends ``signal``
+        """
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+        Subscriber.objects.filter(pk=self.pk).update(**fields)
+        cache_subscriber(self)
+        signal.send(sender=self.__class__, instance=self)
+
+    def send_verification_email(self):
+        """sends the email with the verification link to the subscriber"""
+        from newsfeed.utils import send_subscription_verification_email
+
+        send_subscription_verification_email(self.get_verification_url(),
+                                             self.email_address)
+        self._update_and_send(signals.email_verification_sent,
+                              verification_sent_date=timezone.now())
+
+    def subscribe(self):
+        """
+        Confirms the subscription unless the verification link expired
+
+        :return: True if the subscriber is subscribed
+        """
+        if self.is_verification_expired():
+            return False
+
+        if not (self.subscribed and self.verified):
+            self._update_and_send(signals.subscribed,
+                                  verified=True,
+                                  subscribed=True)
+
+        return True
+
+    def unsubscribe(self):
+        """
+        Unsubscribes the subscriber
+
+        :return: True if the subscriber was subscribed
+        """
+        if not self.subscribed:
+            return False
+
+        self._update_and_send(signals.unsubscribed, subscribed=False)
+
+        return True
 
     def __str__(self):
         return self.email_address
+
+
+class NewsletterDelivery(models.Model):
+    newsletter = models.ForeignKey(
+        Newsletter,
+        on_delete=models.CASCADE,
+        related_name="deliveries",
+    )
+    subscriber = models.ForeignKey(
+        Subscriber,
+        on_delete=models.CASCADE,
+        related_name="deliveries",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Newsletter deliveries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["newsletter", "subscriber"],
+                name="newsfeed_unique_newsletter_delivery",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.newsletter} -> {self.subscriber}"
+
+
+class NewsletterRetry(models.Model):
+    newsletter = models.ForeignKey(
+        Newsletter,
+        on_delete=models.CASCADE,
+        related_name="retries",
+    )
+    subscriber = models.ForeignKey(
+        Subscriber,
+        on_delete=models.CASCADE,
+        related_name="retries",
+    )
+    attempts = models.PositiveIntegerField(
+        default=0, help_text="Number of failed attempts")
+    next_attempt_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Empty when the maximum number of attempts was reached",
+    )
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Newsletter retries"
+        indexes = [models.Index(fields=["next_attempt_at"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["newsletter", "subscriber"],
+                name="newsfeed_unique_newsletter_retry",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.newsletter} -> {self.subscriber}"
+
+
+class NewsletterShard(models.Model):
+    newsletter = models.ForeignKey(
+        Newsletter,
+        on_delete=models.CASCADE,
+        related_name="shards",
+    )
+    shard_index = models.PositiveIntegerField()
+    shard_count = models.PositiveIntegerField()
+    sent = models.PositiveIntegerField(
+        default=0, help_text="Number of emails sent for this shard")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["newsletter", "shard_count", "shard_index"],
+                name="newsfeed_unique_newsletter_shard",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.newsletter} ({self.shard_index}/{self.shard_count})"
+
+
+class Task(models.Model):
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    name = models.CharField(
+        max_length=255, help_text="Dotted path of the function to run")
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    progress = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "run_at"])]
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from django.utils.module_loading import import_string
+
+from newsfeed.app_settings import (
+    NEWSFEED_EMAIL_DOMAIN_LIMITS,
+    NEWSFEED_EMAIL_RATE_BURST,
+    NEWSFEED_EMAIL_RATE_LIMIT,
+    NEWSFEED_EMAIL_RATE_LIMITER,
+)
+
+
+class BaseRateLimiter:
+    """Base class for the rate limiters used while sending newsletters"""
+
+    def __init__(self, rate=0, burst=0):
+        # Number of messages allowed per second, ``0`` means no limit
+        self.rate = rate
+        # Number of messages that can be sent at once after being idle
+        self.burst = burst
+
+    def reserve(self, tokens=1):
+        """
+        Reserves tokens and returns the number of seconds
+        the caller must wait before using them
+
+        :param tokens: number of messages that will be sent
+        """
+        raise NotImplementedError
+
+    def acquire(self, tokens=1):
+        """blocks until the tokens can be used"""
+        delay = self.reserve(tokens)
+
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens=1):
+        """waits without blocking the event loop until the tokens can be used"""
+        delay = self.reserve(tokens)
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class TokenBucketRateLimiter(BaseRateLimiter):
+    """
+    Token bucket rate limiter
+
+    The bucket holds up to ``burst`` tokens and is refilled with ``rate``
+    tokens per second. Reserving more tokens than available puts the bucket
+    into debt, so callers wait exactly as long as needed to stay on ``rate``.
+
+    :param clock: function returning the current time in seconds
+    """
+
+    def __init__(self, rate=0, burst=0, clock=time.monotonic):
+        super().__init__(rate=rate, burst=burst or max(rate, 1))
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        if not self.rate or self.rate <= 0:
+            return 0
+
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            self.tokens -= tokens
+
+            if self.tokens >= 0:
+                return 0
+
+            return -self.tokens / self.rate
+
+
+def get_rate_limiter(rate=None, burst=None):
+    """
+    Returns the rate limiter configured by ``NEWSFEED_EMAIL_RATE_LIMITER``
+
+    :param rate: messages per second, defaults to ``NEWSFEED_EMAIL_RATE_LIMIT``
+    :param burst: bucket size, defaults to ``NEWSFEED_EMAIL_RATE_BURST``
+    """
+    rate_limiter_class = import_string(NEWSFEED_EMAIL_RATE_LIMITER)
+
+    return rate_limiter_class(
+        rate=NEWSFEED_EMAIL_RATE_LIMIT if rate is None else rate,
+        burst=NEWSFEED_EMAIL_RATE_BURST if burst is None else burst,
+    )
+
+
+class DomainThrottle:
+    """
+    Rate and concurrency caps of the receiving domains
+
+    ``NEWSFEED_EMAIL_DOMAIN_LIMITS`` maps a domain to its caps, the domains
+    served by the same provider can share them::
+
+        NEWSFEED_EMAIL_DOMAIN_LIMITS = {
+            "gmail.com": {
+                "rate": 50,  # messages per second
+                "burst": 100,
+                "concurrency": 4,  # batches sent at the same time
+                "domains": ["googlemail.com"],
+            },
+        }
+
+    Domains that are not configured are only limited by the global limits.
+    """
+
+    def __init__(self, limits=None):
+        limits = NEWSFEED_EMAIL_DOMAIN_LIMITS if limits is None else limits
+        # the configured domain that holds the caps of each domain
+        self.groups = {}
+        self._rate_limiters = {}
+        self._concurrency = {}
+        self._semaphores = {}
+        self._async_semaphores = {}
+
+        for group, config in limits.items():
+            for domain in (group, *config.get("domains", ())):
+                self.groups[domain.lower()] = group
+
+            if config.get("rate"):
+                self._rate_limiters[group] = get_rate_limiter(
+                    rate=config["rate"], burst=config.get("burst", 0)
+                )
+
+            if config.get("concurrency"):
+                self._concurrency[group] = config["concurrency"]
+                self._semaphores[group] = threading.BoundedSemaphore(
+                    config["concurrency"]
+                )
+
+    def get_group(self, email_address):
+        """returns the group of the domain of an address, ``None`` if not limited"""
+        return self.groups.get(email_address.rpartition("@")[2].lower())
+
+    def acquire(self, group):
+        """blocks until a message can be sent to the group"""
+        rate_limiter = self._rate_limiters.get(group)
+
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+    async def aacquire(self, group):
+        rate_limiter = self._rate_limiters.get(group)
+
+        if rate_limiter is not None:
+            await rate_limiter.aacquire()
+
+    @contextmanager
+    def limit_concurrency(self, group):
+        """blocks until the group may receive one more batch at the same time"""
+        semaphore = self._semaphores.get(group)
+
+        if semaphore is None:
+            yield
+            return
+
+        with semaphore:
+            yield
+
+    @asynccontextmanager
+    async def alimit_concurrency(self, group):
+        concurrency = self._concurrency.get(group)
+
+        if concurrency is None:
+            yield
+            return
+
+        # asyncio semaphores are bound to the event loop that uses them
+        semaphore = self._async_semaphores.get(group)
+        if semaphore is None:
+            semaphore = self._async_semaphores[group] = asyncio.Semaphore(concurrency)
+
+        async with semaphore:
+            yield
@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from newsfeed import metrics
+from newsfeed.caching import forget_subscribers, invalidate_issue_pages
+from newsfeed.models import Issue, IssueSnapshot, Post, PostCategory, Subscriber
+from newsfeed.signals import (
+    newsletter_batch_sent,
+    newsletter_reconnected,
+    newsletter_send_error,
+    newsletter_send_started,
+)
+from newsfeed.snapshots import invalidate_issue_snapshots
+
+
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=PostCategory)
+@receiver(post_delete, sender=PostCategory)
+def invalidate_issue_pages_on_change(sender, **kwargs):
+    # pages rendered before the commit would be cached with old data
+    transaction.on_commit(invalidate_issue_pages)
+
+
+@receiver(post_save, sender=Issue)
+def invalidate_issue_snapshot(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_issue_snapshots([instance.pk]))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_issue_snapshots(sender, instance, **kwargs):
+    # the post may have been moved from another issue
+    issue_ids = {instance.issue_id, instance.loaded_issue_id} - {None}
+
+    if issue_ids:
+        transaction.on_commit(lambda: invalidate_issue_snapshots(issue_ids))
+
+
+@receiver(post_save, sender=PostCategory)
+@receiver(post_delete, sender=PostCategory)
+def invalidate_all_issue_snapshots(sender, **kwargs):
+    transaction.on_commit(lambda: IssueSnapshot.objects.all().delete())
+
+
+@receiver(post_save, sender=Subscriber)
+def forget_cached_subscriber(sender, instance, **kwargs):
+    # deletes are not received so that bulk deletes stay fast,
+    # they forget the subscribers themselves
+    transaction.on_commit(lambda: forget_subscribers([instance.pk]))
+
+
+@receiver(newsletter_send_started)
+def count_newsletter_send(sender, **kwargs):
+    metrics.increment("newsfeed_newsletter_sends_total")
+
+
+@receiver(newsletter_batch_sent)
+def record_newsletter_batch(sender, batch_size, delivered, duration, **kwargs):
+    metrics.increment("newsfeed_email_batches_total")
+    metrics.increment("newsfeed_email_messages_total", batch_size)
+    metrics.increment("newsfeed_email_delivered_total", delivered)
+    metrics.observe_batch_seconds(duration)
+
+
+@receiver(newsletter_send_error)
+def count_newsletter_send_error(sender, **kwargs):
+    metrics.increment("newsfeed_email_smtp_errors_total")
+
+
+@receiver(newsletter_reconnected)
+def count_newsletter_reconnect(sender, **kwargs):
+    metrics.increment("newsfeed_email_smtp_reconnects_total")
@@ -1,10 +1,33 @@
 from django.dispatch import Signal
 
-# Sent after email verification is sent, with Subscriber instance
+# The subscriber signals are sent with the Subscriber instance, or with
+# instances, a list of Subscriber, when subscribers are changed in bulk
+
+# Sent after email verification is sent, with Subscriber instance(s)
 email_verification_sent = Signal()
 
-# Sent after subscription confirmed, with Subscriber instance
+# Sent after subscription confirmed, with Subscriber instance(s)
 subscribed = Signal()
 
-# Sent after unsubscription is successful, with Subscriber instance
+# Sent after unsubscription is successful, with Subscriber instance(s)
 unsubscribed = Signal()
+
+# Sent before a newsletter is sent, with Newsletter instance
+newsletter_send_started = Signal()
+
+# Sent after each batch of a newsletter, with Newsletter instance,
+# batch_size, delivered and duration (seconds) of the batch
+newsletter_batch_sent = Signal()
+
+# Sent when sending a batch fails with an SMTP or connection error,
+# with Newsletter instance and exception
+newsletter_send_error = Signal()
+
+# Sent when a new SMTP connection replaces one that was closed
+# after an error, with Newsletter instance
+newsletter_reconnected = Signal()
+
+# Sent after a newsletter is sent, with Newsletter instance,
+# recipients, delivered, failed and duration (seconds) of the send,
+# retry is True when the send only retried emails that failed before
+newsletter_sent = Signal()
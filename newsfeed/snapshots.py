@@ -0,0 +1,145 @@
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from newsfeed.app_settings import NEWSFEED_ISSUE_POSTS_PER_PAGE, NEWSFEED_SITE_BASE_URL
+from newsfeed.mail import UNSUBSCRIBE_TOKEN_PLACEHOLDER
+from newsfeed.managers import group_by_category
+
+
+def render_issue_content(issue, posts):
+    """renders the issue page content for a list of posts"""
+    return render_to_string(
+        "newsfeed/issue_content.html",
+        {"issue": issue, "category_list": group_by_category(posts)},
+    )
+
+
+def render_issue_email(issue, posts):
+    """renders the newsletter email html of an issue"""
+    context = {
+        "issue": issue,
+        "category_list": group_by_category(posts),
+        # the token of each subscriber is put in place of the placeholder
+        # when the email is sent
+        "unsubscribe_url": reverse(
+            "newsfeed:newsletter_unsubscribe_confirm",
+            kwargs={"token": UNSUBSCRIBE_TOKEN_PLACEHOLDER},
+        ),
+        "site_url": NEWSFEED_SITE_BASE_URL,
+    }
+
+    return render_to_string("newsfeed/email/newsletter_email.html", context)
+
+
+def render_issue_snapshot(issue):
+    """
+    Renders the issue page, each page of its posts and
+    the newsletter email in an unsaved IssueSnapshot
+    """
+    from newsfeed.models import IssueSnapshot
+
+    posts = list(issue.posts.visible().by_category())
+    paginator = Paginator(posts, NEWSFEED_ISSUE_POSTS_PER_PAGE)
+
+    return IssueSnapshot(
+        issue=issue,
+        web_html=render_issue_content(issue, posts),
+        web_pages=[
+            render_issue_content(issue, paginator.page(number).object_list)
+            for number in paginator.page_range
+        ],
+        email_html=render_issue_email(issue, posts),
+    )
+
+
+def _get_content_version(issue):
+    """
+    Returns a value that changes when the issue or one of its posts
+    is saved or deleted, ``None`` if the issue was deleted
+    """
+    from newsfeed.models import Issue
+
+    return (
+        Issue.objects.filter(pk=issue.pk)
+        .values_list("updated_at", Max("posts__updated_at"), Count("posts"))
+        .first()
+    )
+
+
+def build_issue_snapshot(issue):
+    """
+    Renders and saves the snapshot of a released issue
+
+    A change committed while the snapshot is rendered removes the snapshots
+    before this one is saved, so the snapshot is only saved when the content
+    it was rendered from did not change. It is checked again once saved as
+    a change may be committed in between.
+    """
+    from newsfeed.models import IssueSnapshot
+
+    version = _get_content_version(issue)
+    snapshot = render_issue_snapshot(issue)
+    issue.snapshot = snapshot
+
+    # the issue may have been loaded before a change
+    if version is None or version[0] != issue.updated_at:
+        return snapshot
+
+    if _get_content_version(issue) != version:
+        return snapshot
+
+    fields = {
+        "web_html": snapshot.web_html,
+        "web_pages": snapshot.web_pages,
+        "email_html": snapshot.email_html,
+    }
+
+    # single statements, so processes building snapshots at the same
+    # time do not hold read locks they need to upgrade
+    updated = IssueSnapshot.objects.filter(issue=issue).update(
+        updated_at=timezone.now(), **fields
+    )
+
+    if not updated:
+        try:
+            with transaction.atomic():
+                snapshot.save()
+        except IntegrityError:
+            # built by another process or the issue was deleted meanwhile
+            pass
+
+    if _get_content_version(issue) != version:
+        IssueSnapshot.objects.filter(issue=issue).delete()
+
+    return snapshot
+
+
+def get_issue_snapshot(issue):
+    """
+    Returns the snapshot of an issue, it is built when it does not exist
+
+    Snapshots are only saved for released issues, other issues
+    are rendered each time as they can still change.
+    """
+    from newsfeed.models import IssueSnapshot
+
+    try:
+        return issue.snapshot
+    except IssueSnapshot.DoesNotExist:
+        pass
+
+    if not issue.is_released:
+        return render_issue_snapshot(issue)
+
+    return build_issue_snapshot(issue)
+
+
+def invalidate_issue_snapshots(issue_ids):
+    """deletes the snapshots of issues so they are built again"""
+    from newsfeed.models import IssueSnapshot
+
+    IssueSnapshot.objects.filter(issue_id__in=issue_ids).delete()
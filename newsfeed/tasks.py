@@ -0,0 +1,350 @@
+import contextvars
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from newsfeed.app_settings import NEWSFEED_TASK_BACKEND, NEWSFEED_TASK_LEASE_TIMEOUT
+
+try:
+    from celery import shared_task
+except ImportError:
+    shared_task = None
+
+logger = logging.getLogger(__name__)
+
+# Task that is being run in the current context
+current_task = contextvars.ContextVar("newsfeed_current_task", default=None)
+
+
+class BaseTaskBackend:
+    """Base class for the backends that run newsfeed tasks"""
+
+    def enqueue(self, name, run_at=None, **kwargs):
+        """
+        Queues a function to be run in the background
+
+        :param name: dotted path of the function
+        :param run_at: the task is not run before this time, if set
+        :param kwargs: JSON serializable keyword arguments of the function
+        :return: the created Task
+        """
+        from newsfeed.models import Task
+
+        task = Task(name=name, kwargs=kwargs, run_at=run_at or timezone.now())
+        self.dispatch(task)
+
+        return task
+
+    def dispatch(self, task):
+        """
+        Saves a new task, or a task that is run again,
+        and hands it over to be run at ``task.run_at``
+
+        :param task: Task
+        """
+        raise NotImplementedError
+
+
+class DatabaseTaskBackend(BaseTaskBackend):
+    """
+    Stores tasks in the database,
+    they are run by the ``newsfeed_worker`` management command
+    """
+
+    def dispatch(self, task):
+        from newsfeed.models import Task
+
+        task.status = Task.Status.PENDING
+        task.save()
+
+
+class ImmediateTaskBackend(DatabaseTaskBackend):
+    """
+    Runs tasks right away in the current process, useful for development
+
+    Tasks scheduled in the future are stored and left
+    to the ``newsfeed_worker`` management command.
+    """
+
+    def dispatch(self, task):
+        super().dispatch(task)
+
+        if task.run_at > timezone.now():
+            return
+
+        run_task(task.pk)
+        task.refresh_from_db()
+
+
+class CeleryTaskBackend(BaseTaskBackend):
+    """
+    Stores tasks in the database and runs them with Celery,
+    requires ``celery`` to be installed
+    """
+
+    def __init__(self):
+        if shared_task is None:
+            raise ImproperlyConfigured("celery is required to use CeleryTaskBackend.")
+
+    def dispatch(self, task):
+        from newsfeed.models import Task
+
+        task.status = Task.Status.QUEUED
+        task.save()
+
+        eta = task.run_at if task.run_at > timezone.now() else None
+        transaction.on_commit(lambda: run_celery_task.apply_async((task.pk,), eta=eta))
+
+
+def get_task_backend():
+    """returns the task backend configured by ``NEWSFEED_TASK_BACKEND``"""
+    return import_string(NEWSFEED_TASK_BACKEND)()
+
+
+def enqueue(name, run_at=None, **kwargs):
+    """queues a function to be run by the configured task backend"""
+    return get_task_backend().enqueue(name, run_at=run_at, **kwargs)
+
+
+def get_lease_expiry():
+    """
+    Returns the time before which a running task that did not save
+    its progress or heartbeat is considered abandoned by its worker,
+    ``None`` if running tasks are never taken over
+    """
+    if not NEWSFEED_TASK_LEASE_TIMEOUT:
+        return None
+
+    return timezone.now() - timedelta(seconds=NEWSFEED_TASK_LEASE_TIMEOUT)
+
+
+def claim_task():
+    """
+    Marks the next pending task as running and returns it,
+    tasks locked by other workers are skipped
+
+    Running tasks whose lease expired, as their worker crashed,
+    are claimed again.
+    """
+    from newsfeed.models import Task
+
+    claimable = Q(status=Task.Status.PENDING, run_at__lte=timezone.now())
+    lease_expiry = get_lease_expiry()
+
+    if lease_expiry is not None:
+        claimable |= Q(status=Task.Status.RUNNING, updated_at__lt=lease_expiry)
+
+    with transaction.atomic():
+        task = (
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by("run_at", "pk")
+            .first()
+        )
+
+        if task is None:
+            return None
+
+        if task.status == Task.Status.RUNNING:
+            logger.warning(
+                "Task %s (%s) stopped sending heartbeats, running it again",
+                task.pk,
+                task.name,
+            )
+
+        task.status = Task.Status.RUNNING
+        task.started_at = timezone.now()
+        task.attempts += 1
+        task.save(update_fields=["status", "started_at", "attempts", "updated_at"])
+
+    return task
+
+
+def requeue_tasks(tasks):
+    """
+    Runs tasks again through the configured task backend,
+    running tasks are skipped unless their lease expired
+
+    :param tasks: Task queryset
+    :return: number of tasks requeued
+    """
+    from newsfeed.models import Task
+
+    lease_expiry = get_lease_expiry()
+
+    if lease_expiry is None:
+        tasks = tasks.exclude(status=Task.Status.RUNNING)
+    else:
+        tasks = tasks.exclude(status=Task.Status.RUNNING, updated_at__gte=lease_expiry)
+
+    backend = get_task_backend()
+    requeued = 0
+
+    for task in tasks:
+        task.run_at = timezone.now()
+        task.progress = ""
+        task.error = ""
+        task.finished_at = None
+        backend.dispatch(task)
+        requeued += 1
+
+    return requeued
+
+
+@contextmanager
+def heartbeat(task_id):
+    """
+    Renews the lease of a running task from a thread, so tasks that do not
+    report progress for a while are not claimed by another worker
+    """
+    from newsfeed.models import Task
+
+    if not NEWSFEED_TASK_LEASE_TIMEOUT:
+        yield
+        return
+
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(NEWSFEED_TASK_LEASE_TIMEOUT / 3):
+                Task.objects.filter(pk=task_id, status=Task.Status.RUNNING).update(
+                    updated_at=timezone.now()
+                )
+        except Exception:
+            logger.exception("Failed to renew the lease of task %s", task_id)
+        finally:
+            # the connection of this thread is not closed by Django
+            connections.close_all()
+
+    thread = threading.Thread(
+        target=beat, name=f"newsfeed-task-{task_id}-heartbeat", daemon=True
+    )
+    thread.start()
+
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_task(task_id):
+    """
+    Runs a task and saves its result
+
+    :param task_id: primary key of the Task
+    """
+    from newsfeed.models import Task
+
+    task = Task.objects.get(pk=task_id)
+
+    if task.status != Task.Status.RUNNING:
+        task.status = Task.Status.RUNNING
+        task.started_at = timezone.now()
+        task.attempts += 1
+        task.save(update_fields=["status", "started_at", "attempts", "updated_at"])
+
+    token = current_task.set(task.pk)
+
+    try:
+        with heartbeat(task.pk):
+            import_string(task.name)(**task.kwargs)
+    except Exception:
+        logger.exception("Task %s (%s) failed", task.pk, task.name)
+        task.status = Task.Status.FAILED
+        task.error = traceback.format_exc()
+    else:
+        task.status = Task.Status.SUCCEEDED
+        task.error = ""
+    finally:
+        current_task.reset(token)
+
+    task.finished_at = timezone.now()
+    task.save(update_fields=["status", "error", "finished_at", "updated_at"])
+
+    return task
+
+
+def report_progress(progress):
+    """
+    Saves the progress of the task running in the current context,
+    does nothing outside of a task
+
+    :param progress: short description of the progress
+    """
+    from newsfeed.models import Task
+
+    task_id = current_task.get()
+
+    if task_id is None:
+        return
+
+    Task.objects.filter(pk=task_id).update(
+        progress=progress[:255], updated_at=timezone.now()
+    )
+
+
+if shared_task is not None:
+
+    @shared_task(name="newsfeed.run_task")
+    def run_celery_task(task_id):
+        run_task(task_id)
+
+
+def send_newsletters(newsletter_ids, respect_schedule=True):
+    """
+    Task that sends email newsletters
+
+    The send resumes so that a task that is run again after it crashed
+    skips the subscribers that already received the newsletters.
+
+    :param newsletter_ids: list of Newsletter ids
+    :param respect_schedule: if ``True`` newsletters with future schedule
+        will not be sent
+    """
+    from newsfeed.models import Newsletter
+    from newsfeed.utils import send_email_newsletter
+
+    send_email_newsletter(
+        newsletters=Newsletter.objects.filter(id__in=newsletter_ids),
+        respect_schedule=respect_schedule,
+        resume=True,
+    )
+
+
+def send_verification_emails():
+    """Task that sends the verification emails requested by subscribers"""
+    from newsfeed.utils import send_requested_verification_emails
+
+    sent_emails = send_requested_verification_emails()
+    report_progress(f"Sent {sent_emails} verification emails")
+
+
+def purge_expired_subscribers():
+    """Task that deletes the subscribers whose verification has expired"""
+    from newsfeed.utils import purge_expired_subscribers
+
+    purge_expired_subscribers()
+
+
+def flush_unsubscribes():
+    """Task that writes the queued unsubscribes to the database"""
+    from newsfeed.utils import flush_unsubscribes
+
+    flush_unsubscribes()
+
+
+def send_newsletter_retries():
+    """Task that sends the newsletter emails whose retry is due"""
+    from newsfeed.utils import send_newsletter_retries
+
+    send_newsletter_retries()
@@ -0,0 +1,1723 @@
+import csv
+import email
+import io
+import json
+import mailbox
+import os
+import socket
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from unittest import mock, skipIf
+
+from asgiref.sync import async_to_sync
+
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import caches
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from newsfeed.app_settings import (
+    NEWSFEED_CACHE_ALIAS,
+    NEWSFEED_EMAIL_RETRY_BACKOFF,
+    NEWSFEED_EMAIL_RETRY_MAX_ATTEMPTS,
+    NEWSFEED_SITE_BASE_URL,
+)
+from newsfeed.benchmarks import create_issues, create_subscribers
+from newsfeed import signals, snapshots
+from newsfeed.caching import get_cached_subscriber
+from newsfeed.checks import check_cache
+from newsfeed.export import MANIFEST_NAME, StaticSiteExporter
+from newsfeed.mail import UNSUBSCRIBE_TOKEN_PLACEHOLDER, NewsletterMessageFactory
+from newsfeed.ratelimit import DomainThrottle, TokenBucketRateLimiter
+from newsfeed.models import (
+    Issue,
+    IssueSnapshot,
+    Newsletter,
+    NewsletterDelivery,
+    NewsletterRetry,
+    PostCategory,
+    Subscriber,
+    Task,
+)
+from newsfeed.tasks import DatabaseTaskBackend, claim_task, requeue_tasks, run_task
+from newsfeed.utils import (
+    AsyncNewsletterEmailSender,
+    NewsletterEmailSender,
+    flush_unsubscribes,
+    purge_expired_subscribers,
+    queue_verification_emails,
+    send_requested_verification_emails,
+)
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+DUMMY_CACHES = {
+    NEWSFEED_CACHE_ALIAS: {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+}
+LOCMEM_CACHES = {
+    NEWSFEED_CACHE_ALIAS: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+class SharedCacheMixin:
+    """uses a file based cache, which is shared between processes"""
+
+    def setUp(self):
+        super().setUp()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+
+        settings = override_settings(
+            CACHES={
+                NEWSFEED_CACHE_ALIAS: {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": cache_dir.name,
+                }
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class ViewQueryBudgetTests(TestCase):
+    """
+    The number of queries of the public views must not depend on the
+    number of issues, posts or categories, a template touching a
+    relation that is not selected makes these tests fail
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # 45 posts over 9 categories, the posts are shown on 3 pages
+        create_issues(issues=20, posts=45, categories=9)
+        cls.issue = Issue.objects.get(issue_number=20)
+
+    def get(self, url, queries, **data):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, data)
+
+        self.assertEqual(response.status_code, 200)
+
+        return response
+
+    def test_issue_list(self):
+        # count, issues
+        self.get(reverse("newsfeed:issue_list"), 2)
+        self.get(reverse("newsfeed:issue_list"), 2, page=2)
+
+    def test_issue_detail_builds_snapshot(self):
+        # issue, posts, update and insert of the snapshot in a savepoint,
+        # the version of the content before rendering, before and after saving
+        response = self.get(self.issue.get_absolute_url(), 9)
+
+        self.assertContains(response, "Category 0")
+        self.assertTrue(IssueSnapshot.objects.filter(issue=self.issue).exists())
+
+    def test_issue_detail_from_snapshot(self):
+        self.client.get(self.issue.get_absolute_url())
+
+        # issue with its snapshot
+        self.get(self.issue.get_absolute_url(), 1)
+        self.get(self.issue.get_absolute_url(), 1, page=3)
+
+    def test_issue_detail_without_snapshot_page(self):
+        self.client.get(self.issue.get_absolute_url())
+
+        # issue with its snapshot, count, posts with their category
+        response = self.get(self.issue.get_absolute_url(), 3, page="last")
+
+        self.assertContains(response, "Category 8")
+
+    def test_latest_issue_from_snapshot(self):
+        self.client.get(reverse("newsfeed:latest_issue"))
+
+        # latest issue with its snapshot
+        self.get(reverse("newsfeed:latest_issue"), 1)
+
+    def test_latest_issue_not_released(self):
+        Issue.objects.create(
+            title="Scheduled issue",
+            issue_number=21,
+            publish_date=timezone.now() + timezone.timedelta(days=1),
+        )
+        Issue.objects.create(
+            title="Draft issue",
+            issue_number=22,
+            publish_date=timezone.now(),
+            is_draft=True,
+        )
+        self.client.get(reverse("newsfeed:latest_issue"))
+
+        # latest released issue with its snapshot
+        response = self.get(reverse("newsfeed:latest_issue"), 1)
+
+        self.assertContains(response, self.issue.title)
+        self.assertNotContains(response, "Scheduled issue")
+        self.assertNotContains(response, "Draft issue")
+
+    def test_latest_issue_without_released_issue(self):
+        Issue.objects.update(publish_date=timezone.now() + timezone.timedelta(days=1))
+
+        response = self.get(reverse("newsfeed:latest_issue"), 1)
+
+        self.assertNotContains(response, "Category 0")
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class IssueSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # the issue is the latest one
+        cls.other_issue, cls.issue = create_issues(issues=2, posts=3, categories=2)
+
+    def get_content(self, issue):
+        return self.client.get(issue.get_absolute_url()).content.decode()
+
+    def change(self, func):
+        # the snapshots are removed once the change is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            func()
+
+    def test_views_serve_snapshot(self):
+        self.get_content(self.issue)
+        IssueSnapshot.objects.filter(issue=self.issue).update(
+            web_html="<p>Snapshot content</p>", web_pages=["<p>Snapshot page</p>"]
+        )
+
+        self.assertIn("Snapshot page", self.get_content(self.issue))
+        self.assertContains(
+            self.client.get(reverse("newsfeed:latest_issue")), "Snapshot content"
+        )
+
+    def test_issue_change_rebuilds_snapshot(self):
+        self.get_content(self.issue)
+
+        def rename_issue():
+            self.issue.short_description = "Changed description"
+            self.issue.save()
+
+        self.change(rename_issue)
+
+        self.assertFalse(IssueSnapshot.objects.filter(issue=self.issue).exists())
+        self.assertIn("Changed description", self.get_content(self.issue))
+        self.assertIn(
+            "Changed description",
+            IssueSnapshot.objects.get(issue=self.issue).web_html,
+        )
+
+    def test_post_change_rebuilds_snapshots(self):
+        self.get_content(self.issue)
+        self.get_content(self.other_issue)
+        post = self.issue.posts.first()
+
+        def move_post():
+            post.title = "Moved post"
+            post.issue = self.other_issue
+            post.save()
+
+        self.change(move_post)
+
+        # the snapshots of the issue it left and the one it joined are rebuilt
+        self.assertFalse(IssueSnapshot.objects.exists())
+        self.assertNotIn("Moved post", self.get_content(self.issue))
+        self.assertIn("Moved post", self.get_content(self.other_issue))
+
+    def test_category_change_rebuilds_snapshots(self):
+        self.get_content(self.issue)
+        self.get_content(self.other_issue)
+
+        self.change(lambda: PostCategory.objects.filter(name="Category 1").get().save())
+
+        self.assertFalse(IssueSnapshot.objects.exists())
+
+    def test_change_while_rendering_is_not_saved(self):
+        render_issue_snapshot = snapshots.render_issue_snapshot
+
+        def render_and_change(issue):
+            snapshot = render_issue_snapshot(issue)
+            # committed by another request while this one was rendering
+            post = issue.posts.first()
+            post.title = "Changed post"
+            post.save()
+            return snapshot
+
+        with mock.patch(
+            "newsfeed.snapshots.render_issue_snapshot", side_effect=render_and_change
+        ):
+            self.get_content(self.issue)
+
+        self.assertFalse(IssueSnapshot.objects.filter(issue=self.issue).exists())
+        self.assertIn("Changed post", self.get_content(self.issue))
+
+    def test_unreleased_issue_has_no_snapshot(self):
+        Issue.objects.filter(pk=self.issue.pk).update(is_draft=True)
+
+        self.assertEqual(
+            self.client.get(self.issue.get_absolute_url()).status_code, 404
+        )
+        self.assertFalse(IssueSnapshot.objects.filter(issue=self.issue).exists())
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class StaticSiteExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.issues = create_issues(issues=3, posts=25, categories=2)
+
+    def setUp(self):
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        self.output_dir = output_dir.name
+
+    def export(self, **kwargs):
+        return StaticSiteExporter(self.output_dir, processes=2, **kwargs).export()
+
+    def read(self, url, *parts):
+        path = os.path.join(self.output_dir, url.lstrip("/"), *parts, "index.html")
+
+        with open(path) as f:
+            return f.read()
+
+    def test_only_released_issues_are_exported(self):
+        Issue.objects.create(
+            title="Scheduled issue",
+            issue_number=4,
+            publish_date=timezone.now() + timezone.timedelta(days=1),
+        )
+        Issue.objects.create(
+            title="Draft issue",
+            issue_number=5,
+            publish_date=timezone.now(),
+            is_draft=True,
+        )
+
+        result = self.export()
+
+        self.assertEqual(result["exported"], 3)
+        # the posts of each issue are shown on 2 pages
+        self.assertEqual(result["pages"], 3 * 2 + 2)
+        self.assertIn(
+            "Post 23 of issue 2",
+            self.read(self.issues[1].get_absolute_url(), "page", "2"),
+        )
+
+        exported = self.read(reverse("newsfeed:issue_list")) + self.read(
+            reverse("newsfeed:latest_issue")
+        )
+        self.assertIn("Issue 3", exported)
+        self.assertNotIn("Scheduled issue", exported)
+        self.assertNotIn("Draft issue", exported)
+
+        for issue_number in (4, 5):
+            url = Issue(issue_number=issue_number).get_absolute_url()
+            self.assertFalse(
+                os.path.exists(os.path.join(self.output_dir, url.lstrip("/")))
+            )
+
+    def test_incremental_export(self):
+        self.export()
+
+        with open(os.path.join(self.output_dir, MANIFEST_NAME)) as f:
+            self.assertEqual(sorted(json.load(f)["issues"]), ["1", "2", "3"])
+
+        # nothing changed
+        result = self.export()
+        self.assertEqual((result["exported"], result["skipped"]), (0, 3))
+
+        # a changed post is exported again with its issue
+        post = self.issues[0].posts.first()
+        post.title = "Changed post"
+        post.save()
+        # an issue that is no longer released is removed
+        Issue.objects.filter(pk=self.issues[1].pk).update(is_draft=True)
+
+        result = self.export()
+
+        self.assertEqual(
+            (result["exported"], result["removed"], result["skipped"]), (1, 1, 1)
+        )
+        self.assertIn("Changed post", self.read(self.issues[0].get_absolute_url()))
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(
+                    self.output_dir, self.issues[1].get_absolute_url().lstrip("/")
+                )
+            )
+        )
+
+        # a full export writes every released issue
+        self.assertEqual(self.export(full=True)["exported"], 2)
+
+
+class ViewPageCacheTests(SharedCacheMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_issues(issues=3, posts=10, categories=3)
+
+    def test_cached_pages_do_not_query(self):
+        urls = [
+            reverse("newsfeed:issue_list"),
+            reverse("newsfeed:latest_issue"),
+            Issue.objects.get(issue_number=3).get_absolute_url(),
+        ]
+
+        for url in urls:
+            self.client.get(url)
+
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+
+            self.assertEqual(response.status_code, 200)
+
+    def test_change_invalidates_pages(self):
+        url = reverse("newsfeed:latest_issue")
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            issue = Issue.objects.get(issue_number=3)
+            issue.title = "Changed title"
+            issue.save()
+
+        self.assertContains(self.client.get(url), "Changed title")
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_pages_are_not_cached_per_process(self):
+        url = reverse("newsfeed:latest_issue")
+        self.client.get(url)
+
+        # latest issue with its snapshot
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        self.assertEqual(
+            [warning.id for warning in check_cache(None)], ["newsfeed.W001"]
+        )
+
+
+class RecipientBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(7)
+
+    def get_batches(self, batch_size, page_size):
+        recipients = Subscriber.objects.subscribed()
+
+        # a query for each page, the last page is shorter
+        with self.assertNumQueries(3):
+            batches = list(recipients.recipient_batches(batch_size, page_size))
+
+        return [[email_address for _, email_address, _ in batch] for batch in batches]
+
+    def test_pages_are_batches_without_batch_size(self):
+        batches = self.get_batches(0, page_size=3)
+
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+        self.assertEqual(
+            sum(batches, []),
+            list(
+                Subscriber.objects.order_by("pk").values_list(
+                    "email_address", flat=True
+                )
+            ),
+        )
+
+    @skipIf(connection.vendor != "sqlite", "the query plan is checked on SQLite")
+    def test_pages_are_read_from_the_index(self):
+        page = (
+            Subscriber.objects.subscribed()
+            .order_by("pk")
+            .values_list("pk", "email_address", "token")
+        )
+
+        for query in (page[:100], page.filter(pk__gt=3)[:100]):
+            self.assertIn(
+                "USING COVERING INDEX newsfeed_subscriber_active_idx", query.explain()
+            )
+
+    def test_batches_span_pages(self):
+        batches = self.get_batches(2, page_size=3)
+
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 2, 1])
+        self.assertEqual(len(set(sum(batches, []))), 7)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.rate_limiter = TokenBucketRateLimiter(rate=10, burst=5, clock=self.clock)
+
+    def test_burst_then_rate(self):
+        # a full bucket lets the burst through
+        self.assertEqual([self.rate_limiter.reserve() for _ in range(5)], [0] * 5)
+
+        # then each message waits for its token
+        self.assertAlmostEqual(self.rate_limiter.reserve(), 0.1)
+        self.assertAlmostEqual(self.rate_limiter.reserve(), 0.2)
+
+    def test_refill(self):
+        self.rate_limiter.reserve(5)
+
+        self.clock.now += 0.3
+        self.assertEqual([self.rate_limiter.reserve() for _ in range(3)], [0] * 3)
+        self.assertAlmostEqual(self.rate_limiter.reserve(), 0.1)
+
+        # the bucket does not hold more than the burst after being idle
+        self.clock.now += 60
+        self.assertEqual([self.rate_limiter.reserve() for _ in range(5)], [0] * 5)
+        self.assertGreater(self.rate_limiter.reserve(), 0)
+
+    def test_acquire_blocks_until_rate(self):
+        with mock.patch("newsfeed.ratelimit.time.sleep", self.clock.sleep):
+            for _ in range(25):
+                self.rate_limiter.acquire()
+
+        # 5 messages of the burst, then 20 messages at 10 per second
+        self.assertAlmostEqual(self.clock.now, 2)
+
+    def test_no_rate_does_not_block(self):
+        rate_limiter = TokenBucketRateLimiter(rate=0, clock=self.clock)
+
+        self.assertEqual(rate_limiter.reserve(1000), 0)
+
+
+class NewsletterMessageTests(SimpleTestCase):
+    unsubscribe_url = (
+        f"https://example.com/unsubscribe/{UNSUBSCRIBE_TOKEN_PLACEHOLDER}/"
+    )
+
+    def get_messages(self, html, token):
+        """returns the message of the factory and the one built on its own"""
+        factory = NewsletterMessageFactory(
+            subject="Issue 1 – news",
+            html=html,
+            from_email="newsletter@example.com",
+            unsubscribe_url=self.unsubscribe_url,
+        )
+        message = factory("subscriber@example.com", token=token)
+
+        unsubscribe_url = self.unsubscribe_url.replace(
+            str(UNSUBSCRIBE_TOKEN_PLACEHOLDER), str(token)
+        )
+        expected = EmailMessage(
+            subject="Issue 1 – news",
+            body=html.replace(str(UNSUBSCRIBE_TOKEN_PLACEHOLDER), str(token)),
+            from_email="newsletter@example.com",
+            to=["subscriber@example.com"],
+            headers={
+                "List-Unsubscribe-Post": "List-Unsubscribe=One-Click",
+                "List-Unsubscribe": f"<{unsubscribe_url}>",
+            },
+        )
+        expected.content_subtype = "html"
+
+        return factory, message, expected
+
+    def assertSameMessage(self, message, expected):
+        parsed, parsed_expected = (
+            email.message_from_bytes(m.message().as_bytes(linesep="\r\n"))
+            for m in (message, expected)
+        )
+
+        def get_headers(message):
+            # the date and message id are different for every message,
+            # long headers may be folded
+            return sorted(
+                (name, " ".join(value.split()))
+                for name, value in message.items()
+                if name not in ("Date", "Message-ID")
+            )
+
+        self.assertEqual(get_headers(parsed), get_headers(parsed_expected))
+        self.assertEqual(
+            parsed.get_payload(decode=True), parsed_expected.get_payload(decode=True)
+        )
+
+    def test_message_matches_message_built_alone(self):
+        html = f'<p>Ünïcode</p><a href="{self.unsubscribe_url}">Unsubscribe</a>'
+        token = uuid.uuid4()
+
+        factory, message, expected = self.get_messages(html, token)
+
+        self.assertSameMessage(message, expected)
+        self.assertTrue(factory._substitutable["\r\n"])
+
+    def test_quoted_printable_fallback(self):
+        # lines over 998 characters are encoded as quoted-printable,
+        # which wraps some of the placeholders of this line
+        html = "".join(
+            f'{"x" * i}<a href="{self.unsubscribe_url}">Unsubscribe</a>'
+            for i in range(20)
+        )
+        token = uuid.uuid4()
+
+        factory, message, expected = self.get_messages(html, token)
+
+        self.assertSameMessage(message, expected)
+        self.assertEqual(
+            email.message_from_bytes(message.message().as_bytes())[
+                "Content-Transfer-Encoding"
+            ],
+            "quoted-printable",
+        )
+        self.assertFalse(factory._substitutable["\r\n"])
+
+
+class RefusingEmailBackend(EmailBackend):
+    """locmem backend whose server refuses the addresses in ``refused``"""
+
+    refused = set()
+
+    def send_messages(self, messages):
+        for message in messages:
+            refused = self.refused.intersection(message.to)
+            if refused:
+                raise SMTPRecipientsRefused(
+                    {address: (550, b"") for address in refused}
+                )
+
+        return super().send_messages(messages)
+
+
+@override_settings(
+    CACHES=DUMMY_CACHES, EMAIL_BACKEND="newsfeed.tests.RefusingEmailBackend"
+)
+class NewsletterRetryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(5)
+        (issue,) = create_issues(issues=1, posts=3, categories=1)
+        cls.newsletter = Newsletter.objects.create(issue=issue, subject="Issue 1")
+
+    def setUp(self):
+        RefusingEmailBackend.refused = {"subscriber1@example.com"}
+
+    def send(self, retry=False):
+        sender = NewsletterEmailSender(
+            newsletters=Newsletter.objects.filter(pk=self.newsletter.pk),
+            respect_schedule=False,
+        )
+        sender.per_batch_wait = 0
+        mail.outbox = []
+
+        if retry:
+            # the retry is due
+            NewsletterRetry.objects.update(next_attempt_at=timezone.now())
+            sender.send_retries()
+        else:
+            sender.send_emails()
+
+    def test_refused_recipient_is_retried(self):
+        self.send()
+
+        retry = NewsletterRetry.objects.get()
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(retry.subscriber.email_address, "subscriber1@example.com")
+        self.assertEqual(retry.attempts, 1)
+        self.assertIn("550", retry.last_error)
+
+        self.send(retry=True)
+
+        retry.refresh_from_db()
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(retry.attempts, 2)
+        # the delay doubles after each attempt
+        self.assertGreater(
+            retry.next_attempt_at,
+            retry.updated_at
+            + timezone.timedelta(seconds=NEWSFEED_EMAIL_RETRY_BACKOFF * 2 - 1),
+        )
+
+        RefusingEmailBackend.refused = set()
+        self.send(retry=True)
+
+        self.newsletter.refresh_from_db()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(NewsletterRetry.objects.exists())
+        self.assertEqual(self.newsletter.recipients_count, 5)
+        self.assertEqual(self.newsletter.delivered_count, 5)
+        self.assertEqual(self.newsletter.failed_count, 0)
+
+    def test_retries_stop_after_max_attempts(self):
+        self.send()
+
+        for _ in range(NEWSFEED_EMAIL_RETRY_MAX_ATTEMPTS - 1):
+            self.send(retry=True)
+
+        retry = NewsletterRetry.objects.get()
+        self.assertEqual(retry.attempts, NEWSFEED_EMAIL_RETRY_MAX_ATTEMPTS)
+        self.assertIsNone(retry.next_attempt_at)
+
+    def test_delivered_emails_are_not_retried(self):
+        RefusingEmailBackend.refused = {
+            subscriber.email_address for subscriber in Subscriber.objects.all()
+        }
+        self.send()
+        self.assertEqual(NewsletterRetry.objects.count(), 5)
+
+        # the newsletter was not sent so the next send delivers it
+        RefusingEmailBackend.refused = set()
+        self.send()
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(NewsletterRetry.objects.exists())
+
+        self.send(retry=True)
+        self.assertEqual(mail.outbox, [])
+
+    def test_retries_of_delivered_subscribers_are_removed(self):
+        subscriber = Subscriber.objects.get(email_address="subscriber2@example.com")
+        NewsletterDelivery.objects.create(
+            newsletter=self.newsletter, subscriber=subscriber
+        )
+        NewsletterRetry.objects.create(
+            newsletter=self.newsletter, subscriber=subscriber
+        )
+
+        self.send(retry=True)
+
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(NewsletterRetry.objects.exists())
+
+    def test_unsubscribed_retries_are_removed(self):
+        self.send()
+        Subscriber.objects.filter(email_address="subscriber1@example.com").update(
+            subscribed=False
+        )
+
+        self.send(retry=True)
+
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(NewsletterRetry.objects.exists())
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class NewsletterResumeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(5)
+        (issue,) = create_issues(issues=1, posts=3, categories=1)
+        cls.newsletter = Newsletter.objects.create(issue=issue, subject="Issue 1")
+
+    def send(self, resume):
+        NewsletterEmailSender(
+            newsletters=Newsletter.objects.filter(pk=self.newsletter.pk),
+            respect_schedule=False,
+            resume=resume,
+        ).send_emails()
+
+        return sorted(message.to[0] for message in mail.outbox)
+
+    def test_resume_skips_delivered_subscribers(self):
+        # a send that stopped after two emails
+        NewsletterDelivery.objects.bulk_create(
+            NewsletterDelivery(newsletter=self.newsletter, subscriber=subscriber)
+            for subscriber in Subscriber.objects.filter(
+                email_address__in=["subscriber0@example.com", "subscriber3@example.com"]
+            )
+        )
+
+        self.assertEqual(
+            self.send(resume=True),
+            [
+                "subscriber1@example.com",
+                "subscriber2@example.com",
+                "subscriber4@example.com",
+            ],
+        )
+        self.assertEqual(self.newsletter.deliveries.count(), 5)
+
+        # nothing is left to send
+        mail.outbox = []
+        self.assertEqual(self.send(resume=True), [])
+
+    def test_send_without_resume_sends_to_all(self):
+        NewsletterDelivery.objects.create(
+            newsletter=self.newsletter, subscriber=Subscriber.objects.first()
+        )
+
+        self.assertEqual(len(self.send(resume=False)), 5)
+        self.assertEqual(self.newsletter.deliveries.count(), 5)
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class NewsletterShardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(10)
+        (issue,) = create_issues(issues=1, posts=3, categories=1)
+        cls.newsletter = Newsletter.objects.create(issue=issue, subject="Issue 1")
+
+    def test_shards_split_recipients(self):
+        shards = []
+
+        for shard_index in range(3):
+            self.newsletter.refresh_from_db()
+            self.assertFalse(self.newsletter.is_sent)
+
+            mail.outbox = []
+            NewsletterEmailSender(
+                newsletters=Newsletter.objects.filter(pk=self.newsletter.pk),
+                respect_schedule=False,
+                shard=(shard_index, 3),
+            ).send_emails()
+            shards.append({message.to[0] for message in mail.outbox})
+
+        # every subscriber is in exactly one shard
+        self.assertEqual(sum(len(shard) for shard in shards), 10)
+        self.assertEqual(
+            set().union(*shards),
+            set(Subscriber.objects.values_list("email_address", flat=True)),
+        )
+        self.assertTrue(all(shards))
+
+        # the newsletter is sent once the last shard was sent
+        self.newsletter.refresh_from_db()
+        self.assertTrue(self.newsletter.is_sent)
+        self.assertEqual(
+            sorted(self.newsletter.shards.values_list("shard_index", "sent")),
+            [(index, len(shard)) for index, shard in enumerate(shards)],
+        )
+
+    def test_invalid_shard(self):
+        with self.assertRaises(ValueError):
+            NewsletterEmailSender(shard=(3, 3))
+
+
+class DisconnectingEmailBackend(EmailBackend):
+    """
+    locmem backend that records the thread sending each message and
+    drops the connection when sending to the addresses in ``disconnected``
+    """
+
+    disconnected = set()
+    threads = []
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.disconnected.intersection(message.to):
+                raise SMTPServerDisconnected("Connection unexpectedly closed")
+
+        self.threads.append(threading.current_thread().name)
+
+        return super().send_messages(messages)
+
+
+@override_settings(
+    CACHES=DUMMY_CACHES, EMAIL_BACKEND="newsfeed.tests.DisconnectingEmailBackend"
+)
+class WorkerPoolTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(20)
+        (issue,) = create_issues(issues=1, posts=3, categories=1)
+        cls.newsletter = Newsletter.objects.create(issue=issue, subject="Issue 1")
+
+    def setUp(self):
+        DisconnectingEmailBackend.disconnected = set()
+        DisconnectingEmailBackend.threads = []
+
+    def send(self, workers=4):
+        sender = NewsletterEmailSender(respect_schedule=False, workers=workers)
+        sender.batch_size = 3
+        sender.per_batch_wait = 0
+        sender.send_emails()
+
+        self.newsletter.refresh_from_db()
+
+    def test_each_recipient_gets_one_email(self):
+        self.send()
+
+        recipients = Counter(message.to[0] for message in mail.outbox)
+
+        self.assertEqual(len(recipients), 20)
+        self.assertEqual(set(recipients.values()), {1})
+        self.assertTrue(
+            all(
+                name.startswith("newsfeed-sender")
+                for name in DisconnectingEmailBackend.threads
+            )
+        )
+        self.assertEqual(self.newsletter.delivered_count, 20)
+        self.assertTrue(self.newsletter.is_sent)
+
+    def test_worker_failure_is_reported(self):
+        DisconnectingEmailBackend.disconnected = {"subscriber7@example.com"}
+        errors = []
+
+        def receiver(exception, **kwargs):
+            errors.append(exception)
+
+        signals.newsletter_send_error.connect(receiver)
+        self.addCleanup(signals.newsletter_send_error.disconnect, receiver)
+
+        with self.assertLogs("newsfeed.utils", "ERROR"):
+            self.send()
+
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], SMTPServerDisconnected)
+        # the rest of the batch is not sent over the broken connection,
+        # the other workers keep sending
+        self.assertEqual(len(mail.outbox), 18)
+        self.assertEqual(
+            set(
+                NewsletterRetry.objects.values_list(
+                    "subscriber__email_address", flat=True
+                )
+            ),
+            {"subscriber7@example.com", "subscriber8@example.com"},
+        )
+        self.assertEqual(self.newsletter.delivered_count, 18)
+        self.assertEqual(self.newsletter.failed_count, 2)
+
+    def test_signals_are_sent_from_the_sending_thread(self):
+        DisconnectingEmailBackend.disconnected = {"subscriber7@example.com"}
+        sent = []
+
+        def receiver(signal, **kwargs):
+            sent.append((signal, threading.current_thread()))
+
+        for signal in (
+            signals.newsletter_batch_sent,
+            signals.newsletter_send_error,
+            signals.newsletter_reconnected,
+        ):
+            signal.connect(receiver)
+            self.addCleanup(signal.disconnect, receiver)
+
+        with self.assertLogs("newsfeed.utils", "ERROR"):
+            # a single worker opens a new connection after the error
+            self.send(workers=1)
+
+        signals_sent = Counter(signal for signal, _ in sent)
+        self.assertEqual(signals_sent[signals.newsletter_batch_sent], 7)
+        self.assertEqual(signals_sent[signals.newsletter_send_error], 1)
+        self.assertEqual(signals_sent[signals.newsletter_reconnected], 1)
+        self.assertEqual({thread for _, thread in sent}, {threading.current_thread()})
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps the recipients and session of each message"""
+
+    def __init__(self):
+        self.recipients = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recipients += envelope.rcpt_tos
+        self.sessions.add(session)
+        return "250 OK"
+
+
+@skipIf(Controller is None, "aiosmtpd is not installed")
+@override_settings(CACHES=DUMMY_CACHES)
+class AsyncSenderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(10)
+        (issue,) = create_issues(issues=1, posts=3, categories=1)
+        cls.newsletter = Newsletter.objects.create(issue=issue, subject="Issue 1")
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        controller = Controller(self.handler, hostname="127.0.0.1", port=port)
+        controller.start()
+        self.addCleanup(controller.stop)
+
+        settings = override_settings(
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=port,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_sends_over_bounded_sessions(self):
+        sender = AsyncNewsletterEmailSender(respect_schedule=False, concurrency=2)
+        sender.batch_size = 2
+        sender.per_batch_wait = 0
+        sender.email_host_user = "newsletter@example.com"
+
+        # the database is used from this thread, inside the test transaction
+        async_to_sync(sender.asend_emails)()
+
+        self.newsletter.refresh_from_db()
+        self.assertEqual(
+            sorted(self.handler.recipients),
+            sorted(Subscriber.objects.values_list("email_address", flat=True)),
+        )
+        # the 5 batches are sent over at most 2 sessions at a time,
+        # sessions are reused between batches
+        self.assertLessEqual(len(self.handler.sessions), 2)
+        self.assertEqual(self.newsletter.delivered_count, 10)
+        self.assertEqual(self.newsletter.deliveries.count(), 10)
+        self.assertTrue(self.newsletter.is_sent)
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class UnsubscribeLinkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(2)
+        (issue,) = create_issues(issues=1, posts=3, categories=1)
+        cls.newsletter = Newsletter.objects.create(issue=issue, subject="Issue 1")
+
+    def test_newsletter_has_personal_unsubscribe_links(self):
+        NewsletterEmailSender(respect_schedule=False).send_emails()
+
+        self.assertEqual(len(mail.outbox), 2)
+
+        for message in mail.outbox:
+            subscriber = Subscriber.objects.get(email_address=message.to[0])
+            url = reverse(
+                "newsfeed:newsletter_unsubscribe_confirm",
+                kwargs={"token": subscriber.token},
+            )
+            raw = message.message().as_bytes().decode()
+
+            self.assertIn(f'href="{NEWSFEED_SITE_BASE_URL}{url}"', raw)
+            self.assertIn(f"List-Unsubscribe: <{NEWSFEED_SITE_BASE_URL}{url}>", raw)
+            self.assertIn("List-Unsubscribe-Post: List-Unsubscribe=One-Click", raw)
+
+    def test_one_click_unsubscribe(self):
+        subscriber = Subscriber.objects.first()
+        url = reverse(
+            "newsfeed:newsletter_unsubscribe_confirm",
+            kwargs={"token": subscriber.token},
+        )
+
+        # opening the link does not unsubscribe
+        self.assertContains(self.client.get(url), "Unsubscribe")
+        subscriber.refresh_from_db()
+        self.assertTrue(subscriber.subscribed)
+
+        client = self.client_class(enforce_csrf_checks=True)
+        response = client.post(url, {"List-Unsubscribe": "One-Click"})
+
+        self.assertContains(response, "successfully unsubscribed")
+        subscriber.refresh_from_db()
+        self.assertFalse(subscriber.subscribed)
+
+
+class SubscriberCacheTests(SharedCacheMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(3)
+
+    def test_lookups_are_cached(self):
+        subscriber = Subscriber.objects.first()
+        get_cached_subscriber("token", subscriber.token)
+
+        with self.assertNumQueries(0):
+            cached = get_cached_subscriber("token", subscriber.token)
+            by_email = get_cached_subscriber("email_address", subscriber.email_address)
+
+        self.assertEqual(cached, subscriber)
+        self.assertEqual(by_email.token, subscriber.token)
+        self.assertTrue(cached.subscribed)
+
+    def test_save_forgets_subscriber(self):
+        subscriber = Subscriber.objects.first()
+        get_cached_subscriber("token", subscriber.token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subscriber.subscribed = False
+            subscriber.save()
+
+        self.assertFalse(get_cached_subscriber("token", subscriber.token).subscribed)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_subscribers_are_not_cached_per_process(self):
+        subscriber = Subscriber.objects.first()
+        get_cached_subscriber("token", subscriber.token)
+
+        # another process unsubscribes the subscriber
+        Subscriber.objects.filter(pk=subscriber.pk).update(subscribed=False)
+
+        with self.assertNumQueries(1):
+            self.assertFalse(
+                get_cached_subscriber("token", subscriber.token).subscribed
+            )
+
+        self.assertEqual(
+            [warning.id for warning in check_cache(None)], ["newsfeed.W001"]
+        )
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_unsubscribe_without_shared_cache_is_written(self):
+        subscriber = Subscriber.objects.first()
+        url = reverse(
+            "newsfeed:newsletter_unsubscribe_confirm",
+            kwargs={"token": subscriber.token},
+        )
+
+        self.client.post(url)
+
+        subscriber.refresh_from_db()
+        self.assertFalse(subscriber.subscribed)
+
+
+class UnsubscribeQueueTests(SharedCacheMixin, TestCase):
+    """unsubscribes are only queued in a cache shared between processes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(3)
+
+    def test_unsubscribes_are_written_in_bulk(self):
+        subscribers = list(Subscriber.objects.all())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for subscriber in subscribers:
+                url = reverse(
+                    "newsfeed:newsletter_unsubscribe_confirm",
+                    kwargs={"token": subscriber.token},
+                )
+                self.client.post(url)
+
+        # one flush is queued for all the unsubscribes
+        self.assertEqual(
+            Task.objects.filter(name="newsfeed.tasks.flush_unsubscribes").count(), 1
+        )
+        self.assertEqual(Subscriber.objects.filter(subscribed=True).count(), 3)
+        self.assertFalse(
+            get_cached_subscriber("token", subscribers[0].token).subscribed
+        )
+
+        # the subscribers are selected and updated in one savepoint
+        with self.assertNumQueries(4):
+            self.assertEqual(flush_unsubscribes(), 3)
+
+        self.assertFalse(Subscriber.objects.filter(subscribed=True).exists())
+        self.assertEqual(flush_unsubscribes(), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SubscriberStateTests(TestCase):
+    def setUp(self):
+        caches[NEWSFEED_CACHE_ALIAS].clear()
+        self.sent = []
+
+        def receiver(signal, **kwargs):
+            self.sent.append((signal, kwargs))
+
+        for signal in (
+            signals.subscribed,
+            signals.unsubscribed,
+            signals.email_verification_sent,
+        ):
+            signal.connect(receiver, sender=Subscriber)
+            self.addCleanup(signal.disconnect, receiver, sender=Subscriber)
+
+    def test_subscribe_and_unsubscribe(self):
+        subscriber = Subscriber.objects.create(email_address="new@example.com")
+
+        subscriber.send_verification_email()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(subscriber.get_verification_url(), mail.outbox[0].body)
+
+        response = self.client.get(subscriber.get_verification_url())
+        self.assertContains(response, "Subscription confirmed!")
+
+        subscriber.refresh_from_db()
+        self.assertTrue(subscriber.subscribed and subscriber.verified)
+        self.assertEqual(
+            self.client.get(subscriber.get_verification_url()).status_code, 404
+        )
+
+        self.assertTrue(subscriber.unsubscribe())
+        self.assertFalse(subscriber.unsubscribe())
+        self.assertFalse(Subscriber.objects.get().subscribed)
+        self.assertEqual(
+            [signal for signal, _ in self.sent],
+            [
+                signals.email_verification_sent,
+                signals.subscribed,
+                signals.unsubscribed,
+            ],
+        )
+
+    def test_expired_verification_does_not_subscribe(self):
+        subscriber = Subscriber.objects.create(
+            email_address="new@example.com",
+            verification_sent_date=timezone.now() - timezone.timedelta(days=30),
+        )
+
+        self.assertFalse(subscriber.subscribe())
+        self.assertFalse(Subscriber.objects.get().subscribed)
+
+    def test_request_verification_updates_existing_subscriber(self):
+        subscriber = Subscriber.objects.create(email_address="new@example.com")
+        token = subscriber.token
+
+        Subscriber.objects.request_verification(
+            ["new@example.com", "new@EXAMPLE.com", "other@Example.com"]
+        )
+        requested_at = Subscriber.objects.get(
+            pk=subscriber.pk
+        ).verification_requested_at
+        self.assertIsNotNone(requested_at)
+
+        Subscriber.objects.request_verification(["New@example.com", "new@Example.COM"])
+
+        self.assertEqual(
+            sorted(Subscriber.objects.values_list("email_address", flat=True)),
+            ["new@example.com", "other@example.com"],
+        )
+        subscriber.refresh_from_db()
+        self.assertEqual(subscriber.token, token)
+        self.assertGreater(subscriber.verification_requested_at, requested_at)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_verification_task_is_queued_without_shared_cache(self):
+        tasks = Task.objects.filter(name="newsfeed.tasks.send_verification_emails")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_verification_emails()
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_verification_emails()
+
+        self.assertEqual(tasks.count(), 1)
+
+        # the worker process ran the task, it cannot clear a flag in
+        # the cache of this process
+        tasks.update(status=Task.Status.SUCCEEDED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_verification_emails()
+
+        self.assertEqual(tasks.filter(status=Task.Status.PENDING).count(), 1)
+
+    def test_bulk_unsubscribe(self):
+        create_subscribers(5)
+
+        # select, update and release of the savepoint,
+        # the subscribers of the signal
+        with self.assertNumQueries(5):
+            unsubscribed = Subscriber.objects.all().unsubscribe()
+
+        self.assertEqual(unsubscribed, 5)
+        self.assertFalse(Subscriber.objects.filter(subscribed=True).exists())
+        ((signal, kwargs),) = self.sent
+        self.assertEqual(signal, signals.unsubscribed)
+        self.assertEqual(len(kwargs["instances"]), 5)
+        self.assertEqual(Subscriber.objects.all().unsubscribe(), 0)
+
+    def test_bulk_resend_verification(self):
+        create_subscribers(2)
+        Subscriber.objects.create(email_address="new@example.com")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            requested = Subscriber.objects.all().resend_verification()
+
+        self.assertEqual(requested, 1)
+        self.assertTrue(
+            Task.objects.filter(name="newsfeed.tasks.send_verification_emails").exists()
+        )
+
+        self.assertEqual(send_requested_verification_emails(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["new@example.com"])
+        ((signal, kwargs),) = self.sent
+        self.assertEqual(signal, signals.email_verification_sent)
+        self.assertEqual(kwargs["instances"][0].email_address, "new@example.com")
+
+
+class RecordingTaskBackend(DatabaseTaskBackend):
+    """stores the tasks in the database and records the dispatched tasks"""
+
+    dispatched = []
+
+    def dispatch(self, task):
+        super().dispatch(task)
+        self.dispatched.append(task.pk)
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        RecordingTaskBackend.dispatched = []
+
+    def create_task(self, status, updated_at=None):
+        task = Task.objects.create(
+            name="newsfeed.tasks.flush_unsubscribes", status=status
+        )
+
+        if updated_at is not None:
+            Task.objects.filter(pk=task.pk).update(updated_at=updated_at)
+
+        return task
+
+    @mock.patch(
+        "newsfeed.tasks.NEWSFEED_TASK_BACKEND", "newsfeed.tests.RecordingTaskBackend"
+    )
+    def test_requeue_dispatches_through_backend(self):
+        failed = self.create_task(Task.Status.FAILED)
+        running = self.create_task(Task.Status.RUNNING)
+        abandoned = self.create_task(
+            Task.Status.RUNNING, updated_at=timezone.now() - timezone.timedelta(hours=1)
+        )
+
+        self.assertEqual(requeue_tasks(Task.objects.all()), 2)
+        self.assertEqual(
+            sorted(RecordingTaskBackend.dispatched), [failed.pk, abandoned.pk]
+        )
+
+        failed.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(failed.status, Task.Status.PENDING)
+        self.assertEqual(failed.error, "")
+        self.assertEqual(running.status, Task.Status.RUNNING)
+
+    def test_claim_abandoned_running_task(self):
+        self.create_task(Task.Status.RUNNING)
+        abandoned = self.create_task(
+            Task.Status.RUNNING, updated_at=timezone.now() - timezone.timedelta(hours=1)
+        )
+
+        with self.assertLogs("newsfeed.tasks", "WARNING"):
+            task = claim_task()
+
+        self.assertEqual(task, abandoned)
+        self.assertEqual(task.attempts, 1)
+        # the lease is renewed
+        self.assertIsNone(claim_task())
+
+    @mock.patch("newsfeed.tasks.NEWSFEED_TASK_LEASE_TIMEOUT", 0)
+    def test_running_tasks_are_kept_without_lease(self):
+        self.create_task(
+            Task.Status.RUNNING, updated_at=timezone.now() - timezone.timedelta(hours=1)
+        )
+
+        self.assertIsNone(claim_task())
+        self.assertEqual(requeue_tasks(Task.objects.all()), 0)
+
+    @override_settings(CACHES=DUMMY_CACHES)
+    def test_reclaimed_send_task_skips_delivered_subscribers(self):
+        create_subscribers(5)
+        (issue,) = create_issues(issues=1, posts=3, categories=1)
+        newsletter = Newsletter.objects.create(issue=issue, subject="Issue 1")
+        # the worker sending the newsletter crashed after three emails
+        NewsletterDelivery.objects.bulk_create(
+            NewsletterDelivery(newsletter=newsletter, subscriber=subscriber)
+            for subscriber in Subscriber.objects.order_by("pk")[:3]
+        )
+        abandoned = Task.objects.create(
+            name="newsfeed.tasks.send_newsletters",
+            kwargs={"newsletter_ids": [newsletter.pk], "respect_schedule": False},
+            status=Task.Status.RUNNING,
+        )
+        Task.objects.filter(pk=abandoned.pk).update(
+            updated_at=timezone.now() - timezone.timedelta(hours=1)
+        )
+
+        with self.assertLogs("newsfeed.tasks", "WARNING"):
+            task = claim_task()
+
+        self.assertEqual(run_task(task.pk).status, Task.Status.SUCCEEDED)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ["subscriber3@example.com", "subscriber4@example.com"],
+        )
+        self.assertEqual(newsletter.deliveries.count(), 5)
+
+
+DSN = """\
+From: MAILER-DAEMON@example.com
+To: newsletter@example.com
+Subject: Undelivered Mail Returned to Sender
+MIME-Version: 1.0
+Content-Type: multipart/report; report-type=delivery-status; boundary="b"
+
+--b
+Content-Type: text/plain
+
+The mail could not be delivered.
+
+--b
+Content-Type: message/delivery-status
+
+Reporting-MTA: dns; mail.example.com
+
+Final-Recipient: rfc822; subscriber1@EXAMPLE.com
+Action: failed
+Status: 5.1.1
+
+Final-Recipient: rfc822; subscriber2@example.com
+Action: delayed
+Status: 4.2.2
+
+--b--
+"""
+
+FEEDBACK_REPORT = """\
+From: abuse@example.net
+To: newsletter@example.com
+Subject: Complaint
+MIME-Version: 1.0
+Content-Type: multipart/report; report-type=feedback-report; boundary="b"
+
+--b
+Content-Type: text/plain
+
+This is an abuse report.
+
+--b
+Content-Type: message/feedback-report
+
+Feedback-Type: abuse
+User-Agent: Example/1.0
+Version: 1
+
+--b
+Content-Type: text/rfc822-headers
+
+From: newsletter@example.com
+To: subscriber3@example.com
+Subject: Issue 1
+
+--b--
+"""
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class BounceIngestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(5)
+
+    def get_suppressed(self):
+        return dict(
+            Subscriber.objects.suppressed().values_list(
+                "email_address", "suppression_reason"
+            )
+        )
+
+    def test_ingest_maildir(self):
+        with tempfile.TemporaryDirectory() as path:
+            maildir = mailbox.Maildir(os.path.join(path, "bounces"))
+            maildir.add(DSN)
+            maildir.add(FEEDBACK_REPORT)
+            maildir.add("Subject: Out of office\n\nI am away.")
+
+            call_command(
+                "ingest_bounces",
+                maildir._path,
+                "--delete",
+                stdout=io.StringIO(),
+                stderr=io.StringIO(),
+            )
+
+            self.assertEqual(len(maildir), 0)
+
+        self.assertEqual(
+            self.get_suppressed(),
+            {
+                "subscriber1@example.com": Subscriber.SuppressionReason.BOUNCE,
+                "subscriber3@example.com": Subscriber.SuppressionReason.COMPLAINT,
+            },
+        )
+
+        recipients = NewsletterEmailSender(respect_schedule=False).subscribers
+        self.assertEqual(recipients.count(), 3)
+
+    def test_webhook(self):
+        notification = {
+            "notificationType": "Bounce",
+            "bounce": {
+                "bounceType": "Permanent",
+                "bouncedRecipients": [{"emailAddress": "subscriber4@example.com"}],
+            },
+        }
+        url = reverse("newsfeed:bounce_webhook")
+
+        with self.modify_token("secret"):
+            response = self.client.post(
+                url,
+                json.dumps(
+                    {"Type": "Notification", "Message": json.dumps(notification)}
+                ),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 401)
+
+            response = self.client.post(
+                f"{url}?token=secret",
+                json.dumps(
+                    {"Type": "Notification", "Message": json.dumps(notification)}
+                ),
+                content_type="application/json",
+            )
+            self.assertEqual(response.json(), {"suppressed": 1})
+
+            response = self.client.post(
+                url,
+                json.dumps([{"email": "subscriber0@example.com", "type": "complaint"}]),
+                content_type="application/json",
+                HTTP_AUTHORIZATION="Bearer secret",
+            )
+            self.assertEqual(response.json(), {"suppressed": 1})
+
+        self.assertEqual(
+            self.get_suppressed(),
+            {
+                "subscriber4@example.com": Subscriber.SuppressionReason.BOUNCE,
+                "subscriber0@example.com": Subscriber.SuppressionReason.COMPLAINT,
+            },
+        )
+
+    def test_suppress_ignores_case(self):
+        subscriber = Subscriber.objects.create(email_address="Alice@Example.COM")
+
+        self.assertEqual(
+            Subscriber.objects.suppress(
+                ["alice@example.com"], Subscriber.SuppressionReason.BOUNCE
+            ),
+            1,
+        )
+
+        subscriber.refresh_from_db()
+        self.assertIsNotNone(subscriber.suppressed_at)
+
+    def test_subscribe_stores_lowercase_domain(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("newsfeed:newsletter_subscribe"),
+                {"email_address": "Alice@Example.COM"},
+            )
+
+        self.assertTrue(
+            Subscriber.objects.filter(email_address="Alice@example.com").exists()
+        )
+
+    def test_existing_address_is_matched_whatever_its_case(self):
+        # stored before the domains were lowercased
+        subscriber = Subscriber.objects.create(
+            email_address="Alice@Example.COM", subscribed=True, verified=True
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("newsfeed:newsletter_subscribe"),
+                {"email_address": "alice@example.com"},
+            )
+
+        self.assertEqual(
+            Subscriber.objects.filter(email_address__iexact="alice@example.com").get(),
+            subscriber,
+        )
+
+        response = self.client.post(
+            reverse("newsfeed:newsletter_unsubscribe"),
+            {"email_address": "Alice@Example.COM"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+        self.assertTrue(response.json()["success"])
+        subscriber.refresh_from_db()
+        self.assertFalse(subscriber.subscribed)
+
+    def test_suppressed_subscriber_is_not_sent_verification(self):
+        Subscriber.objects.suppress(
+            ["subscriber2@example.com"], Subscriber.SuppressionReason.BOUNCE
+        )
+        Subscriber.objects.update(subscribed=False, verified=False)
+
+        self.assertEqual(Subscriber.objects.all().resend_verification(), 4)
+
+        Subscriber.objects.request_verification(["subscriber2@example.com"])
+
+        self.assertEqual(send_requested_verification_emails(), 4)
+        self.assertNotIn(
+            ["subscriber2@example.com"], [message.to for message in mail.outbox]
+        )
+
+    def modify_token(self, token):
+        return mock.patch("newsfeed.views.NEWSFEED_BOUNCE_WEBHOOK_TOKEN", token)
+
+
+class SubscriberPurgeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        expired = timezone.now() - timezone.timedelta(days=30)
+
+        Subscriber.objects.bulk_create(
+            [
+                Subscriber(
+                    email_address=f"expired{i}@example.com",
+                    verification_sent_date=expired,
+                )
+                for i in range(5)
+            ]
+            + [
+                Subscriber(
+                    email_address="verified@example.com",
+                    verified=True,
+                    subscribed=True,
+                    verification_sent_date=expired,
+                ),
+                Subscriber(
+                    email_address="recent@example.com",
+                    verification_sent_date=timezone.now(),
+                ),
+                Subscriber(email_address="requested@example.com"),
+            ]
+        )
+
+    def assertKept(self):
+        self.assertEqual(
+            sorted(Subscriber.objects.values_list("email_address", flat=True)),
+            ["recent@example.com", "requested@example.com", "verified@example.com"],
+        )
+
+    def test_purge_in_chunks(self):
+        self.assertEqual(purge_expired_subscribers(chunk_size=2), 5)
+        self.assertKept()
+        self.assertEqual(purge_expired_subscribers(chunk_size=2), 0)
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command("purge_expired_subscribers", "--dry-run", stdout=stdout)
+        self.assertIn("5 subscribers", stdout.getvalue())
+        self.assertEqual(Subscriber.objects.count(), 8)
+
+        stdout = io.StringIO()
+        call_command("purge_expired_subscribers", stdout=stdout)
+        self.assertIn("Deleted 5 expired subscribers", stdout.getvalue())
+        self.assertKept()
+
+
+class SubscriberExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_subscribers(3)
+        Subscriber.objects.create(email_address="new@example.com")
+
+    def export(self, file_name):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), file_name)
+        call_command("export_subscribers", path, stdout=io.StringIO())
+        return path
+
+    def get_subscribers(self):
+        return {
+            subscriber.email_address: (
+                subscriber.token,
+                subscriber.verified,
+                subscriber.subscribed,
+            )
+            for subscriber in Subscriber.objects.all()
+        }
+
+    def test_jsonl_types(self):
+        with open(self.export("subscribers.jsonl"), encoding="utf-8") as f:
+            rows = {row["email_address"]: row for row in map(json.loads, f)}
+
+        subscriber = Subscriber.objects.get(email_address="new@example.com")
+        row = rows["new@example.com"]
+
+        self.assertEqual(len(rows), 4)
+        self.assertIs(row["verified"], False)
+        self.assertIs(rows["subscriber0@example.com"]["subscribed"], True)
+        self.assertIsNone(row["verification_sent_date"])
+        self.assertEqual(row["token"], str(subscriber.token))
+        self.assertEqual(
+            parse_datetime(row["created_at"]).replace(microsecond=0),
+            subscriber.created_at.replace(microsecond=0),
+        )
+
+    def test_csv_strings(self):
+        with open(self.export("subscribers.csv"), newline="", encoding="utf-8") as f:
+            rows = {row["email_address"]: row for row in csv.DictReader(f)}
+
+        self.assertEqual(rows["new@example.com"]["verified"], "False")
+        self.assertEqual(rows["new@example.com"]["verification_sent_date"], "")
+        self.assertEqual(rows["subscriber0@example.com"]["subscribed"], "True")
+
+    def test_import_round_trip(self):
+        for file_name in ("subscribers.jsonl", "subscribers.csv"):
+            with self.subTest(file_name):
+                expected = self.get_subscribers()
+                path = self.export(file_name)
+                Subscriber.objects.all().delete()
+
+                call_command("import_subscribers", path, stdout=io.StringIO())
+
+                self.assertEqual(self.get_subscribers(), expected)
+
+
+class DomainBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Subscriber.objects.bulk_create(
+            Subscriber(
+                email_address=f"subscriber{i}@{domain}",
+                verified=True,
+                subscribed=True,
+            )
+            for i in range(6)
+            for domain in ("gmail.com", "googlemail.com", "example.com", "example.org")
+        )
+
+    def get_batches(self, limits, batch_size=4):
+        sender = NewsletterEmailSender(respect_schedule=False)
+        sender.batch_size = batch_size
+        sender.domain_throttle = DomainThrottle(limits)
+
+        return [
+            [email_address.split("@")[1] for _, email_address, _ in batch]
+            for batch in sender._get_domain_batches(sender.subscribers)
+        ]
+
+    def test_batches_are_grouped_and_interleaved(self):
+        batches = self.get_batches(
+            {"gmail.com": {"rate": 10, "concurrency": 2, "domains": ["googlemail.com"]}}
+        )
+
+        self.assertEqual(sum(len(batch) for batch in batches), 24)
+
+        # each batch only goes to the throttled group or the other domains
+        groups = [
+            "gmail" if set(batch) <= {"gmail.com", "googlemail.com"} else "other"
+            for batch in batches
+        ]
+        for batch, group in zip(batches, groups):
+            if group == "other":
+                self.assertEqual(set(batch), {"example.com", "example.org"})
+
+        # the batches of the groups alternate
+        self.assertEqual(groups, ["gmail", "other"] * 3)
+
+    def test_throttle_groups(self):
+        throttle = DomainThrottle({"gmail.com": {"domains": ["GoogleMail.com"]}})
+
+        self.assertEqual(throttle.get_group("someone@GMAIL.com"), "gmail.com")
+        self.assertEqual(throttle.get_group("someone@googlemail.com"), "gmail.com")
+        self.assertIsNone(throttle.get_group("someone@example.com"))
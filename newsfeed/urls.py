@@ -6,7 +6,10 @@ from .views import (
     LatestIssueView,
     NewsletterSubscribeView,
     NewsletterSubscriptionConfirmView,
+    NewsletterUnsubscribeConfirmView,
     NewsletterUnsubscribeView,
+    bounce_webhook_view,
+    metrics_view,
 )
 
 app_name = "newsfeed"
@@ -26,4 +29,11 @@ urlpatterns = [
         NewsletterUnsubscribeView.as_view(),
         name="newsletter_unsubscribe",
     ),
+    path(
+        "unsubscribe/<uuid:token>/",
+        NewsletterUnsubscribeConfirmView.as_view(),
+        name="newsletter_unsubscribe_confirm",
+    ),
+    path("metrics/", metrics_view, name="metrics"),
+    path("bounces/", bounce_webhook_view, name="bounce_webhook"),
 ]
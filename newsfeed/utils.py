@@ -1,16 +1,66 @@
+import asyncio
 import logging
+import threading
 import time
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import timedelta
+from smtplib import (
+    SMTPDataError,
+    SMTPException,
+    SMTPRecipientsRefused,
+    SMTPSenderRefused,
+)
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.message import sanitize_address
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
 
 from newsfeed.app_settings import (
+    NEWSFEED_EMAIL_ASYNC_CONCURRENCY,
     NEWSFEED_EMAIL_BATCH_SIZE,
     NEWSFEED_EMAIL_BATCH_WAIT,
+    NEWSFEED_EMAIL_RECIPIENT_PAGE_SIZE,
+    NEWSFEED_EMAIL_RETRY_BACKOFF,
+    NEWSFEED_EMAIL_RETRY_MAX_ATTEMPTS,
+    NEWSFEED_EMAIL_VERIFICATION_RESEND_WAIT,
+    NEWSFEED_EMAIL_WORKERS,
     NEWSFEED_SITE_BASE_URL,
+    NEWSFEED_UNSUBSCRIBE_FLUSH_INTERVAL,
+)
+from newsfeed.caching import (
+    cache_subscriber,
+    forget_subscribers,
+    get_cache,
+    is_cache_shared,
+)
+from newsfeed.mail import UNSUBSCRIBE_TOKEN_PLACEHOLDER, NewsletterMessageFactory
+from newsfeed.ratelimit import DomainThrottle, get_rate_limiter
+from newsfeed.signals import (
+    email_verification_sent,
+    newsletter_batch_sent,
+    newsletter_reconnected,
+    newsletter_send_error,
+    newsletter_send_started,
+    newsletter_sent,
+)
+from newsfeed.snapshots import get_issue_snapshot
+from newsfeed.tasks import enqueue, report_progress
+
+# Outcome of a batch sent by a worker thread, the signals are sent from
+# the thread sending the newsletter so their receivers, which may use the
+# database, do not open connections in the workers
+BatchResult = namedtuple(
+    "BatchResult", ["delivered", "failed", "duration", "error", "reconnected"]
 )
 
 
@@ -24,12 +74,13 @@ def is_ajax(request):
     )
 
 
-def send_subscription_verification_email(verification_url, to_email):
+def send_subscription_verification_email(verification_url, to_email, connection=None):
     """
     Sends verification e-mail to subscribers
 
     :param verification_url: subscribers unique verification url
     :param to_email: subscribers email
+    :param connection: email connection to reuse for several emails
     """
     context = {"site_url": NEWSFEED_SITE_BASE_URL, "verification_url": verification_url}
 
@@ -42,7 +93,11 @@ def send_subscription_verification_email(verification_url, to_email):
     html_body = render_to_string("newsfeed/email/email_verification.html", context)
 
     message = EmailMultiAlternatives(
-        subject, text_body, settings.EMAIL_HOST_USER, [to_email]
+        subject,
+        text_body,
+        settings.EMAIL_HOST_USER,
+        [to_email],
+        connection=connection,
     )
 
     message.attach_alternative(html_body, "text/html")
@@ -51,28 +106,327 @@ def send_subscription_verification_email(verification_url, to_email):
 
 logger = logging.getLogger(__name__)
 
+# Errors that only concern one message, the connection can still be used
+MESSAGE_ERRORS = (SMTPDataError, SMTPRecipientsRefused, SMTPSenderRefused)
+
+# Task that sends the emails whose retry is due
+RETRY_TASK = "newsfeed.tasks.send_newsletter_retries"
+
+
+def get_retry_delay(attempts):
+    """
+    Returns the seconds to wait before retrying an email,
+    the delay doubles with each failed attempt
+
+    :param attempts: number of failed attempts
+    """
+    return NEWSFEED_EMAIL_RETRY_BACKOFF * 2 ** (attempts - 1)
+
+
+def purge_expired_subscribers(chunk_size=1000, chunk_wait=0):
+    """
+    Deletes unverified subscribers whose verification has expired
+
+    Subscribers are deleted in chunks that are committed separately,
+    so rows are not locked for long on large tables.
+
+    :param chunk_size: number of subscribers deleted in a transaction
+    :param chunk_wait: seconds to wait between chunks
+    :return: number of subscribers deleted
+    """
+    from newsfeed.models import Subscriber
+
+    deleted_subscribers = 0
+
+    while True:
+        expired = Subscriber.objects.verification_expired()
+        subscriber_ids = list(
+            expired.order_by("verification_sent_date").values_list("pk", flat=True)[
+                :chunk_size
+            ]
+        )
+
+        if not subscriber_ids:
+            return deleted_subscribers
+
+        with transaction.atomic():
+            # subscribers verified since they were selected are kept
+            _, deleted = expired.filter(pk__in=subscriber_ids).delete()
+
+        forget_subscribers(subscriber_ids)
+
+        deleted_subscribers += deleted.get(Subscriber._meta.label, 0)
+        report_progress(f"Deleted {deleted_subscribers} expired subscribers")
+
+        if len(subscriber_ids) < chunk_size:
+            return deleted_subscribers
+
+        if chunk_wait:
+            time.sleep(chunk_wait)
+
+
+VERIFICATION_TASK = "newsfeed.tasks.send_verification_emails"
+
+# Set while a task sending the requested verification emails is queued
+VERIFICATION_EMAILS_QUEUED_KEY = "newsfeed:verification_emails:queued"
+
+
+def _queue_verification_task():
+    """queues the task unless one is already waiting to run"""
+    from newsfeed.models import Task
+
+    queued = Task.objects.filter(
+        name=VERIFICATION_TASK,
+        status__in=[Task.Status.PENDING, Task.Status.QUEUED],
+    ).exists()
+
+    if not queued:
+        enqueue(VERIFICATION_TASK)
+
+
+def queue_verification_emails():
+    """
+    Queues a task that sends the requested verification emails
+
+    Only one task is queued at a time, subscriptions made while it
+    is waiting are sent by the same task. The task clears the flag of
+    a cache shared by all processes, otherwise the queued tasks are
+    looked up in the database.
+    """
+    if not is_cache_shared():
+        transaction.on_commit(_queue_verification_task)
+    elif get_cache().add(VERIFICATION_EMAILS_QUEUED_KEY, True, timeout=5 * 60):
+        transaction.on_commit(lambda: enqueue(VERIFICATION_TASK))
+
+
+def send_requested_verification_emails(batch_size=100):
+    """
+    Sends verification emails to the subscribers that requested one
+    over a single connection
+
+    Subscribers that are already subscribed or were sent an email less
+    than ``NEWSFEED_EMAIL_VERIFICATION_RESEND_WAIT`` seconds ago are skipped.
+
+    :param batch_size: number of subscribers read at a time
+    :return: number of emails sent
+    """
+    from newsfeed.models import Subscriber
+
+    # subscriptions made from now on need another task
+    get_cache().delete(VERIFICATION_EMAILS_QUEUED_KEY)
+
+    resend_after = timezone.now() - timedelta(
+        seconds=NEWSFEED_EMAIL_VERIFICATION_RESEND_WAIT
+    )
+    sent_emails = 0
+
+    with get_connection() as connection:
+        while True:
+            subscribers = list(
+                Subscriber.objects.verification_requested()
+                .filter(suppressed_at__isnull=True)
+                .order_by("verification_requested_at", "pk")[:batch_size]
+            )
+
+            if not subscribers:
+                return sent_emails
+
+            sent_to = []
+
+            for subscriber in subscribers:
+                if subscriber.subscribed or (
+                    subscriber.verification_sent_date
+                    and subscriber.verification_sent_date >= resend_after
+                ):
+                    continue
+
+                try:
+                    send_subscription_verification_email(
+                        subscriber.get_verification_url(),
+                        subscriber.email_address,
+                        connection=connection,
+                    )
+                except SMTPException:
+                    logger.exception(
+                        "Failed to send verification email to %s",
+                        subscriber.email_address,
+                    )
+                else:
+                    sent_to.append(subscriber)
+
+            sent_date = timezone.now()
+            sent_ids = [subscriber.pk for subscriber in sent_to]
+
+            Subscriber.objects.filter(pk__in=sent_ids).update(
+                verification_sent_date=sent_date
+            )
+            forget_subscribers(sent_ids)
+
+            for subscriber in sent_to:
+                subscriber.verification_sent_date = sent_date
+
+            if sent_to:
+                email_verification_sent.send(sender=Subscriber, instances=sent_to)
+
+            # requests made while the batch was sent are kept
+            handled = Q()
+            for subscriber in subscribers:
+                handled |= Q(
+                    pk=subscriber.pk,
+                    verification_requested_at=subscriber.verification_requested_at,
+                )
+            Subscriber.objects.filter(handled).update(verification_requested_at=None)
+
+            sent_emails += len(sent_to)
+
+
+# Number of unsubscribes queued so far, each one is kept under this key
+# followed by its number until it is written to the database
+UNSUBSCRIBES_KEY = "newsfeed:unsubscribes"
+# Progress of the flushes: the last number written and the
+# numbers that were missing from the cache on the last flush
+UNSUBSCRIBES_FLUSHED_KEY = "newsfeed:unsubscribes:flushed"
+# Set while a task flushing the unsubscribes is queued
+UNSUBSCRIBES_FLUSH_QUEUED_KEY = "newsfeed:unsubscribes:flush_queued"
+
+
+def can_queue_unsubscribes():
+    """
+    Unsubscribes are only queued in a cache shared by all processes,
+    otherwise the task flushing them would not see them
+    """
+    return NEWSFEED_UNSUBSCRIBE_FLUSH_INTERVAL > 0 and is_cache_shared()
+
+
+def _queue_unsubscribes_flush():
+    if get_cache().add(
+        UNSUBSCRIBES_FLUSH_QUEUED_KEY,
+        True,
+        timeout=NEWSFEED_UNSUBSCRIBE_FLUSH_INTERVAL * 10,
+    ):
+        run_at = timezone.now() + timedelta(seconds=NEWSFEED_UNSUBSCRIBE_FLUSH_INTERVAL)
+        transaction.on_commit(
+            lambda: enqueue("newsfeed.tasks.flush_unsubscribes", run_at=run_at)
+        )
+
+
+def unsubscribe_subscriber(subscriber):
+    """
+    Unsubscribes a subscriber, cached lookups see the change right away
+
+    The database is updated by a task that writes all the unsubscribes
+    queued in ``NEWSFEED_UNSUBSCRIBE_FLUSH_INTERVAL`` seconds in bulk,
+    without a shared cache it is updated right away.
+    """
+    if not can_queue_unsubscribes():
+        subscriber.unsubscribe()
+        return
+
+    subscriber.subscribed = False
+    cache = get_cache()
+
+    try:
+        number = cache.incr(UNSUBSCRIBES_KEY)
+    except ValueError:
+        cache.add(UNSUBSCRIBES_KEY, 0, timeout=None)
+        number = cache.incr(UNSUBSCRIBES_KEY)
+
+    cache.set(f"{UNSUBSCRIBES_KEY}:{number}", subscriber.pk, timeout=None)
+    cache_subscriber(subscriber)
+
+    _queue_unsubscribes_flush()
+
+
+def flush_unsubscribes(chunk_size=1000):
+    """
+    Writes the queued unsubscribes to the database
+
+    An unsubscribe that is counted but not in the cache yet is being
+    queued, it is written by the next flush. If it is still missing then,
+    it was lost with the process or evicted and is skipped.
+
+    :param chunk_size: number of subscribers updated in one statement
+    :return: number of subscribers unsubscribed
+    """
+    from newsfeed.models import Subscriber
+
+    cache = get_cache()
+    # unsubscribes queued from now on need another task
+    cache.delete(UNSUBSCRIBES_FLUSH_QUEUED_KEY)
+
+    last = cache.get(UNSUBSCRIBES_KEY) or 0
+    flushed, missing = cache.get(UNSUBSCRIBES_FLUSHED_KEY) or (0, [])
+    numbers = [*missing, *range(flushed + 1, last + 1)]
+
+    if not numbers:
+        return 0
+
+    keys = {f"{UNSUBSCRIBES_KEY}:{number}": number for number in numbers}
+    queued = cache.get_many(list(keys))
+    subscriber_ids = sorted(set(queued.values()))
+    unsubscribed = 0
+
+    for start in range(0, len(subscriber_ids), chunk_size):
+        unsubscribed += Subscriber.objects.filter(
+            pk__in=subscriber_ids[start : start + chunk_size]
+        ).unsubscribe()
+
+    missing = [
+        number
+        for key, number in keys.items()
+        if key not in queued and number not in missing
+    ]
+    cache.set(UNSUBSCRIBES_FLUSHED_KEY, (max(flushed, last), missing), timeout=None)
+    cache.delete_many(list(queued))
+
+    if missing:
+        _queue_unsubscribes_flush()
+
+    logger.info("Unsubscribed %s queued subscriber(s)", unsubscribed)
+
+    return unsubscribed
+
 
 class NewsletterEmailSender:
     """The main class that handles sending email newsletters"""
 
-    def __init__(self, newsletters=None, respect_schedule=True):
+    def __init__(
+        self,
+        newsletters=None,
+        respect_schedule=True,
+        workers=None,
+        resume=False,
+        shard=None,
+    ):
         self.newsletters = self._get_newsletters(
             newsletters=newsletters, respect_schedule=respect_schedule
         )
         from newsfeed.models import Subscriber
 
-        # get subscriber email addresses
-        self.subscriber_emails = Subscriber.objects.subscribed().values_list(
-            "email_address", flat=True
-        )
+        # subscribers that will receive the newsletters
+        self.subscribers = Subscriber.objects.subscribed()
+        # if ``True`` subscribers that already received
+        # a newsletter are skipped
+        self.resume = resume
+        # ``(shard_index, shard_count)``, only subscribers with
+        # ``pk % shard_count == shard_index`` are sent to by this sender
+        self.shard = self._validate_shard(shard)
         # Size of each batch to be sent
         self.batch_size = NEWSFEED_EMAIL_BATCH_SIZE
         # list of newsletters that were sent
         self.sent_newsletters = []
-        # Waiting time after each batch (in seconds)
+        # Waiting time between batches of a connection (in seconds)
         self.per_batch_wait = NEWSFEED_EMAIL_BATCH_WAIT
-        # connection to the server
-        self.connection = get_connection()
+        # checked before each email is sent
+        self.rate_limiter = get_rate_limiter()
+        # caps of the receiving domains, checked for each batch and email
+        self.domain_throttle = DomainThrottle()
+        # Number of worker threads, each one holds its own connection
+        self.workers = max(workers or NEWSFEED_EMAIL_WORKERS, 1)
+        # connection to the server for each worker thread
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         self.email_host_user = settings.EMAIL_HOST_USER
 
     @staticmethod
@@ -101,128 +455,632 @@ class NewsletterEmailSender:
     @staticmethod
     def _render_newsletter(newsletter):
         """renders newsletter template and returns html and subject"""
-        issue = newsletter.issue
-        subject = newsletter.subject
-        posts = issue.posts.visible().select_related("category")
-
-        context = {
-            "issue": issue,
-            "post_list": posts,
-            "unsubscribe_url": reverse("newsfeed:newsletter_unsubscribe"),
-            "site_url": NEWSFEED_SITE_BASE_URL,
-        }
-
-        html = render_to_string("newsfeed/email/newsletter_email.html", context)
+        # the html of released issues is rendered once and saved
+        snapshot = get_issue_snapshot(newsletter.issue)
 
-        rendered_newsletter = {"subject": subject, "html": html}
+        rendered_newsletter = {
+            "subject": newsletter.subject,
+            "html": snapshot.email_html,
+        }
 
         return rendered_newsletter
 
-    def _generate_email_message(self, to_email, rendered_newsletter):
+    def _get_message_factory(self, rendered_newsletter):
         """
-        Generates email message for an email_address
+        Returns the factory that builds the email messages of a newsletter,
+        the newsletter is encoded only once by the factory
 
-        :param to_email: subscribers email address
         :param rendered_newsletter: rendered html of the newsletter with subject
         """
-        message = EmailMessage(
+        unsubscribe_url = reverse(
+            "newsfeed:newsletter_unsubscribe_confirm",
+            kwargs={"token": UNSUBSCRIBE_TOKEN_PLACEHOLDER},
+        )
+
+        return NewsletterMessageFactory(
             subject=rendered_newsletter.get("subject"),
-            body=rendered_newsletter.get("html"),
+            html=rendered_newsletter.get("html"),
             from_email=self.email_host_user,
-            to=[to_email],
-            connection=self.connection,
+            unsubscribe_url=f"{NEWSFEED_SITE_BASE_URL}{unsubscribe_url}",
         )
-        message.content_subtype = "html"
 
-        return message
+    @staticmethod
+    def _generate_email_message(recipient, message_factory):
+        """
+        Generates email message for a subscriber
 
-    def _get_batch_email_messages(self, rendered_newsletter):
+        :param recipient: subscribers primary key, email address and token
+        :param message_factory: NewsletterMessageFactory of the newsletter
         """
-        Yields EmailMessage list in batches
+        subscriber_id, to_email, token = recipient
 
-        :param rendered_newsletter: newsletter with html and subject
+        return message_factory(to_email, subscriber_id=subscriber_id, token=token)
+
+    @staticmethod
+    def _validate_shard(shard):
+        if shard is None:
+            return None
+
+        shard_index, shard_count = shard
+
+        if shard_count < 1 or not 0 <= shard_index < shard_count:
+            raise ValueError(
+                f"Invalid shard {shard_index} of {shard_count}, "
+                "shard index must be between 0 and shard count - 1"
+            )
+
+        return shard_index, shard_count
+
+    def _get_recipients(self, newsletter, retry=False):
         """
+        Returns the subscribers that should receive a newsletter
 
-        # if there is no subscriber then stop iteration
-        if len(self.subscriber_emails) == 0:
-            logger.info("No subscriber found.")
+        :param retry: if ``True`` only the subscribers whose retry is due
+            and who did not receive the newsletter since
+        """
+        recipients = self.subscribers
+
+        if retry:
+            recipients = recipients.filter(
+                retries__newsletter=newsletter,
+                retries__next_attempt_at__lte=timezone.now(),
+            )
+
+        if self.shard is not None:
+            shard_index, shard_count = self.shard
+            recipients = recipients.alias(shard=F("pk") % shard_count).filter(
+                shard=shard_index
+            )
+
+        if retry or self.resume:
+            # skip subscribers that already received the newsletter
+            recipients = recipients.exclude(deliveries__newsletter=newsletter)
+
+        return recipients
+
+    def _newsletter_sent(self, newsletter, sent_emails):
+        """
+        Marks a newsletter to be saved in sent state once it was sent
+
+        When sending a shard, the newsletter is only marked
+        after all the shards of the newsletter were sent.
+
+        :param newsletter: Newsletter that was sent
+        :param sent_emails: number of emails sent by this sender
+        """
+        if self.shard is None:
+            if sent_emails > 0:
+                self.sent_newsletters.append(newsletter.id)
             return
 
-        # if there is no batch size specified
-        # by the user send all in one batch
+        from newsfeed.models import NewsletterShard
+
+        shard_index, shard_count = self.shard
+
+        NewsletterShard.objects.bulk_create(
+            [
+                NewsletterShard(
+                    newsletter=newsletter,
+                    shard_index=shard_index,
+                    shard_count=shard_count,
+                    sent=sent_emails,
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        shards_sent = NewsletterShard.objects.filter(
+            newsletter=newsletter, shard_count=shard_count
+        ).count()
+
+        logger.info(
+            "Sent shard %s of %s for ISSUE # %s, %s of %s shard(s) completed",
+            shard_index,
+            shard_count,
+            newsletter.issue.issue_number,
+            shards_sent,
+            shard_count,
+        )
+
+        if shards_sent >= shard_count:
+            self.sent_newsletters.append(newsletter.id)
+
+    def _get_batch_size(self):
+        """
+        Returns the number of emails in each batch, without a batch size
+        the subscribers read with one query are sent as a batch
+        """
         if not self.batch_size or self.batch_size <= 0:
-            self.batch_size = len(self.subscriber_emails)
+            return NEWSFEED_EMAIL_RECIPIENT_PAGE_SIZE
+
+        return self.batch_size
+
+    def _get_batch_email_messages(self, newsletter, rendered_newsletter, retry=False):
+        """
+        Yields EmailMessage list in batches
+
+        :param newsletter: Newsletter that is being sent
+        :param rendered_newsletter: newsletter with html and subject
+        :param retry: if ``True`` only the emails whose retry is due
+        """
+
+        batch_size = self._get_batch_size()
+        logger.info("Batch size for sending emails is set to %s", batch_size)
 
-        logger.info("Batch size for sending emails is set to %s", self.batch_size)
+        message_factory = self._get_message_factory(rendered_newsletter)
+        recipients = self._get_recipients(newsletter, retry=retry)
+        has_subscribers = False
 
-        for i in range(0, len(self.subscriber_emails), self.batch_size):
-            emails = self.subscriber_emails[i : i + self.batch_size]
+        # subscribers are streamed by primary key so that
+        # the whole list is never loaded into memory
+        if self.domain_throttle.groups:
+            batches = self._get_domain_batches(recipients)
+        else:
+            batches = recipients.recipient_batches(batch_size)
+
+        for batch in batches:
+            has_subscribers = True
 
             yield map(
-                lambda email: self._generate_email_message(email, rendered_newsletter),
-                emails,
+                lambda recipient: self._generate_email_message(
+                    recipient, message_factory
+                ),
+                batch,
             )
 
-    def send_emails(self):
-        """sends newsletter emails to subscribers"""
-        for newsletter in self.newsletters:
-            issue_number = newsletter.issue.issue_number
-            # this is used to calculate how many emails were
-            # sent for each newsletter
-            sent_emails = 0
+        if not has_subscribers:
+            logger.info("No subscriber found.")
 
-            rendered_newsletter = self._render_newsletter(newsletter)
+    def _get_domain_batches(self, recipients):
+        """
+        Yields batches of recipients that are either all in the same
+        throttled domain group or all in domains that are not throttled
 
-            logger.info("Ready to send newsletter for ISSUE # %s", issue_number)
+        Batches of different groups are interleaved, so the workers send
+        to several providers at the same time instead of queueing on the
+        caps of one of them.
 
-            for email_messages in self._get_batch_email_messages(rendered_newsletter):
-                messages = list(email_messages)
+        :param recipients: queryset of the recipients
+        """
+        batch_size = self._get_batch_size()
+        # one page from the database fills about one batch of each group
+        page_size = batch_size * (len(set(self.domain_throttle.groups.values())) + 1)
+        pending = defaultdict(list)
 
-                try:
-                    # send mass email with one connection open
-                    sent = self.connection.send_messages(messages)
+        for page in recipients.recipient_pages(page_size):
+            ready = defaultdict(deque)
 
-                    logger.info(
-                        "Sent %s newsletters in one batch for ISSUE # %s",
-                        len(messages),
-                        issue_number,
-                    )
+            for recipient in page:
+                group = self.domain_throttle.get_group(recipient[1])
+                pending[group].append(recipient)
 
-                    sent_emails += sent
-                except Exception as e:
-                    # create a new connection on error
-                    self.connection = get_connection()
-                    logger.error(
-                        "An error occurred while sending "
-                        "newsletters for ISSUE # %s "
-                        "newsletter ID: %s "
-                        "EXCEPTION: %s",
-                        issue_number,
-                        newsletter.id,
-                        e,
-                    )
-                finally:
-                    # Wait sometime before sending next batch
-                    # this is to prevent server overload
-                    logger.info(
-                        "Waiting %s seconds before sending "
-                        "next batch of newsletter for ISSUE # %s",
-                        self.per_batch_wait,
-                        issue_number,
-                    )
-                    time.sleep(self.per_batch_wait)
+                if len(pending[group]) >= batch_size:
+                    ready[group].append(pending.pop(group))
 
-            if sent_emails > 0:
-                self.sent_newsletters.append(newsletter.id)
+            yield from self._interleave(ready.values())
+
+        yield from pending.values()
+
+    @staticmethod
+    def _interleave(queues):
+        """yields one item of each queue in turn until they are empty"""
+        queues = [queue for queue in queues if queue]
+
+        while queues:
+            for queue in queues:
+                yield queue.popleft()
+
+            queues = [queue for queue in queues if queue]
+
+    def _get_connection(self):
+        """returns the connection of the current worker thread"""
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None:
+            connection = get_connection()
+            # keep the connection open between batches
+            connection.open()
+            self._local.connection = connection
+            self._local.reconnected = getattr(self._local, "was_reset", False)
+            self._local.was_reset = False
+
+            with self._connections_lock:
+                self._connections.append(connection)
+
+        return connection
+
+    def _reset_connection(self):
+        """closes the connection of the current worker thread"""
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None:
+            return
+
+        self._local.connection = None
+        self._local.ready_at = None
+        self._local.was_reset = True
+
+        with self._connections_lock:
+            self._connections.remove(connection)
+
+        try:
+            connection.close()
+        except Exception:
+            logger.exception("An error occurred while closing the connection")
+
+    def _close_connections(self):
+        """closes the connections opened by the worker threads"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                logger.exception("An error occurred while closing the connection")
+
+    @staticmethod
+    def _get_batch_wait(ready_at):
+        """
+        Returns the seconds to wait before a connection sends its next batch
+
+        The wait only applies between two batches sent over the same
+        connection, so no time is lost after the last batch or after
+        a failure that replaced the connection.
+
+        :param ready_at: monotonic time when the connection may send again
+        """
+        if ready_at is None:
+            return 0
+
+        return max(ready_at - time.monotonic(), 0)
+
+    def _wait_for_next_batch(self, ready_at):
+        # Wait sometime before sending next batch
+        # this is to prevent server overload
+        delay = self._get_batch_wait(ready_at)
+
+        if delay > 0:
+            logger.info("Waiting %s seconds before sending next batch", delay)
+            time.sleep(delay)
+
+    def _send_batch(self, newsletter, messages):
+        """
+        Sends a batch of email messages from a worker thread
+
+        :param newsletter: Newsletter that is being sent
+        :param messages: list of EmailMessage
+        :return: ``BatchResult`` with the list of subscriber ids the emails
+            were sent to and the list of ``(subscriber id, error)`` of the
+            emails that failed
+        """
+        issue_number = newsletter.issue.issue_number
+        delivered = []
+        failed = []
+        error = None
+        started = time.monotonic()
+        self._local.reconnected = False
+
+        # all the messages of a batch are in the same domain group
+        group = self.domain_throttle.get_group(messages[0].to[0]) if messages else None
+
+        try:
+            connection = self._get_connection()
+            self._wait_for_next_batch(getattr(self._local, "ready_at", None))
+            started = time.monotonic()
+
+            # send mass email with the connection of this worker,
+            # the rate limiters are checked before each message
+            with self.domain_throttle.limit_concurrency(group):
+                for message in messages:
+                    self.rate_limiter.acquire()
+                    self.domain_throttle.acquire(group)
+
+                    try:
+                        sent = connection.send_messages([message])
+                    except MESSAGE_ERRORS as e:
+                        # only this message was refused, the connection is kept
+                        failed.append((message.subscriber_id, str(e)))
+                        continue
+
+                    if sent:
+                        delivered.append(message.subscriber_id)
+                    else:
+                        failed.append((message.subscriber_id, "The email was not sent"))
+
+            self._local.ready_at = time.monotonic() + self.per_batch_wait
 
             logger.info(
-                "Successfully Sent %s email(s) for ISSUE # %s ",
-                sent_emails,
+                "Sent %s newsletters in one batch for ISSUE # %s",
+                len(delivered),
                 issue_number,
             )
+        except Exception as e:
+            # create a new connection on error
+            self._reset_connection()
+            logger.error(
+                "An error occurred while sending "
+                "newsletters for ISSUE # %s "
+                "newsletter ID: %s "
+                "EXCEPTION: %s",
+                issue_number,
+                newsletter.id,
+                e,
+            )
+            error = e
+            failed += self._get_unsent(messages, delivered, failed, e)
+
+        return BatchResult(
+            delivered,
+            failed,
+            time.monotonic() - started,
+            error,
+            self._local.reconnected,
+        )
+
+    @staticmethod
+    def _get_unsent(messages, delivered, failed, exception):
+        """returns the failures of the messages a failed batch did not send"""
+        done = set(delivered).union(subscriber_id for subscriber_id, _ in failed)
+
+        return [
+            (message.subscriber_id, str(exception))
+            for message in messages
+            if message.subscriber_id not in done
+        ]
+
+    def _send_error(self, newsletter, exception):
+        newsletter_send_error.send(
+            sender=self.__class__, newsletter=newsletter, exception=exception
+        )
+
+    def _reconnected(self, newsletter):
+        newsletter_reconnected.send(sender=self.__class__, newsletter=newsletter)
+
+    def _batch_sent(self, newsletter, batch_size, delivered, duration):
+        """
+        Sends the metrics of a batch
+
+        :param batch_size: number of emails in the batch
+        :param delivered: number of emails accepted by the server
+        :param duration: seconds spent sending the batch
+        """
+        newsletter_batch_sent.send(
+            sender=self.__class__,
+            newsletter=newsletter,
+            batch_size=batch_size,
+            delivered=delivered,
+            duration=duration,
+        )
+
+    def _send_started(self, newsletter):
+        newsletter_send_started.send(sender=self.__class__, newsletter=newsletter)
+
+        return time.monotonic()
+
+    def _save_send_summary(
+        self, newsletter, recipients, delivered, started, retry=False
+    ):
+        """
+        Adds the results of this send to the summary of the newsletter
+
+        :param recipients: number of emails that were attempted
+        :param delivered: number of emails accepted by the server
+        :param started: monotonic time returned by ``_send_started``
+        :param retry: if ``True`` the emails were counted
+            as failed when they were first sent
+        """
+        from newsfeed.models import Newsletter
+
+        duration = time.monotonic() - started
+        failed = recipients - delivered
+
+        if retry:
+            summary = {
+                "failed_count": Greatest(F("failed_count") - delivered, 0),
+            }
+        else:
+            summary = {
+                "recipients_count": F("recipients_count") + recipients,
+                "failed_count": F("failed_count") + failed,
+            }
+
+        Newsletter.objects.filter(pk=newsletter.pk).update(
+            delivered_count=F("delivered_count") + delivered,
+            send_duration=F("send_duration") + timedelta(seconds=duration),
+            **summary,
+        )
+
+        newsletter_sent.send(
+            sender=self.__class__,
+            newsletter=newsletter,
+            recipients=recipients,
+            delivered=delivered,
+            failed=failed,
+            duration=duration,
+            retry=retry,
+        )
+
+    @staticmethod
+    def _log_deliveries(newsletter, subscriber_ids):
+        """
+        Saves the subscribers that received a newsletter in one query
+
+        :param newsletter: Newsletter that was sent
+        :param subscriber_ids: list of subscriber ids the emails were sent to
+        """
+        from newsfeed.models import NewsletterDelivery
+
+        NewsletterDelivery.objects.bulk_create(
+            [
+                NewsletterDelivery(newsletter=newsletter, subscriber_id=subscriber_id)
+                for subscriber_id in subscriber_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def _schedule_retries(newsletter, failures):
+        """
+        Queues failed emails to be sent again with exponential backoff,
+        emails that failed ``NEWSFEED_EMAIL_RETRY_MAX_ATTEMPTS`` times
+        are not retried anymore
+
+        :param newsletter: Newsletter that was sent
+        :param failures: list of ``(subscriber id, error)``
+        """
+        from newsfeed.models import NewsletterRetry
+
+        if not failures:
+            return
+
+        errors = dict(failures)
+        now = timezone.now()
+        retries = {
+            retry.subscriber_id: retry
+            for retry in NewsletterRetry.objects.filter(
+                newsletter=newsletter, subscriber_id__in=errors
+            )
+        }
+        new_retries = []
+
+        for subscriber_id, error in errors.items():
+            retry = retries.get(subscriber_id)
+
+            if retry is None:
+                retry = NewsletterRetry(
+                    newsletter=newsletter, subscriber_id=subscriber_id
+                )
+                new_retries.append(retry)
+
+            retry.attempts += 1
+            retry.last_error = error
+            retry.updated_at = now
+            retry.next_attempt_at = (
+                now + timedelta(seconds=get_retry_delay(retry.attempts))
+                if retry.attempts < NEWSFEED_EMAIL_RETRY_MAX_ATTEMPTS
+                else None
+            )
+
+        NewsletterRetry.objects.bulk_create(new_retries, ignore_conflicts=True)
+        NewsletterRetry.objects.bulk_update(
+            list(retries.values()),
+            ["attempts", "last_error", "next_attempt_at", "updated_at"],
+        )
+
+    def _save_batch_results(self, newsletter, delivered, failures):
+        """
+        Logs the deliveries of a batch and queues its failed emails,
+        the retries of the delivered emails are removed
+
+        :param delivered: list of subscriber ids the emails were sent to
+        :param failures: list of ``(subscriber id, error)``
+        """
+        from newsfeed.models import NewsletterRetry
+
+        self._log_deliveries(newsletter, delivered)
+        self._schedule_retries(newsletter, failures)
+
+        # a send that is not a retry may deliver emails that failed before
+        if delivered:
+            NewsletterRetry.objects.filter(
+                newsletter=newsletter, subscriber_id__in=delivered
+            ).delete()
+
+    @staticmethod
+    def _get_due_retry_newsletters(subscribers):
+        """
+        Returns the newsletters that have emails to retry,
+        retries of subscribers that unsubscribed are removed
+
+        :param subscribers: subscribers that receive the newsletters
+        """
+        from newsfeed.models import Newsletter, NewsletterRetry
+
+        due = NewsletterRetry.objects.filter(next_attempt_at__lte=timezone.now())
+        due.exclude(subscriber__in=subscribers).delete()
+        due.filter(subscriber__deliveries__newsletter=F("newsletter")).delete()
+
+        return list(
+            Newsletter.objects.filter(
+                pk__in=due.values("newsletter_id")
+            ).select_related("issue")
+        )
+
+    @staticmethod
+    def _queue_retries():
+        """queues a task for the next retry unless one is already waiting"""
+        from newsfeed.models import NewsletterRetry, Task
+
+        next_attempt_at = (
+            NewsletterRetry.objects.filter(next_attempt_at__isnull=False)
+            .order_by("next_attempt_at")
+            .values_list("next_attempt_at", flat=True)
+            .first()
+        )
+
+        if next_attempt_at is None:
+            return
+
+        queued = Task.objects.filter(
+            name=RETRY_TASK,
+            status__in=[Task.Status.PENDING, Task.Status.QUEUED],
+            run_at__lte=next_attempt_at,
+        ).exists()
+
+        if not queued:
+            enqueue(RETRY_TASK, run_at=next_attempt_at)
+
+    @staticmethod
+    def _report_progress(newsletter, sent_emails):
+        """shows the progress of the newsletter on the running task, if any"""
+        report_progress(
+            f"ISSUE # {newsletter.issue.issue_number}: {sent_emails} email(s) sent"
+        )
+
+    @contextmanager
+    def _get_executor(self):
+        """starts the worker threads and closes their connections at the end"""
+        logger.info("Sending newsletters with %s worker(s)", self.workers)
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="newsfeed-sender"
+        )
+
+        try:
+            yield executor
+        finally:
+            executor.shutdown(wait=True)
+            self._close_connections()
+
+    def send_emails(self):
+        """sends newsletter emails to subscribers and the retries that are due"""
+        # queued unsubscribes must not receive the newsletter
+        flush_unsubscribes()
+
+        with self._get_executor() as executor:
+            for newsletter in self.newsletters:
+                self._send_newsletter(executor, newsletter)
+
+            for newsletter in self._get_due_retry_newsletters(self.subscribers):
+                self._send_newsletter(executor, newsletter, retry=True)
+
+        self._mark_newsletters_sent()
+        self._queue_retries()
+
+    def send_retries(self):
+        """sends the newsletter emails whose retry is due"""
+        flush_unsubscribes()
+
+        with self._get_executor() as executor:
+            for newsletter in self._get_due_retry_newsletters(self.subscribers):
+                self._send_newsletter(executor, newsletter, retry=True)
+
+        self._queue_retries()
+
+    def _mark_newsletters_sent(self):
+        """saves sent newsletters to sent state"""
         from newsfeed.models import Newsletter
 
-        # Save newsletters to sent state
         Newsletter.objects.filter(id__in=self.sent_newsletters).update(
             is_sent=True, sent_at=timezone.now()
         )
@@ -233,9 +1091,385 @@ class NewsletterEmailSender:
             self.sent_newsletters,
         )
 
+    def _send_newsletter(self, executor, newsletter, retry=False):
+        """
+        Fans out the batches of a newsletter to the worker threads
+
+        :param executor: ThreadPoolExecutor running the workers
+        :param newsletter: Newsletter to be sent
+        :param retry: if ``True`` only the emails whose retry is due are sent
+        """
+        issue_number = newsletter.issue.issue_number
+        # this is used to calculate how many emails were
+        # sent for each newsletter
+        sent_emails = 0
+        # emails that were attempted
+        recipients = 0
+        # batches that are queued or being sent, this is bounded
+        # so that only a few batches are kept in memory
+        pending = set()
+
+        started = self._send_started(newsletter)
+        rendered_newsletter = self._render_newsletter(newsletter)
+
+        logger.info("Ready to send newsletter for ISSUE # %s", issue_number)
+
+        def batches_done(futures):
+            # the delivery log is written and the signals are sent
+            # from this thread so the workers never touch the database
+            delivered = 0
+            for future in futures:
+                result = future.result()
+                if result.reconnected:
+                    self._reconnected(newsletter)
+                if result.error is not None:
+                    self._send_error(newsletter, result.error)
+                self._batch_sent(
+                    newsletter,
+                    len(result.delivered) + len(result.failed),
+                    len(result.delivered),
+                    result.duration,
+                )
+                self._save_batch_results(newsletter, result.delivered, result.failed)
+                delivered += len(result.delivered)
+            return delivered
+
+        batches = self._get_batch_email_messages(
+            newsletter, rendered_newsletter, retry=retry
+        )
+
+        for email_messages in batches:
+            if len(pending) >= self.workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                sent_emails += batches_done(done)
+                self._report_progress(newsletter, sent_emails)
+
+            email_messages = list(email_messages)
+            recipients += len(email_messages)
+            pending.add(executor.submit(self._send_batch, newsletter, email_messages))
+
+        done, _ = wait(pending)
+        sent_emails += batches_done(done)
+        self._report_progress(newsletter, sent_emails)
+
+        self._save_send_summary(
+            newsletter, recipients, sent_emails, started, retry=retry
+        )
+
+        if not retry:
+            self._newsletter_sent(newsletter, sent_emails)
+
+        logger.info(
+            "Successfully Sent %s email(s) for ISSUE # %s ",
+            sent_emails,
+            issue_number,
+        )
+
+
+class AsyncNewsletterEmailSender(NewsletterEmailSender):
+    """
+    Sends email newsletters from an event loop with non-blocking SMTP
+
+    Requires ``aiosmtplib``. Messages are sent directly to the server
+    configured by the ``EMAIL_*`` settings, ``EMAIL_BACKEND`` is not used.
+    """
+
+    def __init__(
+        self,
+        newsletters=None,
+        respect_schedule=True,
+        concurrency=None,
+        resume=False,
+        shard=None,
+    ):
+        super().__init__(
+            newsletters=newsletters,
+            respect_schedule=respect_schedule,
+            resume=resume,
+            shard=shard,
+        )
+        # Maximum number of SMTP sessions sending at the same time
+        self.concurrency = max(concurrency or NEWSFEED_EMAIL_ASYNC_CONCURRENCY, 1)
+        # SMTP sessions that are connected and not sending,
+        # with the time when they may send the next batch
+        self._idle_clients = []
+        # sessions closed after an error that were not replaced yet
+        self._failed_clients = 0
+        self._semaphore = None
+
+    @staticmethod
+    def _get_smtp_client():
+        """returns a new SMTP client configured by the email settings"""
+        try:
+            import aiosmtplib
+        except ImportError:
+            raise ImproperlyConfigured(
+                "aiosmtplib is required to use AsyncNewsletterEmailSender."
+            )
+
+        return aiosmtplib.SMTP(
+            hostname=settings.EMAIL_HOST,
+            port=settings.EMAIL_PORT,
+            username=settings.EMAIL_HOST_USER or None,
+            password=settings.EMAIL_HOST_PASSWORD or None,
+            use_tls=settings.EMAIL_USE_SSL,
+            start_tls=settings.EMAIL_USE_TLS or None,
+            timeout=settings.EMAIL_TIMEOUT,
+        )
+
+    async def _aget_client(self):
+        """
+        Returns an idle SMTP session or connects a new one
+
+        :return: the session and whether it replaces a session that failed
+        """
+        if self._idle_clients:
+            client, ready_at = self._idle_clients.pop()
+
+            # Wait sometime before this session sends the next batch
+            # without blocking the event loop
+            delay = self._get_batch_wait(ready_at)
+            if delay > 0:
+                logger.info("Waiting %s seconds before sending next batch", delay)
+                await asyncio.sleep(delay)
+
+            return client, False
+
+        client = self._get_smtp_client()
+        await client.connect()
+
+        reconnected = self._failed_clients > 0
+        if reconnected:
+            self._failed_clients -= 1
+
+        return client, reconnected
+
+    @staticmethod
+    async def _aclose_client(client):
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+
+    async def _asend_message(self, client, message):
+        encoding = message.encoding or settings.DEFAULT_CHARSET
+        from_email = sanitize_address(message.from_email, encoding)
+        recipients = [
+            sanitize_address(address, encoding) for address in message.recipients()
+        ]
+
+        await client.sendmail(
+            from_email, recipients, message.message().as_bytes(linesep="\r\n")
+        )
+
+    @staticmethod
+    def _get_message_errors():
+        """returns the aiosmtplib errors that only concern one message"""
+        from aiosmtplib import SMTPDataError, SMTPRecipientsRefused, SMTPSenderRefused
+
+        return SMTPDataError, SMTPRecipientsRefused, SMTPSenderRefused
+
+    async def _asend_batch(self, newsletter, messages):
+        """
+        Sends a batch of email messages over one SMTP session
+
+        :param newsletter: Newsletter that is being sent
+        :param messages: list of EmailMessage
+        :return: number of emails sent
+        """
+        issue_number = newsletter.issue.issue_number
+        delivered = []
+        failed = []
+        reconnected = False
+        started = time.monotonic()
+        # all the messages of a batch are in the same domain group
+        group = self.domain_throttle.get_group(messages[0].to[0]) if messages else None
+
+        try:
+            async with self.domain_throttle.alimit_concurrency(group):
+                client, reconnected = await self._aget_client()
+                message_errors = self._get_message_errors()
+                started = time.monotonic()
+
+                try:
+                    for message in messages:
+                        await self.rate_limiter.aacquire()
+                        await self.domain_throttle.aacquire(group)
+
+                        try:
+                            await self._asend_message(client, message)
+                        except message_errors as e:
+                            # only this message was refused, the session is kept
+                            failed.append((message.subscriber_id, str(e)))
+                            continue
+
+                        delivered.append(message.subscriber_id)
+                except Exception:
+                    # do not reuse a session that failed
+                    await self._aclose_client(client)
+                    self._failed_clients += 1
+                    raise
 
-def send_email_newsletter(newsletters=None, respect_schedule=True):
+            self._idle_clients.append((client, time.monotonic() + self.per_batch_wait))
+
+            logger.info(
+                "Sent %s newsletters in one batch for ISSUE # %s",
+                len(delivered),
+                issue_number,
+            )
+        except Exception as e:
+            logger.error(
+                "An error occurred while sending "
+                "newsletters for ISSUE # %s "
+                "newsletter ID: %s "
+                "EXCEPTION: %s",
+                issue_number,
+                newsletter.id,
+                e,
+            )
+            await sync_to_async(self._send_error)(newsletter, e)
+            failed += self._get_unsent(messages, delivered, failed, e)
+        finally:
+            self._semaphore.release()
+
+        # receivers may use the database, e.g. through a database cache
+        if reconnected:
+            await sync_to_async(self._reconnected)(newsletter)
+
+        await sync_to_async(self._batch_sent)(
+            newsletter, len(messages), len(delivered), time.monotonic() - started
+        )
+
+        await sync_to_async(self._save_batch_results)(newsletter, delivered, failed)
+
+        return len(delivered)
+
+    async def _asend_newsletter(self, newsletter, retry=False):
+        issue_number = newsletter.issue.issue_number
+        # this is used to calculate how many emails were
+        # sent for each newsletter
+        sent_emails = 0
+        # batches that are being sent
+        tasks = set()
+
+        def batch_done(task):
+            nonlocal sent_emails
+            tasks.discard(task)
+            sent_emails += task.result()
+
+        # emails that were attempted
+        recipients = 0
+
+        started = await sync_to_async(self._send_started)(newsletter)
+        rendered_newsletter = await sync_to_async(self._render_newsletter)(newsletter)
+
+        logger.info("Ready to send newsletter for ISSUE # %s", issue_number)
+
+        batches = self._get_batch_email_messages(
+            newsletter, rendered_newsletter, retry=retry
+        )
+        get_next_batch = sync_to_async(next)
+        report_progress_async = sync_to_async(self._report_progress)
+
+        while True:
+            # batches are fetched from the database in a thread
+            email_messages = await get_next_batch(batches, None)
+
+            if email_messages is None:
+                break
+
+            messages = list(email_messages)
+            recipients += len(messages)
+
+            # wait until a session is free before fetching more batches
+            await self._semaphore.acquire()
+            task = asyncio.ensure_future(self._asend_batch(newsletter, messages))
+            tasks.add(task)
+            task.add_done_callback(batch_done)
+
+            await report_progress_async(newsletter, sent_emails)
+
+        if tasks:
+            await asyncio.wait(tasks)
+
+        await report_progress_async(newsletter, sent_emails)
+
+        await sync_to_async(self._save_send_summary)(
+            newsletter, recipients, sent_emails, started, retry=retry
+        )
+
+        if not retry:
+            await sync_to_async(self._newsletter_sent)(newsletter, sent_emails)
+
+        logger.info(
+            "Successfully Sent %s email(s) for ISSUE # %s ",
+            sent_emails,
+            issue_number,
+        )
+
+    async def asend_emails(self):
+        """sends newsletter emails to subscribers and the retries that are due"""
+        logger.info(
+            "Sending newsletters with up to %s SMTP session(s)", self.concurrency
+        )
+
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        # queued unsubscribes must not receive the newsletter
+        await sync_to_async(flush_unsubscribes)()
+        newsletters = await sync_to_async(list)(self.newsletters)
+
+        try:
+            for newsletter in newsletters:
+                await self._asend_newsletter(newsletter)
+
+            await self._asend_retries()
+        finally:
+            clients, self._idle_clients = self._idle_clients, []
+            for client, _ in clients:
+                await self._aclose_client(client)
+
+        await sync_to_async(self._mark_newsletters_sent)()
+        await sync_to_async(self._queue_retries)()
+
+    async def _asend_retries(self):
+        newsletters = await sync_to_async(self._get_due_retry_newsletters)(
+            self.subscribers
+        )
+
+        for newsletter in newsletters:
+            await self._asend_newsletter(newsletter, retry=True)
+
+
+def send_email_newsletter(
+    newsletters=None, respect_schedule=True, workers=None, resume=False, shard=None
+):
     send_newsletter = NewsletterEmailSender(
-        newsletters=newsletters, respect_schedule=respect_schedule
+        newsletters=newsletters,
+        respect_schedule=respect_schedule,
+        workers=workers,
+        resume=resume,
+        shard=shard,
     )
     send_newsletter.send_emails()
+
+
+def send_newsletter_retries():
+    """sends the newsletter emails whose retry is due"""
+    NewsletterEmailSender(respect_schedule=False).send_retries()
+
+
+async def asend_email_newsletter(
+    newsletters=None,
+    respect_schedule=True,
+    concurrency=None,
+    resume=False,
+    shard=None,
+):
+    send_newsletter = AsyncNewsletterEmailSender(
+        newsletters=newsletters,
+        respect_schedule=respect_schedule,
+        concurrency=concurrency,
+        resume=resume,
+        shard=shard,
+    )
+    await send_newsletter.asend_emails()
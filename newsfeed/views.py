@@ -1,23 +1,99 @@
+import json
+import logging
+
 from django.contrib import messages
-from django.db.models import Prefetch
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from django.utils.safestring import mark_safe
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.views.generic import DetailView, FormView, ListView, TemplateView
 from django.views.generic.detail import SingleObjectMixin
 
+from newsfeed.bounces import ingest_suppressions, parse_notifications
+from newsfeed.caching import (
+    get_cache,
+    get_cached_subscriber,
+    get_issue_page_cache_key,
+    get_issue_page_timeout,
+    is_cache_shared,
+)
 from newsfeed.forms import SubscriberEmailForm
-from newsfeed.utils import is_ajax
+from newsfeed.managers import group_by_category
+from newsfeed.metrics import render_metrics
+from newsfeed.snapshots import get_issue_snapshot
+from newsfeed.utils import (
+    is_ajax,
+    queue_verification_emails,
+    unsubscribe_subscriber,
+)
 
 from .app_settings import (
+    NEWSFEED_BOUNCE_WEBHOOK_TOKEN,
+    NEWSFEED_CACHE_TIMEOUT,
+    NEWSFEED_ISSUE_POSTS_PER_PAGE,
+    NEWSFEED_METRICS_TOKEN,
     NEWSFEED_SUBSCRIPTION_REDIRECT_URL,
     NEWSFEED_UNSUBSCRIPTION_REDIRECT_URL,
 )
 from .models import Issue, Post, Subscriber
 
+logger = logging.getLogger(__name__)
+
+
+class IssuePageCacheMixin:
+    """
+    Caches the rendered page until an issue, post or category changes
+    or the next scheduled issue is released
+
+    Pages are only cached in a cache shared by all processes, so that
+    a change invalidates the pages of every process.
+    """
+
+    cache_name = None
+
+    def get_cache_key_parts(self):
+        """returns the values that identify the page in the cache"""
+        return [self.request.GET.get("page") or 1]
+
+    def is_cacheable(self):
+        # pages are only cached when every process sees the invalidations,
+        # pages showing flash messages are specific to the user
+        return (
+            NEWSFEED_CACHE_TIMEOUT
+            and is_cache_shared()
+            and self.request.method in ("GET", "HEAD")
+            and not len(messages.get_messages(self.request))
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_cacheable():
+            return super().dispatch(request, *args, **kwargs)
+
+        cache = get_cache()
+        cache_key = get_issue_page_cache_key(
+            self.cache_name, *self.get_cache_key_parts()
+        )
+        content = cache.get(cache_key)
+
+        if content is not None:
+            return HttpResponse(content)
+
+        response = super().dispatch(request, *args, **kwargs)
+
+        if response.status_code == 200:
+            response.render()
+            cache.set(cache_key, response.content, get_issue_page_timeout())
 
-class IssueListView(ListView):
+        return response
+
+
+class IssueListView(IssuePageCacheMixin, ListView):
     model = Issue
     paginate_by = 15
     template_name = "newsfeed/issue_list.html"
+    cache_name = "issue_list"
 
     def get_queryset(self):
         return super().get_queryset().released()
@@ -26,41 +102,82 @@ class IssueListView(ListView):
 issue_list_view = IssueListView.as_view()
 
 
-class IssueDetailView(SingleObjectMixin, ListView):
+class IssueDetailView(IssuePageCacheMixin, SingleObjectMixin, ListView):
     model = Post
-    paginate_by = 20
+    paginate_by = NEWSFEED_ISSUE_POSTS_PER_PAGE
     template_name = "newsfeed/issue_detail.html"
     slug_url_kwarg = "issue_number"
     slug_field = "issue_number"
+    cache_name = "issue_detail"
+
+    def get_cache_key_parts(self):
+        return [self.kwargs[self.slug_url_kwarg], *super().get_cache_key_parts()]
 
     def get(self, request, *args, **kwargs):
-        self.object = self.get_object(queryset=Issue.objects.released())
+        self.object = self.get_object(
+            queryset=Issue.objects.released().select_related("snapshot")
+        )
+        issue_content = self.get_snapshot_content()
+
+        if issue_content is not None:
+            # posts are not queried when the snapshot is used
+            self.object_list = Post.objects.none()
+            return self.render_to_response(
+                {"issue": self.object, "issue_content": issue_content}
+            )
+
         return super().get(request, *args, **kwargs)
 
+    def get_snapshot_content(self):
+        """returns the requested page from the issue snapshot if it exists"""
+        snapshot = get_issue_snapshot(self.object)
+        page = self.request.GET.get(self.page_kwarg) or 1
+
+        try:
+            page_number = int(page)
+        except ValueError:
+            return None
+
+        if not 1 <= page_number <= len(snapshot.web_pages):
+            return None
+
+        return mark_safe(snapshot.web_pages[page_number - 1])
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["issue"] = self.object
+        context["category_list"] = group_by_category(context["object_list"])
         return context
 
     def get_queryset(self):
-        return self.object.posts.visible().select_related("category")
+        return self.object.posts.visible().by_category()
 
 
 issue_detail_view = IssueDetailView.as_view()
 
 
-class LatestIssueView(TemplateView):
+class LatestIssueView(IssuePageCacheMixin, TemplateView):
     model = Post
     template_name = "newsfeed/latest_issue.html"
+    cache_name = "latest_issue"
 
-    def get_context_data(self, **kwargs):
-        prefetch_posts = Post.objects.visible().select_related("category")
-        latest_issue = Issue.objects.prefetch_related(
-            Prefetch("posts", queryset=prefetch_posts)
-        ).first()
+    def get_cache_key_parts(self):
+        return []
 
+    def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # issues are not shown before they are released
+        latest_issue = Issue.objects.released().select_related("snapshot").first()
+
         context["latest_issue"] = latest_issue
+
+        if latest_issue:
+            context["issue_content"] = mark_safe(
+                get_issue_snapshot(latest_issue).web_html
+            )
+        else:
+            context["category_list"] = []
+
         return context
 
 
@@ -98,21 +215,17 @@ class NewsletterSubscribeView(SubscriptionAjaxResponseMixin):
     def form_valid(self, form):
         email_address = form.cleaned_data.get("email_address")
 
-        subscriber, created = Subscriber.objects.get_or_create(
-            email_address=email_address
-        )
+        # the response does not depend on the subscriber so it
+        # does not wait for the email or reveal who is subscribed
+        Subscriber.objects.request_verification([email_address])
+        queue_verification_emails()
 
-        if not created and subscriber.subscribed:
-            self.success = False
-            self.message = "You have already subscribed to the newsletter."
-        else:
-            subscriber.send_verification_email(created)
-            self.success = True
-            self.message = (
-                "Thank you for subscribing! "
-                "Please check your e-mail inbox to confirm "
-                "your subscription and start receiving newsletters."
-            )
+        self.success = True
+        self.message = (
+            "Thank you for subscribing! "
+            "Please check your e-mail inbox to confirm "
+            "your subscription and start receiving newsletters."
+        )
 
         return super().form_valid(form)
 
@@ -124,12 +237,10 @@ class NewsletterUnsubscribeView(SubscriptionAjaxResponseMixin):
     def form_valid(self, form):
         email_address = form.cleaned_data.get("email_address")
 
-        subscriber = Subscriber.objects.filter(
-            subscribed=True, email_address=email_address
-        ).first()
+        subscriber = get_cached_subscriber("email_address", email_address)
 
-        if subscriber:
-            subscriber.unsubscribe()
+        if subscriber and subscriber.subscribed:
+            unsubscribe_subscriber(subscriber)
             self.success = True
             self.message = "You have successfully unsubscribed from the newsletter."
         else:
@@ -145,8 +256,14 @@ class NewsletterSubscriptionConfirmView(DetailView):
     slug_url_kwarg = "token"
     slug_field = "token"
 
-    def get_queryset(self):
-        return super().get_queryset().filter(verified=False)
+    def get_object(self, queryset=None):
+        subscriber = get_cached_subscriber("token", self.kwargs["token"])
+
+        # subscribers that unsubscribed may confirm again
+        if subscriber is None or (subscriber.verified and subscriber.subscribed):
+            raise Http404("Subscriber not found.")
+
+        return subscriber
 
     def get(self, request, *args, **kwargs):
         self.object = self.get_object()
@@ -154,3 +271,93 @@ class NewsletterSubscriptionConfirmView(DetailView):
 
         context = self.get_context_data(object=self.object, subscribed=subscribed)
         return self.render_to_response(context)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class NewsletterUnsubscribeConfirmView(DetailView):
+    """
+    Unsubscribes with the personal link of a newsletter email
+
+    Opening the link only asks for a confirmation so that link scanners
+    do not unsubscribe anyone, mail clients unsubscribe with a POST to
+    the ``List-Unsubscribe`` URL without a CSRF token (RFC 8058).
+    """
+
+    model = Subscriber
+    template_name = "newsfeed/newsletter_unsubscribe_confirm.html"
+    slug_url_kwarg = "token"
+    slug_field = "token"
+
+    def get_object(self, queryset=None):
+        subscriber = get_cached_subscriber("token", self.kwargs["token"])
+
+        if subscriber is None:
+            raise Http404("Subscriber not found.")
+
+        return subscriber
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+
+        if self.object.subscribed:
+            unsubscribe_subscriber(self.object)
+
+        context = self.get_context_data(object=self.object, unsubscribed=True)
+        return self.render_to_response(context)
+
+
+def metrics_view(request):
+    """
+    Exports the newsletter send metrics for Prometheus, requests must send
+    ``Authorization: Bearer <NEWSFEED_METRICS_TOKEN>``
+    """
+    if not NEWSFEED_METRICS_TOKEN:
+        raise Http404("Metrics are not enabled.")
+
+    authorization = request.headers.get("Authorization", "")
+    if not constant_time_compare(authorization, f"Bearer {NEWSFEED_METRICS_TOKEN}"):
+        return HttpResponse("Invalid metrics token.", status=401)
+
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@csrf_exempt
+@require_POST
+def bounce_webhook_view(request):
+    """
+    Suppresses the subscribers of the bounces and complaints posted as JSON,
+    see ``newsfeed.bounces.parse_notifications`` for the formats
+
+    Requests must send ``Authorization: Bearer <NEWSFEED_BOUNCE_WEBHOOK_TOKEN>``
+    or the token in the ``token`` query parameter for services that can not
+    set headers, e.g. Amazon SNS.
+    """
+    if not NEWSFEED_BOUNCE_WEBHOOK_TOKEN:
+        raise Http404("Bounce webhook is not enabled.")
+
+    authorization = request.headers.get("Authorization", "")
+    if not (
+        constant_time_compare(authorization, f"Bearer {NEWSFEED_BOUNCE_WEBHOOK_TOKEN}")
+        or constant_time_compare(
+            request.GET.get("token", ""), NEWSFEED_BOUNCE_WEBHOOK_TOKEN
+        )
+    ):
+        return HttpResponse("Invalid webhook token.", status=401)
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON."}, status=400)
+
+    if isinstance(data, dict) and data.get("Type") == "SubscriptionConfirmation":
+        # the subscription of the SNS topic is confirmed by visiting the URL
+        logger.warning(
+            "Confirm the bounce notifications subscription at %s",
+            data.get("SubscribeURL"),
+        )
+
+    suppressed = ingest_suppressions(parse_notifications(data))
+
+    return JsonResponse({"suppressed": suppressed})